@@ -6,17 +6,19 @@ import soundfile as sf
 import tqdm
 from cached_path import cached_path
 
+from f5_tts.infer.result_cache import ResultCache
 from f5_tts.infer.utils_infer import (
     hop_length,
     infer_process,
     load_model,
     load_vocoder,
     preprocess_ref_audio_text,
-    remove_silence_for_generated_wav,
     save_spectrogram,
     transcribe,
     target_sample_rate,
 )
+from f5_tts.infer.utils_silence import compact_silence
+from f5_tts.infer.voice_profiles import load_voice_profile, save_voice_profile
 from f5_tts.model import DiT, UNetT
 from f5_tts.model.utils import seed_everything
 
@@ -33,6 +35,9 @@ class F5TTS:
         local_path=None,
         device=None,
         hf_cache_dir=None,
+        result_cache_dir=None,
+        result_cache_size=2 << 30,
+        voice_store=None,
     ):
         # Initialize parameters
         self.final_wave = None
@@ -40,6 +45,10 @@ class F5TTS:
         self.hop_length = hop_length
         self.seed = -1
         self.mel_spec_type = vocoder_name
+        # Opt-in disk cache of results, identical requests with a fixed seed are served from it
+        self.result_cache = ResultCache(result_cache_dir, result_cache_size) if result_cache_dir else None
+        # Directory of voice profiles, infer(voice=<id>) uses one instead of ref_file and ref_text
+        self.voice_store = voice_store
 
         # Set device
         if device is not None:
@@ -88,11 +97,16 @@ class F5TTS:
     def transcribe(self, ref_audio, language=None):
         return transcribe(ref_audio, language)
 
-    def export_wav(self, wav, file_wave, remove_silence=False):
-        sf.write(file_wave, wav, self.target_sample_rate)
+    def save_voice(self, voice, ref_file, ref_text="", clip_short=True):
+        """Prepares a reference once into the voice store, later infer(voice=voice) calls skip trimming and asr."""
+        if self.voice_store is None:
+            raise ValueError("F5TTS was created without a voice_store")
+        return save_voice_profile(self.voice_store, voice, ref_file, ref_text, clip_short=clip_short)
 
+    def export_wav(self, wav, file_wave, remove_silence=False):
         if remove_silence:
-            remove_silence_for_generated_wav(file_wave)
+            wav = compact_silence(wav, self.target_sample_rate)
+        sf.write(file_wave, wav, self.target_sample_rate)
 
     def export_spectrogram(self, spect, file_spect):
         save_spectrogram(spect, file_spect)
@@ -112,16 +126,34 @@ class F5TTS:
         speed=1.0,
         fix_duration=None,
         remove_silence=False,
+        trim_silence=False,
         file_wave=None,
         file_spect=None,
         seed=-1,
+        cfg_interval=None,
+        cfg_every=1,
+        feature_cache_depth=None,
+        feature_cache_interval=2,
+        voice=None,
+        stitch="wave",
+        vocoder_window_frames=None,
     ):
+        # a drawn seed is never asked for again, its result would only push useful entries out of the cache
+        result_cache = self.result_cache if seed != -1 else None
         if seed == -1:
             seed = random.randint(0, sys.maxsize)
         seed_everything(seed)
         self.seed = seed
 
-        ref_file, ref_text = preprocess_ref_audio_text(ref_file, ref_text, device=self.device)
+        if voice is not None:
+            if self.voice_store is None:
+                raise ValueError("F5TTS was created without a voice_store")
+            voice = load_voice_profile(
+                self.voice_store, voice, self.ema_model, target_rms=target_rms, device=self.device
+            )
+            ref_file, ref_text = None, None
+        else:
+            ref_file, ref_text = preprocess_ref_audio_text(ref_file, ref_text, device=self.device)
 
         wav, sr, spect = infer_process(
             ref_file,
@@ -140,6 +172,16 @@ class F5TTS:
             speed=speed,
             fix_duration=fix_duration,
             device=self.device,
+            cfg_interval=cfg_interval,
+            cfg_every=cfg_every,
+            feature_cache_depth=feature_cache_depth,
+            feature_cache_interval=feature_cache_interval,
+            result_cache=result_cache,
+            seed=seed,
+            voice=voice,
+            trim_silence=trim_silence,
+            stitch=stitch,
+            vocoder_window_frames=vocoder_window_frames,
         )
 
         if file_wave is not None:
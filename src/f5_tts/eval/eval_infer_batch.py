@@ -51,7 +51,7 @@ def main():
     parser.add_argument("-m", "--mel_spec_type", default="vocos", type=str, choices=["bigvgan", "vocos"])
 
     parser.add_argument("-nfe", "--nfestep", default=32, type=int)
-    parser.add_argument("-o", "--odemethod", default="euler")
+    parser.add_argument("-o", "--odemethod", default="euler", help="euler | midpoint | heun | ab2 | dpm_solver_2m")
     parser.add_argument("-ss", "--swaysampling", default=-1, type=float)
 
     parser.add_argument("-t", "--testset", required=True)
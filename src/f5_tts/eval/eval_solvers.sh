@@ -0,0 +1,21 @@
+#!/bin/bash
+
+# Compare ODE solvers at a few-step budget, see src/f5_tts/model/solvers.py
+# -nfe is the number of solver steps: euler, ab2, dpm_solver_2m use 1 NFE per step, midpoint and heun use 2
+# results land in results/<exp>_<ckpt>/<testset>/seed0_<method>_nfe<steps>_..., evaluate them with
+# eval_seedtts_testset.py / eval_librispeech_test_clean.py as usual
+
+testset=${1:-"seedtts_test_en"}
+expname=${2:-"F5TTS_Base"}
+
+for nfe in 8 16; do
+    for method in euler ab2 dpm_solver_2m; do
+        accelerate launch src/f5_tts/eval/eval_infer_batch.py -s 0 -n "$expname" -t "$testset" -o "$method" -nfe $nfe
+    done
+    for method in midpoint heun; do
+        accelerate launch src/f5_tts/eval/eval_infer_batch.py -s 0 -n "$expname" -t "$testset" -o "$method" -nfe $((nfe / 2))
+    done
+done
+
+# reference setting
+accelerate launch src/f5_tts/eval/eval_infer_batch.py -s 0 -n "$expname" -t "$testset" -o "euler" -nfe 32
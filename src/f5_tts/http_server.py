@@ -0,0 +1,335 @@
+"""
+OpenAI-style speech endpoint over plain HTTP, for load balancers that cannot front the socket server.
+
+POST /v1/audio/speech  {"input": "...", "voice": "main", "response_format": "wav", "speed": 1.0}
+    optional: nfe_step, seed, deadline (seconds for the whole response), stream (default true)
+    streamed with chunked transfer encoding as chunks complete, or sent whole with "stream": false
+GET  /v1/audio/voices  the voice ids served
+GET  /v1/stats         queue depth, wait times and admission counts of the batching worker
+
+Every request thread submits to the one BatchScheduler of the TTSStreamingProcessor, so concurrent requests are
+batched together on the model. Try it with a local client:
+
+curl -N localhost:8000/v1/audio/speech -H "Content-Type: application/json" \\
+    -d '{"input": "Hello there.", "response_format": "wav"}' -o out.wav
+"""
+
+import argparse
+import json
+import struct
+import threading
+import time
+import traceback
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from f5_tts.api import F5TTS
+from f5_tts.infer.replicas import parse_devices
+from f5_tts.infer.scheduler import NFE_HIGH_WAIT, NFE_LEVELS, NFE_LOW_WAIT, AdmissionError, parse_nfe_levels
+from f5_tts.infer.utils_stream import get_encoder
+from f5_tts.infer.voice_profiles import list_voice_profiles
+from f5_tts.socket_server import MAX_NFE_STEP, TTSStreamingProcessor, next_encoded, parse_request_params
+
+# response_format -> (encoding of f5_tts.infer.utils_stream, content type)
+# "pcm" is raw 16 bit little-endian mono as the OpenAI api sends it, "wav" the same behind a streaming header
+RESPONSE_FORMATS = {
+    "wav": ("pcm16", "audio/wav"),
+    "pcm": ("pcm16", "audio/pcm"),
+    "f32": ("f32", "application/octet-stream"),
+    "opus": ("opus", "audio/ogg"),
+}
+
+
+def wav_header(sample_rate, bits=16):
+    # sizes are unknown while streaming, 0xFFFFFFFF is what players expect then
+    byte_rate = sample_rate * bits // 8
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        0xFFFFFFFF,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        1,
+        sample_rate,
+        byte_rate,
+        bits // 8,
+        bits,
+        b"data",
+        0xFFFFFFFF,
+    )
+
+
+class SpeechHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # chunked transfer encoding, keep-alive
+    server_version = "F5TTS"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, obj, headers=()):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, headers=()):
+        self.send_json(status, {"error": {"message": str(message), "code": status.phrase}}, headers=headers)
+
+    def write_chunk(self, data):
+        data = memoryview(data).cast("B")
+        if data.nbytes:
+            self.wfile.write(f"{data.nbytes:X}\r\n".encode("ascii"))
+            self.wfile.write(data)
+            self.wfile.write(b"\r\n")
+
+    def do_GET(self):
+        processor = self.server.processor
+        if self.path == "/v1/audio/voices":
+            voices = set(processor.voices)
+            if processor.voice_store is not None:
+                voices.update(list_voice_profiles(processor.voice_store))
+            self.send_json(HTTPStatus.OK, {"voices": sorted(voices)})
+        elif self.path == "/v1/stats":
+            self.send_json(HTTPStatus.OK, processor.scheduler.stats())
+        else:
+            self.send_error_json(HTTPStatus.NOT_FOUND, f"no route {self.path}")
+
+    def read_body(self):
+        # the raw request body, or None once an error is sent for it
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if 0 <= length <= self.server.max_body_bytes:
+            return self.rfile.read(length)
+        # the body is left unread, it would be parsed as the next request on a kept-alive connection
+        self.close_connection = True
+        close = [("Connection", "close")]
+        if length < 0:
+            self.send_error_json(HTTPStatus.BAD_REQUEST, "bad request: invalid Content-Length", close)
+        else:
+            self.send_error_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large", close)
+        return None
+
+    def parse_request_body(self, body):
+        processor = self.server.processor
+        request = json.loads(body.decode("utf-8"))
+        text = request["input"].strip()
+        if not text:
+            raise ValueError("empty input")
+        voice = request.get("voice") or "main"
+        if not processor.has_voice(voice):
+            raise KeyError(f"unknown voice {voice!r}")
+        response_format = request.get("response_format") or "wav"
+        if response_format not in RESPONSE_FORMATS:
+            expected = ", ".join(RESPONSE_FORMATS)
+            raise ValueError(f"unknown response_format {response_format!r}, expected one of {expected}")
+        params = parse_request_params(
+            {key: request.get(key) for key in ("nfe_step", "speed", "seed")}, processor.max_nfe_step
+        )
+        deadline = None
+        if request.get("deadline") is not None:
+            deadline = time.monotonic() + float(request["deadline"])
+        return text, voice, response_format, params, deadline, request.get("stream", True)
+
+    def do_POST(self):
+        body = self.read_body()
+        if body is None:
+            return
+        if self.path != "/v1/audio/speech":
+            self.send_error_json(HTTPStatus.NOT_FOUND, f"no route {self.path}")
+            return
+        processor = self.server.processor
+        try:
+            text, voice, response_format, params, deadline, streaming = self.parse_request_body(body)
+            encoding, content_type = RESPONSE_FORMATS[response_format]
+            encoder = get_encoder(encoding, sample_rate=processor.sampling_rate)
+        except (ValueError, KeyError, AttributeError, TypeError) as e:
+            self.send_error_json(HTTPStatus.BAD_REQUEST, f"bad request: {e}")
+            return
+
+        # requests beyond the limit are refused rather than queued on threads, the balancer can retry elsewhere
+        if not self.server.limit.acquire(blocking=False):
+            self.send_error_json(HTTPStatus.SERVICE_UNAVAILABLE, "server busy", headers=[("Retry-After", "1")])
+            return
+        try:
+            self.respond(text, voice, params, deadline, streaming, encoder, response_format, content_type)
+        finally:
+            self.server.limit.release()
+
+    def respond(self, text, voice, params, deadline, streaming, encoder, response_format, content_type):
+        processor = self.server.processor
+        # the settings actually used, nfe_step may have been lowered under load, sent with every response
+        settings = processor.request_settings(voice=voice, **params)
+        cancelled = threading.Event()
+        stream = processor.generate_stream(text, cancelled=cancelled, deadline=deadline, **settings)
+        header = wav_header(processor.sampling_rate) if response_format == "wav" else b""
+        started = False  # status line sent, errors can no longer be reported with a status
+        try:
+            # the first piece before any header, so a refused or failed request still gets a proper status
+            audio_chunk, end = next_encoded(stream, encoder)
+
+            if not streaming:
+                pieces = [header, bytes(memoryview(audio_chunk).cast("B"))]
+                while not end:
+                    audio_chunk, end = next_encoded(stream, encoder)
+                    pieces.append(bytes(memoryview(audio_chunk).cast("B")))
+                body = bytearray(b"".join(pieces))
+                if response_format == "wav":  # the length is known here, so write a regular header
+                    struct.pack_into("<I", body, 4, len(body) - 8)
+                    struct.pack_into("<I", body, 40, len(body) - 44)
+                started = True
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("X-TTS-Settings", json.dumps(settings))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            started = True
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("X-TTS-Settings", json.dumps(settings))
+            self.end_headers()
+            self.write_chunk(header)
+            while True:
+                self.write_chunk(audio_chunk)
+                if end:
+                    break
+                audio_chunk, end = next_encoded(stream, encoder)
+            self.wfile.write(b"0\r\n\r\n")
+        except ConnectionError as e:
+            print(f"Client {self.client_address} disconnected: {e}")
+            self.close_connection = True
+        except AdmissionError as e:
+            if not started:
+                self.send_error_json(HTTPStatus.TOO_MANY_REQUESTS, f"rejected: {e}", headers=[("Retry-After", "1")])
+            else:  # chunks shed once streaming has started, an incomplete chunked body tells the client
+                self.close_connection = True
+        except Exception as e:
+            traceback.print_exc()
+            if not started:
+                self.send_error_json(HTTPStatus.INTERNAL_SERVER_ERROR, e)
+            else:
+                self.close_connection = True
+        finally:
+            # stop generating, the scheduler drops the chunks of this request that have not started
+            cancelled.set()
+            stream.close()
+
+
+class SpeechServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, processor, max_connections=64, max_body_bytes=1 << 20, verbose=False):
+        super().__init__(address, SpeechHandler)
+        self.processor = processor
+        self.limit = threading.BoundedSemaphore(max_connections)
+        self.max_body_bytes = max_body_bytes
+        self.verbose = verbose
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-style HTTP speech server")
+    parser.add_argument("--model", default="F5-TTS", help="F5-TTS | E2-TTS")
+    parser.add_argument("--ckpt_file", default="", help="checkpoint, the released one if empty")
+    parser.add_argument("--vocab_file", default="", help="vocab file, if needed")
+    parser.add_argument("--vocoder_name", default="vocos", choices=["vocos", "bigvgan"])
+    parser.add_argument("--vocoder_local_path", default=None, help="load the vocoder from this directory")
+    parser.add_argument("--ode_method", default="euler", help="ODE solver, see f5_tts.model.solvers")
+    parser.add_argument("--ref_audio", default="", help="reference audio of the main voice")
+    parser.add_argument("--ref_text", default="", help="reference text, transcribed if empty")
+    parser.add_argument("--voice_store", default=None, help="voice profiles served by id, see f5-tts_voice-profile")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--device", default=None, help="e.g. cpu, cuda")
+    parser.add_argument("--devices", default=None, help="one replica per device, 'auto' or e.g. cuda:0,cuda:1")
+    parser.add_argument("--cpu_workers", type=int, default=1, help="cpu replicas for --devices auto without gpus")
+    parser.add_argument("--max_connections", type=int, default=64, help="requests served at once, 503 beyond")
+    parser.add_argument("--policy", default="fifo", choices=["fifo", "edf", "sjf"], help="queue order")
+    parser.add_argument("--max_pending", type=int, default=None, help="queued chunks at most, 429 beyond")
+    parser.add_argument("--adaptive_nfe", action="store_true", help="lower nfe_step (then cfg) under load")
+    parser.add_argument(
+        "--nfe_levels", type=parse_nfe_levels, default=NFE_LEVELS, help="adaptive nfe_step[/cfg_every] levels"
+    )
+    parser.add_argument("--nfe_high_depth", type=int, default=None, help="queued chunks to step down, off if unset")
+    parser.add_argument("--nfe_high_wait", type=float, default=NFE_HIGH_WAIT, help="queue wait (s) to step down")
+    parser.add_argument("--nfe_low_wait", type=float, default=NFE_LOW_WAIT, help="queue wait (s) to step back up")
+    parser.add_argument("--max_nfe_step", type=int, default=MAX_NFE_STEP, help="400 for requests asking for more")
+    parser.add_argument("--result_cache_dir", default=None, help="cache generated chunks on disk, off if unset")
+    parser.add_argument("--result_cache_size", type=float, default=2, help="result cache bound in GB")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    devices = parse_devices(args.devices, args.cpu_workers)
+
+    def build_tts(device, **kwargs):
+        # every replica from the same model, vocoder and solver settings
+        return F5TTS(
+            model_type=args.model,
+            ckpt_file=args.ckpt_file,
+            vocab_file=args.vocab_file,
+            ode_method=args.ode_method,
+            vocoder_name=args.vocoder_name,
+            local_path=args.vocoder_local_path,
+            device=device,
+            **kwargs,
+        )
+
+    f5tts = build_tts(
+        devices[0] if devices else args.device,
+        result_cache_dir=args.result_cache_dir,
+        result_cache_size=int(args.result_cache_size * 2**30),
+        voice_store=args.voice_store,
+    )
+    loaded = [f5tts]  # the first replica is the instance above
+
+    def load_replica(device):
+        replica = loaded.pop() if loaded else build_tts(device)
+        return replica.ema_model, replica.vocoder
+
+    processor = TTSStreamingProcessor(
+        None,
+        None,
+        args.ref_audio,
+        args.ref_text,
+        device=f5tts.device,
+        policy=args.policy,
+        max_pending=args.max_pending,
+        adaptive_nfe=args.adaptive_nfe,
+        nfe_levels=args.nfe_levels,
+        nfe_high_wait=args.nfe_high_wait,
+        nfe_low_wait=args.nfe_low_wait,
+        nfe_high_depth=args.nfe_high_depth,
+        max_nfe_step=args.max_nfe_step,
+        result_cache=f5tts.result_cache,
+        voice_store=f5tts.voice_store,
+        model=f5tts.ema_model,
+        vocoder=f5tts.vocoder,
+        mel_spec_type=f5tts.mel_spec_type,
+        devices=devices,
+        load_replica=load_replica,
+    )
+
+    server = SpeechServer((args.host, args.port), processor, args.max_connections, verbose=args.verbose)
+    print(f"Server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        processor.scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,10 +14,13 @@ from f5_tts.infer.utils_infer import (
     infer_process,
     load_model,
     load_vocoder,
+    ode_method,
     preprocess_ref_audio_text,
-    remove_silence_for_generated_wav,
 )
+from f5_tts.infer.utils_silence import compact_silence
+from f5_tts.infer.voice_profiles import load_voice_profile
 from f5_tts.model import DiT, UNetT
+from f5_tts.model.solvers import SOLVERS
 
 parser = argparse.ArgumentParser(
     prog="python3 infer-cli.py",
@@ -93,14 +96,32 @@ parser.add_argument(
     default=32,
     help="Set the number of denoising steps (default: 32)",
 )
+parser.add_argument(
+    "--ode_method",
+    type=str,
+    default=ode_method,
+    help=f"ODE solver, one of {', '.join(SOLVERS)} or any torchdiffeq method (default: {ode_method})",
+)
+parser.add_argument(
+    "--voice_store",
+    type=str,
+    help="Voice profile store (see f5-tts_voice-profile), for voices given as profile = <id> in the config",
+)
+parser.add_argument(
+    "--stitch",
+    type=str,
+    choices=["wave", "mel"],
+    help="Join chunks as vocoded waves, or as mels vocoded in one pass (default: wave)",
+)
 args = parser.parse_args()
 
 config = tomli.load(open(args.config, "rb"))
 
-ref_audio = args.ref_audio if args.ref_audio else config["ref_audio"]
-ref_text = args.ref_text if args.ref_text != "666" else config["ref_text"]
+ref_audio = args.ref_audio if args.ref_audio else config.get("ref_audio", "")
+ref_text = args.ref_text if args.ref_text != "666" else config.get("ref_text", "")
 gen_text = args.gen_text if args.gen_text else config["gen_text"]
 gen_file = args.gen_file if args.gen_file else config["gen_file"]
+voice_store = args.voice_store if args.voice_store else config.get("voice_store", "")
 
 # patches for pip pkg user
 if "infer/examples/" in ref_audio:
@@ -109,7 +130,7 @@ if "infer/examples/" in gen_file:
     gen_file = str(files("f5_tts").joinpath(f"{gen_file}"))
 if "voices" in config:
     for voice in config["voices"]:
-        voice_ref_audio = config["voices"][voice]["ref_audio"]
+        voice_ref_audio = config["voices"][voice].get("ref_audio", "")
         if "infer/examples/" in voice_ref_audio:
             config["voices"][voice]["ref_audio"] = str(files("f5_tts").joinpath(f"{voice_ref_audio}"))
 
@@ -123,6 +144,7 @@ vocab_file = args.vocab_file if args.vocab_file else ""
 remove_silence = args.remove_silence if args.remove_silence else config["remove_silence"]
 speed = args.speed
 nfe_step = args.nfe
+stitch = args.stitch if args.stitch else config.get("stitch", "wave")
 indic = False
 
 wave_path = Path(output_dir) / output_file
@@ -181,22 +203,34 @@ elif model == "E2-TTS":
 
 
 print(f"Using {model}...")
-ema_model = load_model(model_cls, model_cfg, ckpt_file, mel_spec_type=mel_spec_type, vocab_file=vocab_file)
+ema_model = load_model(
+    model_cls, model_cfg, ckpt_file, mel_spec_type=mel_spec_type, vocab_file=vocab_file, ode_method=args.ode_method
+)
 
 
 def main_process(ref_audio, ref_text, text_gen, model_obj, mel_spec_type, remove_silence, speed):
     main_voice = {"ref_audio": ref_audio, "ref_text": ref_text}
+    if "profile" in config and not args.ref_audio:
+        main_voice = {"profile": config["profile"]}
     if "voices" not in config:
         voices = {"main": main_voice}
     else:
         voices = config["voices"]
         voices["main"] = main_voice
     for voice in voices:
+        if "profile" in voices[voice]:
+            # prepared ahead with f5-tts_voice-profile, nothing to trim or transcribe
+            assert voice_store, f"voice {voice} is a profile, set voice_store in the config or --voice_store"
+            voices[voice]["voice"] = load_voice_profile(voice_store, voices[voice]["profile"], model_obj)
+            voices[voice]["ref_audio"], voices[voice]["ref_text"] = None, None
+            print("Voice:", voice)
+            print("Profile:", voices[voice]["profile"])
+            continue
+        print("Voice:", voice)
+        print("Ref_audio:", voices[voice]["ref_audio"])
         voices[voice]["ref_audio"], voices[voice]["ref_text"] = preprocess_ref_audio_text(
             voices[voice]["ref_audio"], voices[voice]["ref_text"]
         )
-        print("Voice:", voice)
-        print("Ref_audio:", voices[voice]["ref_audio"])
         print("Ref_text:", voices[voice]["ref_text"])
 
     generated_audio_segments = []
@@ -221,7 +255,17 @@ def main_process(ref_audio, ref_text, text_gen, model_obj, mel_spec_type, remove
         ref_text = voices[voice]["ref_text"]
         print(f"Voice: {voice}")
         audio, final_sample_rate, spectragram = infer_process(
-            ref_audio, ref_text, gen_text, model_obj, vocoder, mel_spec_type=mel_spec_type, speed=speed, nfe_step=nfe_step, indic=indic
+            ref_audio,
+            ref_text,
+            gen_text,
+            model_obj,
+            vocoder,
+            mel_spec_type=mel_spec_type,
+            speed=speed,
+            nfe_step=nfe_step,
+            indic=indic,
+            voice=voices[voice].get("voice"),
+            stitch=stitch,
         )
         generated_audio_segments.append(audio)
 
@@ -231,11 +275,12 @@ def main_process(ref_audio, ref_text, text_gen, model_obj, mel_spec_type, remove
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
+        # Remove silence, in memory before writing
+        if remove_silence:
+            final_wave = compact_silence(final_wave, final_sample_rate)
+
         with open(wave_path, "wb") as f:
             sf.write(f.name, final_wave, final_sample_rate)
-            # Remove silence
-            if remove_silence:
-                remove_silence_for_generated_wav(f.name)
             print(f.name)
 
 
@@ -9,8 +9,6 @@ from importlib.resources import files
 import click
 import gradio as gr
 import numpy as np
-import soundfile as sf
-import torchaudio
 from cached_path import cached_path
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
@@ -35,9 +33,10 @@ from f5_tts.infer.utils_infer import (
     load_model,
     preprocess_ref_audio_text,
     infer_process,
-    remove_silence_for_generated_wav,
     save_spectrogram,
 )
+from f5_tts.infer.utils_silence import compact_silence
+from f5_tts.model.utils import check_cfg_interval
 
 
 DEFAULT_TTS_MODEL = "F5-TTS"
@@ -109,7 +108,17 @@ def generate_response(messages, model, tokenizer):
 
 @gpu_decorator
 def infer(
-    ref_audio_orig, ref_text, gen_text, model, remove_silence, nfe_step=32, cross_fade_duration=0.15, speed=1, show_info=gr.Info
+    ref_audio_orig,
+    ref_text,
+    gen_text,
+    model,
+    remove_silence,
+    nfe_step=32,
+    cross_fade_duration=0.15,
+    speed=1,
+    cfg_interval=None,
+    cfg_every=1,
+    show_info=gr.Info,
 ):
     ref_audio, ref_text = preprocess_ref_audio_text(ref_audio_orig, ref_text, show_info=show_info)
 
@@ -145,17 +154,15 @@ def infer(
         speed=speed,
         nfe_step=nfe_step,
         indic=indic,
+        cfg_interval=cfg_interval,
+        cfg_every=cfg_every,
         show_info=show_info,
         progress=gr.Progress(),
     )
 
-    # Remove silence
+    # Remove silence, in memory
     if remove_silence:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:
-            sf.write(f.name, final_wave, final_sample_rate)
-            remove_silence_for_generated_wav(f.name)
-            final_wave, _ = torchaudio.load(f.name)
-        final_wave = final_wave.squeeze().cpu().numpy()
+        final_wave = compact_silence(final_wave, final_sample_rate)
 
     # Save the spectrogram
     with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_spectrogram:
@@ -213,6 +220,30 @@ with gr.Blocks() as app_tts:
             step=2,
             info="Set the number of denoising steps.",
         )
+        cfg_start_slider = gr.Slider(
+            label="Guidance Start",
+            minimum=0.0,
+            maximum=1.0,
+            value=0.0,
+            step=0.05,
+            info="Apply classifier-free guidance only from this flow time on (0 = noise, 1 = speech).",
+        )
+        cfg_end_slider = gr.Slider(
+            label="Guidance End",
+            minimum=0.0,
+            maximum=1.0,
+            value=1.0,
+            step=0.05,
+            info="Stop applying classifier-free guidance after this flow time. A narrower interval is faster.",
+        )
+        cfg_every_slider = gr.Slider(
+            label="Guidance Every N Steps",
+            minimum=1,
+            maximum=8,
+            value=1,
+            step=1,
+            info="Recompute guidance every N steps and reuse it in between. Higher is faster.",
+        )
 
     audio_output = gr.Audio(label="Synthesized Audio")
     spectrogram_output = gr.Image(label="Spectrogram")
@@ -226,7 +257,15 @@ with gr.Blocks() as app_tts:
         nfe_slider,
         cross_fade_duration_slider,
         speed_slider,
+        cfg_start_slider,
+        cfg_end_slider,
+        cfg_every_slider,
     ):
+        cfg_interval = (cfg_start_slider, cfg_end_slider)
+        try:
+            check_cfg_interval(cfg_interval)
+        except ValueError:
+            raise gr.Error("Guidance Start must not be after Guidance End.")
         audio_out, spectrogram_path, ref_text_out = infer(
             ref_audio_input,
             ref_text_input,
@@ -236,6 +275,8 @@ with gr.Blocks() as app_tts:
             nfe_slider,
             cross_fade_duration_slider,
             speed_slider,
+            cfg_interval=cfg_interval,
+            cfg_every=int(cfg_every_slider),
         )
         return audio_out, spectrogram_path, gr.update(value=ref_text_out)
 
@@ -249,6 +290,9 @@ with gr.Blocks() as app_tts:
             nfe_slider,
             cross_fade_duration_slider,
             speed_slider,
+            cfg_start_slider,
+            cfg_end_slider,
+            cfg_every_slider,
         ],
         outputs=[audio_output, spectrogram_output, ref_text_input],
     )
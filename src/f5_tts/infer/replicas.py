@@ -0,0 +1,157 @@
+# A pool of model replicas, one per gpu (or per cpu worker), behind the BatchScheduler interface
+# Every replica is a BatchScheduler with its own model and vocoder, each chunk goes to the replica with the
+# fewest outstanding frames (queued or sampling), so the chunks of one request may also run side by side
+# A chunk that fails on its replica (other than being refused) is retried on the next least loaded one
+
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import InvalidStateError
+
+import torch
+
+from f5_tts.infer.scheduler import AdmissionError
+from f5_tts.infer.scheduler import BatchScheduler
+from f5_tts.infer.utils_infer import nfe_step, voice_cache_size
+
+
+def replica_devices(cpu_workers=1):
+    """Every visible gpu, or cpu_workers replicas on the cpu when there is none."""
+    if torch.cuda.is_available():
+        return [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+    return ["cpu"] * cpu_workers
+
+
+def parse_devices(devices, cpu_workers=1):
+    """Command line form: "auto", or a comma separated list such as "cuda:0,cuda:1"; None without replicas."""
+    if not devices:
+        return None
+    if devices == "auto":
+        return replica_devices(cpu_workers)
+    return [device.strip() for device in devices.split(",") if device.strip()]
+
+
+class ReplicaPool:
+    """
+    Loads load_replica(device) -> (model_obj, vocoder) on every device and serves them as one scheduler.
+
+    submit, admit, estimate_cost, estimate_wait, stats, start and stop behave as BatchScheduler's, so the pool
+    can stand in for it, e.g. in TTSStreamingProcessor or under an NFEController. Voices may be prepared with
+    any replica's model, their conditioning is copied to the other devices once and kept.
+    """
+
+    def __init__(self, load_replica, devices=None, cpu_workers=1, **scheduler_kwargs):
+        self.devices = list(devices) if devices else replica_devices(cpu_workers)
+        self.replicas = []
+        for device in self.devices:
+            model_obj, vocoder = load_replica(device)
+            self.replicas.append(BatchScheduler(model_obj, vocoder, device=device, **scheduler_kwargs))
+        self.policy = self.replicas[0].policy
+        self.rotation = itertools.count()  # tie-break, so an idle pool spreads work too
+        self.voices = OrderedDict()  # (voice hash, device) -> voice with its tensors on that device
+        self.lock = threading.Lock()
+
+    @property
+    def model_obj(self):
+        # the model voices are prepared with, any replica gives the same conditioning
+        return self.replicas[0].model_obj
+
+    def start(self):
+        for replica in self.replicas:
+            replica.start()
+        return self
+
+    def stop(self):
+        for replica in self.replicas:
+            replica.stop()
+
+    def route(self, exclude=()):
+        """The replica with the fewest outstanding frames, ties taken in turn, None if all are excluded."""
+        start = next(self.rotation)
+        n = len(self.replicas)
+        candidates = [self.replicas[(start + i) % n] for i in range(n)]
+        candidates = [replica for replica in candidates if not any(replica is other for other in exclude)]
+        return min(candidates, key=lambda replica: replica.outstanding_frames, default=None)
+
+    def _voice_on(self, voice, device):
+        if voice["cond"].device == torch.device(device):
+            return voice
+        key = (voice["hash"], str(device))
+        with self.lock:
+            moved = self.voices.get(key)
+            if moved is not None:
+                self.voices.move_to_end(key)
+                return moved
+        moved = dict(voice, audio=voice["audio"].to(device), cond=voice["cond"].to(device))
+        with self.lock:
+            self.voices[key] = moved
+            while len(self.voices) > voice_cache_size * len(self.replicas):
+                self.voices.popitem(last=False)
+        return moved
+
+    def submit(self, voice, gen_text, **kwargs):
+        """
+        As BatchScheduler.submit. A chunk whose replica fails it is submitted again to the least loaded replica
+        it has not failed on yet, the future only fails once every replica did; AdmissionError is final.
+        """
+        result = Future()
+        failed = []
+
+        def settle(set_outcome, outcome):
+            try:
+                set_outcome(outcome)
+            except InvalidStateError:  # cancelled by the submitter meanwhile
+                pass
+
+        def attempt():
+            replica = self.route(exclude=failed)
+            future = replica.submit(self._voice_on(voice, replica.device), gen_text, **kwargs)
+            result.add_done_callback(lambda result: future.cancel() if result.cancelled() else None)
+            future.add_done_callback(lambda future: done(replica, future))
+
+        def done(replica, future):
+            if future.cancelled():
+                result.cancel()
+                return
+            error = future.exception()
+            if error is None:
+                settle(result.set_result, future.result())
+                return
+            failed.append(replica)
+            if isinstance(error, AdmissionError) or len(failed) == len(self.replicas) or result.done():
+                settle(result.set_exception, error)
+                return
+            print(f"Chunk failed on {replica.device}, retrying on another replica: {error!r}")
+            try:
+                attempt()
+            except Exception as e:
+                settle(result.set_exception, e)
+
+        attempt()  # refused or failing submissions raise here, as from BatchScheduler.submit
+        return result
+
+    def estimate_cost(self, voice, gen_text_batches, nfe_step=nfe_step, speed=1, fix_duration=None):
+        return self.replicas[0].estimate_cost(
+            voice, gen_text_batches, nfe_step=nfe_step, speed=speed, fix_duration=fix_duration
+        )
+
+    def estimate_wait(self, cost=0):
+        """Wait on the replica new work would be routed to, None before any measurement."""
+        return self.route().estimate_wait(cost)
+
+    def admit(self, cost, deadline=None):
+        # chunks are routed one by one later, the least loaded replica is where the first one goes
+        self.route().admit(cost, deadline=deadline)
+
+    def stats(self):
+        """Totals over the replicas, waits of the slowest one, and every replica's own stats under "replicas"."""
+        replicas = [dict(replica.stats(), device=str(replica.device)) for replica in self.replicas]
+        stats = dict(policy=self.policy)
+        for name in ("queue_depth", "queued_cost", "outstanding_frames", "served", "rejected", "shed"):
+            stats[name] = sum(replica[name] for replica in replicas)
+        for name in ("seconds_per_cost", "step_seconds", "wait_p50", "wait_p95", "wait_max"):
+            values = [replica[name] for replica in replicas if replica[name] is not None]
+            stats[name] = max(values) if values else None
+        stats["replicas"] = replicas
+        return stats
@@ -0,0 +1,133 @@
+# Persistent, content-addressed cache of synthesis results
+# Entries are (wave, sample_rate, spectrogram) saved as .npz files named by the sha256 of everything that
+# determines the output, the least recently used are evicted once the directory grows past max_bytes
+# Identical requests in flight in the same process are coalesced: the first one generates, the others wait for it
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def file_fingerprint(path, block=1 << 20):
+    """Cheap content fingerprint of a large file (e.g. a checkpoint): size plus its first and last blocks."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(block))
+        if size > block:
+            f.seek(max(size - block, block))
+            digest.update(f.read(block))
+    return digest.hexdigest()
+
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class ResultCache:
+    def __init__(self, cache_dir, max_bytes=2 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.inflight = {}  # key -> Future of the request generating it
+        self.total_bytes = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def key(**fields):
+        """Key for a result, fields must be json serialisable (e.g. checkpoint and voice hashes, text, settings)."""
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _entries(self):
+        # (path, size, last use) of every entry
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # evicted by another process
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                result = data["wave"], int(data["sample_rate"]), data["spectrogram"]
+            os.utime(path)  # last use, for lru eviction
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+        return result
+
+    def put(self, key, result):
+        wave, sample_rate, spectrogram = result
+        # write to a temporary file first, so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, wave=wave, sample_rate=sample_rate, spectrogram=spectrogram)
+        size = os.path.getsize(tmp_path)
+        path = self._path(key)
+        with self.lock:
+            # an entry already written for key (another process, a get_or_compute fallback) is replaced, not added
+            try:
+                size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+            self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # called with the lock held, rescans so entries written by other processes are counted too
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+
+    def get_or_compute(self, key, compute):
+        """Cached result for key, else compute() once, shared with identical calls made meanwhile."""
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self.lock:
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+        try:
+            self.put(key, result)
+        except OSError as e:  # a full or read-only disk costs the cache entry, not the request
+            print(f"Result cache write failed: {e}")
+        with self.lock:
+            del self.inflight[key]  # only now, so a call arriving meanwhile finds either this future or the entry
+        future.set_result(result)
+        return result
@@ -0,0 +1,453 @@
+# Continuous batching for serving, shared by concurrent requests on one model
+# Requests are queued as single chunks, while a batch is sampling new ones keep arriving,
+# the next batch is formed from everything pending, across requests and voices
+# Under load the queue is ordered by deadline or job size, and work that cannot meet its deadline is turned away
+
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import InvalidStateError
+
+import torch
+from torch.nn.utils.rnn import pad_sequence
+
+from f5_tts.infer.result_cache import ResultCache, normalize_text
+from f5_tts.infer.utils_infer import (
+    cfg_strength,
+    estimate_duration,
+    nfe_step,
+    sway_sampling_coef,
+    target_rms,
+    target_sample_rate,
+)
+from f5_tts.model.utils import convert_char_to_pinyin
+
+
+class AdmissionError(RuntimeError):
+    """A job was refused: the queue is full, or its deadline cannot be met."""
+
+
+# queue orderings, the head job picks the sampling settings and the batch is filled in the same order
+POLICIES = {
+    "fifo": lambda job: job["seq"],
+    "edf": lambda job: (job["deadline"] if job["deadline"] is not None else math.inf, job["seq"]),  # deadline first
+    "sjf": lambda job: (job["cost"], job["seq"]),  # shortest job first
+}
+
+
+class BatchScheduler:
+    """
+    Collects chunk jobs from any number of threads and samples them together.
+
+    Jobs with the same sampling settings are batched in policy order while batch size * longest duration
+    stays within max_batch_frames. Each job carries its own reference mel, so one batch may mix voices,
+    CFM.sample gets per-sample lens and duration and every result is cut at its own length.
+
+    A job costs duration * nfe_step, the measured seconds per unit of cost turn queued cost into a wait estimate.
+    admit() refuses a request that would finish after its deadline, and queued jobs that can no longer make
+    their deadline are shed with AdmissionError instead of being sampled late.
+
+    With a result_cache, chunks already generated for the same model, voice, text and settings are served from
+    it, and a chunk submitted again while queued or sampling joins that job instead of being generated twice.
+    Every submitter gets its own future, a job is only dropped once all of its futures are cancelled.
+    """
+
+    def __init__(
+        self,
+        model_obj,
+        vocoder,
+        mel_spec_type="vocos",
+        device=None,
+        max_batch_frames=8192,
+        max_wait=0.005,
+        target_rms=target_rms,
+        policy="fifo",
+        max_pending=None,
+        result_cache: ResultCache | None = None,
+    ):
+        assert policy in POLICIES, f"policy must be one of {', '.join(POLICIES)}"
+
+        self.model_obj = model_obj
+        self.vocoder = vocoder
+        self.mel_spec_type = mel_spec_type
+        self.device = device
+        self.max_batch_frames = max_batch_frames
+        self.max_wait = max_wait  # short pause before forming a batch, so requests arriving together share it
+        self.target_rms = target_rms
+        self.policy = policy
+        self.max_pending = max_pending  # jobs queued at most, None for no bound
+        # results can only be cached for models loaded with load_checkpoint, which fingerprints the checkpoint
+        self.result_cache = result_cache if getattr(model_obj, "ckpt_fingerprint", None) else None
+        self.inflight = {}  # cache key -> job queued or sampling
+
+        self.pending = []
+        self.pending_cost = 0
+        self.outstanding_frames = 0  # durations of the jobs queued or sampling, for routing across replicas
+        self.seq = itertools.count()
+        self.seconds_per_cost = None  # moving average over sampled batches, None until the first one
+        self.step_seconds = None  # moving average of the wall time of one ode step of a batch
+        self.waits = deque(maxlen=1024)  # seconds from submit to batch start, recent jobs
+        self.counts = dict(served=0, rejected=0, shed=0)
+        self.condition = threading.Condition()
+        self.running = False
+        self.worker = None
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return self
+            self.running = True
+        self.worker = threading.Thread(target=self._loop, daemon=True)
+        self.worker.start()
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            pending, self.pending = self.pending, []
+            self.pending_cost = 0
+            self.condition.notify_all()
+        for job in pending:
+            job["future"].cancel()
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+
+    def submit(
+        self,
+        voice,
+        gen_text,
+        nfe_step=nfe_step,
+        cfg_strength=cfg_strength,
+        sway_sampling_coef=sway_sampling_coef,
+        cfg_every=1,
+        speed=1,
+        fix_duration=None,
+        seed=None,
+        indic=False,
+        deadline=None,
+    ) -> Future:
+        """
+        Queue one chunk for a voice prepared by load_voice(), deadline is a time.monotonic() value or None.
+        The future resolves to (wave, sample_rate, spectrogram) of the generated part.
+        """
+        settings = (nfe_step, cfg_strength, sway_sampling_coef, cfg_every)
+        key = None
+        if self.result_cache is not None:
+            key = ResultCache.key(
+                model=self.model_obj.ckpt_fingerprint,
+                voice=voice["hash"],
+                text=normalize_text(gen_text),
+                settings=settings,
+                speed=speed,
+                fix_duration=fix_duration,
+                seed=seed,
+                target_rms=self.target_rms,
+                mel_spec_type=self.mel_spec_type,
+                ode_method=self.model_obj.odeint_kwargs.get("method"),
+                indic=indic,
+            )
+            result = self.result_cache.get(key)
+            if result is not None:
+                future = Future()
+                future.set_result(result)
+                return future
+
+        cond = voice["cond"][0]
+        final_text = voice["text"] + (convert_char_to_pinyin([gen_text])[0] if not indic else gen_text)
+        ref_audio_len = voice["ref_audio_len"]
+        duration = estimate_duration(ref_audio_len, voice["ref_text"], gen_text, speed=speed, fix_duration=fix_duration)
+        duration = min(max(duration, cond.shape[0] + 1, len(final_text) + 1), 4096)
+
+        job = dict(
+            cond=cond,
+            text=final_text,
+            duration=duration,
+            ref_audio_len=ref_audio_len,
+            rms=voice["rms"],
+            seed=seed,
+            settings=settings,
+            key=key,
+            waiters=0,
+            cost=duration * nfe_step,
+            deadline=deadline,
+            submitted=time.monotonic(),
+            future=Future(),
+        )
+        with self.condition:
+            if not self.running:
+                raise RuntimeError("BatchScheduler is not running, call start() first")
+            if key is not None and key in self.inflight:
+                return self._attach(self.inflight[key])
+            if self.max_pending is not None and len(self.pending) >= self.max_pending:
+                self.counts["rejected"] += 1
+                raise AdmissionError(f"queue full ({len(self.pending)} jobs pending)")
+            job["seq"] = next(self.seq)
+            self.pending.append(job)
+            self.pending_cost += job["cost"]
+            self.outstanding_frames += duration
+            job["future"].add_done_callback(lambda _: self._finish(job))
+            if key is not None:
+                self.inflight[key] = job
+                job["future"].add_done_callback(lambda _: self._release(job))
+            self.condition.notify()
+            return self._attach(job)
+
+    def _attach(self, job):
+        # called with the lock held, a new future for one submitter of the job
+        proxy = Future()
+        job["waiters"] += 1
+
+        def forward(future):
+            try:
+                if future.cancelled():
+                    proxy.cancel()
+                elif future.exception() is not None:
+                    proxy.set_exception(future.exception())
+                else:
+                    proxy.set_result(future.result())
+            except InvalidStateError:  # the submitter cancelled meanwhile
+                pass
+
+        def detach(proxy):
+            if proxy.cancelled():
+                with self.condition:
+                    job["waiters"] -= 1
+                    drop = job["waiters"] == 0
+                if drop:
+                    job["future"].cancel()
+
+        proxy.add_done_callback(detach)
+        job["future"].add_done_callback(forward)
+        return proxy
+
+    def _finish(self, job):
+        with self.condition:
+            self.outstanding_frames -= job["duration"]
+
+    def _release(self, job):
+        with self.condition:
+            if self.inflight.get(job["key"]) is job:
+                del self.inflight[job["key"]]
+
+    def estimate_cost(self, voice, gen_text_batches, nfe_step=nfe_step, speed=1, fix_duration=None):
+        # the same duration estimate as infer_process, summed over the chunks of a request
+        ref_audio_len, ref_text = voice["ref_audio_len"], voice["ref_text"]
+        durations = [
+            estimate_duration(ref_audio_len, ref_text, gen_text, speed=speed, fix_duration=fix_duration)
+            for gen_text in gen_text_batches
+        ]
+        return sum(min(max(duration, voice["cond"].shape[1] + 1), 4096) for duration in durations) * nfe_step
+
+    def estimate_wait(self, cost=0):
+        """Seconds until work of this cost would be done behind everything queued, None before any measurement."""
+        if self.seconds_per_cost is None:
+            return None
+        return (self.pending_cost + cost) * self.seconds_per_cost
+
+    def admit(self, cost, deadline=None):
+        """Raises AdmissionError if a request of this cost cannot finish by its deadline (time.monotonic())."""
+        with self.condition:
+            if self.max_pending is not None and len(self.pending) >= self.max_pending:
+                self.counts["rejected"] += 1
+                raise AdmissionError(f"queue full ({len(self.pending)} jobs pending)")
+            wait = self.estimate_wait(cost)
+            if deadline is not None and wait is not None and time.monotonic() + wait > deadline:
+                self.counts["rejected"] += 1
+                raise AdmissionError(f"estimated {wait:.2f}s to finish, past the deadline")
+
+    def stats(self):
+        """Queue depth, queued cost, wait percentiles (seconds) and job counts."""
+        with self.condition:
+            waits = sorted(self.waits)
+            stats = dict(
+                policy=self.policy,
+                queue_depth=len(self.pending),
+                queued_cost=self.pending_cost,
+                outstanding_frames=self.outstanding_frames,
+                seconds_per_cost=self.seconds_per_cost,
+                step_seconds=self.step_seconds,
+                **self.counts,
+            )
+        for name, q in (("wait_p50", 0.5), ("wait_p95", 0.95), ("wait_max", 1.0)):
+            stats[name] = waits[min(int(q * len(waits)), len(waits) - 1)] if waits else None
+        return stats
+
+    def _late(self, job, now):
+        # a job is late if it cannot finish by its deadline even when started now
+        if job["deadline"] is None:
+            return False
+        return now + job["cost"] * (self.seconds_per_cost or 0) > job["deadline"]
+
+    def _next_batch(self):
+        # called with the lock held, returns the batch to sample and the jobs shed for their deadline
+        now = time.monotonic()
+        shed = [job for job in self.pending if self._late(job, now)]
+        shed_ids = set(map(id, shed))
+
+        order = sorted((job for job in self.pending if id(job) not in shed_ids), key=POLICIES[self.policy])
+        batch, longest = [], 0
+        for job in order:
+            if job["settings"] != order[0]["settings"]:
+                continue
+            if batch and (len(batch) + 1) * max(longest, job["duration"]) > self.max_batch_frames:
+                continue
+            batch.append(job)
+            longest = max(longest, job["duration"])
+
+        taken = shed_ids | set(map(id, batch))
+        self.pending = [job for job in self.pending if id(job) not in taken]
+        self.pending_cost -= sum(job["cost"] for job in batch + shed)
+        self.counts["shed"] += len(shed)
+        self.waits.extend(now - job["submitted"] for job in batch)
+        return batch, shed
+
+    def _loop(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+            if self.max_wait > 0:
+                time.sleep(self.max_wait)
+            with self.condition:
+                if not self.pending:
+                    continue
+                batch, shed = self._next_batch()
+
+            for job in shed:
+                if job["future"].set_running_or_notify_cancel():
+                    job["future"].set_exception(AdmissionError("shed, the deadline can no longer be met"))
+            batch = [job for job in batch if job["future"].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                start = time.perf_counter()
+                results = self._run(batch)
+                # padded frames are what the batch really costs
+                elapsed, steps = time.perf_counter() - start, batch[0]["settings"][0]
+                seconds_per_cost = elapsed / (len(batch) * max(job["duration"] for job in batch) * steps)
+                with self.condition:
+                    if self.seconds_per_cost is None:
+                        self.seconds_per_cost, self.step_seconds = seconds_per_cost, elapsed / steps
+                    else:
+                        self.seconds_per_cost = 0.8 * self.seconds_per_cost + 0.2 * seconds_per_cost
+                        self.step_seconds = 0.8 * self.step_seconds + 0.2 * elapsed / steps
+                    self.counts["served"] += len(batch)
+                # resolved only once counted, so a woken caller sees the batch in stats() and estimate_wait()
+                for job, result in results:
+                    job["future"].set_result(result)
+            except Exception as e:
+                for job in batch:
+                    if not job["future"].done():
+                        job["future"].set_exception(e)
+
+    def _run(self, batch):
+        # returns the (job, result) pairs, the caller resolves the futures
+        steps, cfg_strength, sway_sampling_coef, cfg_every = batch[0]["settings"]
+        with torch.inference_mode():
+            generated, _ = self.model_obj.sample(
+                cond=pad_sequence([job["cond"] for job in batch], batch_first=True),
+                text=[job["text"] for job in batch],
+                duration=torch.tensor([job["duration"] for job in batch], device=self.device, dtype=torch.long),
+                lens=torch.tensor([job["cond"].shape[0] for job in batch], device=self.device, dtype=torch.long),
+                steps=steps,
+                cfg_strength=cfg_strength,
+                sway_sampling_coef=sway_sampling_coef,
+                cfg_every=cfg_every,
+                seed=[job["seed"] for job in batch],
+            )
+
+            generated = generated.to(torch.float32)
+            results = []
+            for j, job in enumerate(batch):
+                generated_mel_spec = generated[j : j + 1, job["ref_audio_len"] : job["duration"], :].permute(0, 2, 1)
+                if self.mel_spec_type == "vocos":
+                    generated_wave = self.vocoder.decode(generated_mel_spec)
+                elif self.mel_spec_type == "bigvgan":
+                    generated_wave = self.vocoder(generated_mel_spec)
+                if job["rms"] < self.target_rms:
+                    generated_wave = generated_wave * job["rms"] / self.target_rms
+
+                result = generated_wave.squeeze().cpu().numpy(), target_sample_rate, generated_mel_spec[0].cpu().numpy()
+                if job["key"] is not None:
+                    try:
+                        self.result_cache.put(job["key"], result)
+                    except OSError as e:  # a full or read-only disk costs the cache entry, not the request
+                        print(f"Result cache write failed: {e}")
+                results.append((job, result))
+        return results
+
+
+# adaptive nfe defaults, the servers' --nfe_levels, --nfe_high_wait and --nfe_low_wait
+# levels as nfe_step[/cfg_every], best quality first: the last one is the quality floor under load
+NFE_LEVELS = "32,24,16,16/2"
+NFE_HIGH_WAIT = 2.0  # seconds of estimated queue wait above which a level cheaper is used
+NFE_LOW_WAIT = 0.5  # and below which a level better
+
+
+def parse_nfe_levels(levels):
+    """[dict(nfe_step, cfg_every), ...] of a comma separated "nfe_step[/cfg_every]" list, e.g. NFE_LEVELS."""
+    parsed = []
+    for level in levels.split(","):
+        nfe, _, every = level.strip().partition("/")
+        try:
+            parsed.append(dict(nfe_step=int(nfe), cfg_every=int(every or 1)))
+        except ValueError:
+            raise ValueError(f"nfe level {level.strip()!r} is not nfe_step[/cfg_every]") from None
+        if parsed[-1]["nfe_step"] < 1 or parsed[-1]["cfg_every"] < 1:
+            raise ValueError(f"nfe level {level.strip()!r} should have nfe_step and cfg_every of at least 1")
+    return parsed
+
+
+class NFEController:
+    """
+    Picks the sampling settings of new requests from the scheduler's load.
+
+    levels go from best quality to cheapest, by default (NFE_LEVELS) 32 -> 24 -> 16 nfe and finally 16 nfe with
+    the cfg null branch only every 2nd step. The controller steps one level down while the estimated queue wait
+    is above high_wait (or the queue is deeper than high_depth), and one level back up once it is below low_wait,
+    at most once per interval seconds, so the settings do not flap.
+    """
+
+    def __init__(
+        self,
+        scheduler,
+        levels=None,
+        high_wait=NFE_HIGH_WAIT,
+        low_wait=NFE_LOW_WAIT,
+        high_depth=None,
+        interval=1.0,
+    ):
+        assert low_wait <= high_wait, "low_wait should not be above high_wait"
+        self.scheduler = scheduler
+        self.levels = levels or parse_nfe_levels(NFE_LEVELS)
+        self.high_wait = high_wait
+        self.low_wait = low_wait
+        self.high_depth = high_depth
+        self.interval = interval
+
+        self.level = 0
+        self.updated = -math.inf
+        self.lock = threading.Lock()
+
+    def settings(self):
+        """Settings for a request starting now, a copy of the current level."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.updated >= self.interval:
+                self.updated = now
+                stats = self.scheduler.stats()
+                wait = self.scheduler.estimate_wait() or 0.0
+                overloaded = wait > self.high_wait or (
+                    self.high_depth is not None and stats["queue_depth"] > self.high_depth
+                )
+                if overloaded and self.level < len(self.levels) - 1:
+                    self.level += 1
+                elif not overloaded and wait < self.low_wait and self.level > 0:
+                    self.level -= 1
+            return dict(self.levels[self.level])
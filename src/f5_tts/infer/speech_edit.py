@@ -8,6 +8,7 @@ import torchaudio
 
 from f5_tts.infer.utils_infer import load_checkpoint, load_vocoder, save_spectrogram
 from f5_tts.model import CFM, DiT, UNetT
+from f5_tts.model.frontend import resample
 from f5_tts.model.utils import convert_char_to_pinyin, get_tokenizer
 
 device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
@@ -124,8 +125,7 @@ rms = torch.sqrt(torch.mean(torch.square(audio)))
 if rms < target_rms:
     audio = audio * target_rms / rms
 if sr != target_sample_rate:
-    resampler = torchaudio.transforms.Resample(sr, target_sample_rate)
-    audio = resampler(audio)
+    audio = resample(audio, sr, target_sample_rate)
 offset = 0
 audio_ = torch.zeros(1, 0)
 edit_mask = torch.zeros(1, 0, dtype=torch.bool)
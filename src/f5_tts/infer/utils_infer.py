@@ -7,8 +7,10 @@ os.environ["PYTOCH_ENABLE_MPS_FALLBACK"] = "1"  # for MPS device compatibility
 sys.path.append(f"../../{os.path.dirname(os.path.abspath(__file__))}/third_party/BigVGAN/")
 
 import hashlib
+import io
 import re
-import tempfile
+import threading
+from collections import OrderedDict
 from importlib.resources import files
 
 import matplotlib
@@ -17,21 +19,28 @@ matplotlib.use("Agg")
 
 import matplotlib.pylab as plt
 import numpy as np
+import soundfile as sf
 import torch
 import torchaudio
 import tqdm
 from huggingface_hub import snapshot_download, hf_hub_download
-from pydub import AudioSegment, silence
 from transformers import pipeline
 from vocos import Vocos
 
+from f5_tts.infer.result_cache import ResultCache, file_fingerprint, normalize_text
+from f5_tts.infer.utils_silence import compact_silence, mel_trailing_silence, trim_reference
 from f5_tts.model import CFM
+from f5_tts.model.frontend import resample
 from f5_tts.model.utils import (
     get_tokenizer,
     convert_char_to_pinyin,
 )
 
 _ref_audio_cache = {}
+_preprocess_cache = OrderedDict()  # (audio key, ref_text, clip_short) -> ((trimmed audio, sample_rate), ref_text)
+_voice_cache = OrderedDict()  # (audio key, ref_text, mel extractor, target_rms, device, indic) -> prepared voice
+voice_cache_size = 16
+_cache_lock = threading.Lock()  # the lru caches are shared by server threads
 
 device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
 
@@ -49,8 +58,16 @@ ode_method = "euler"
 nfe_step = 32  # 16, 32
 cfg_strength = 2.0
 sway_sampling_coef = -1.0
+cfg_interval = None  # (t_lo, t_hi), apply cfg only within, None for the whole schedule
+cfg_every = 1  # evaluate cfg null branch every k-th step within the interval, reuse its guidance in between
+feature_cache_depth = None  # e.g. 4, blocks always recomputed, deeper ones reused across steps
+feature_cache_interval = 2  # full forward every k-th step when feature_cache_depth is set
 speed = 1.0
 fix_duration = None
+result_cache = None  # ResultCache to reuse identical results across calls and processes, opt-in
+max_batch_frames = 8192  # chunks of one request sampled together while batch size * longest duration fits
+stitch = "wave"  # "wave": vocode each chunk, cross-fade the waves; "mel": cross-fade the mels, vocode once
+vocoder_window_frames = None  # with stitch "mel", vocode in overlapping windows of this many frames, e.g. 2048
 
 # -----------------------------------------
 
@@ -206,6 +223,7 @@ def load_checkpoint(model, ckpt_path, device: str, dtype=None, use_ema=True):
     del checkpoint
     torch.cuda.empty_cache()
 
+    model.ckpt_fingerprint = file_fingerprint(ckpt_path)  # identifies the weights in result cache keys
     return model.to(device)
 
 
@@ -253,69 +271,106 @@ def load_model(
     return model
 
 
-def remove_silence_edges(audio, silence_threshold=-42):
-    # Remove silence from the start
-    non_silent_start_idx = silence.detect_leading_silence(audio, silence_threshold=silence_threshold)
-    audio = audio[non_silent_start_idx:]
+# preprocess reference audio and text
 
-    # Remove silence from the end
-    non_silent_end_duration = audio.duration_seconds
-    for ms in reversed(audio):
-        if ms.dBFS > silence_threshold:
-            break
-        non_silent_end_duration -= 0.001
-    trimmed_audio = audio[: int(non_silent_end_duration * 1000)]
 
-    return trimmed_audio
+def _file_key(path):
+    # identifies the file content well enough for the per-process caches, None if not a local file
+    if not isinstance(path, (str, os.PathLike)) or not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
 
 
-# preprocess reference audio and text
+def _cache_get(cache, key):
+    if key is None:
+        return None
+    with _cache_lock:
+        if key not in cache:
+            return None
+        cache.move_to_end(key)
+        return cache[key]
+
+
+def _cache_put(cache, key, value):
+    if key is None:
+        return
+    with _cache_lock:
+        cache[key] = value
+        while len(cache) > voice_cache_size:
+            cache.popitem(last=False)
+
+
+def voice_key(path):
+    """Key of a local file's current content, for caching a voice prepared from it, None if not a local file."""
+    return _file_key(path)
+
+
+def cached_voice(key):
+    """Voice cached under key by cache_voice or load_voice, None if there is none."""
+    return _cache_get(_voice_cache, key)
+
+
+def cache_voice(key, voice):
+    """Keeps a prepared voice in the per-process lru cache shared with load_voice, nothing for a None key."""
+    _cache_put(_voice_cache, key, voice)
+
+
+def _pcm_hash(audio):
+    audio = audio.cpu().numpy() if isinstance(audio, torch.Tensor) else np.asarray(audio)
+    return hashlib.sha256(np.ascontiguousarray(audio).tobytes()).hexdigest()
+
+
+def _ref_audio_key(ref_audio):
+    # cache key of a reference given as a path, encoded bytes or (audio, sample_rate), None for file objects
+    if isinstance(ref_audio, tuple):
+        return "pcm", _pcm_hash(ref_audio[0]), ref_audio[1]
+    if isinstance(ref_audio, (bytes, bytearray, memoryview)):
+        return "bytes", hashlib.sha256(ref_audio).hexdigest()
+    return _file_key(ref_audio)
+
+
+def decode_ref_audio(ref_audio):
+    """
+    (audio, sample_rate) of a reference, audio a float32 (channels, samples) tensor.
+    ref_audio is a path, encoded bytes (e.g. an upload), a file object, or already (audio, sample_rate)
+    with audio a numpy array or tensor, (samples,) or (channels, samples), float or integer pcm.
+    """
+    if isinstance(ref_audio, tuple):
+        audio, sample_rate = ref_audio
+        audio = torch.as_tensor(audio)
+        if not audio.is_floating_point():
+            audio = audio.float() / (torch.iinfo(audio.dtype).max + 1)
+        audio = audio.float()
+        return audio[None] if audio.dim() == 1 else audio, sample_rate
+    if isinstance(ref_audio, (bytes, bytearray, memoryview)):
+        ref_audio = io.BytesIO(ref_audio)
+    return torchaudio.load(ref_audio)
 
 
 def preprocess_ref_audio_text(ref_audio_orig, ref_text, clip_short=True, show_info=print, device=device):
+    """
+    Trims the reference audio (see utils_silence.trim_reference) and transcribes it if ref_text is empty.
+    ref_audio_orig is anything decode_ref_audio takes.
+
+    Returns ((audio, sample_rate), ref_text), audio the trimmed float32 (channels, samples) tensor, which
+    load_voice, infer_process and infer_batch_process take as ref_audio. Earlier versions returned the path
+    of a temporary wav file instead; code that needs a file writes one, e.g. torchaudio.save(path, audio, sample_rate).
+    """
+    audio_key = _ref_audio_key(ref_audio_orig)
+    cache_key = (audio_key, ref_text, clip_short) if audio_key is not None else None
+    cached = _cache_get(_preprocess_cache, cache_key)
+    if cached is not None:
+        show_info("Using cached reference audio...")
+        return cached
+
     show_info("Converting audio...")
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:
-        aseg = AudioSegment.from_file(ref_audio_orig)
+    audio, sample_rate = decode_ref_audio(ref_audio_orig)
+    audio = trim_reference(audio.numpy(), sample_rate, clip_short=clip_short, show_info=show_info)
+    ref_audio = torch.from_numpy(audio), sample_rate
 
-        if clip_short:
-            # 1. try to find long silence for clipping
-            non_silent_segs = silence.split_on_silence(
-                aseg, min_silence_len=1000, silence_thresh=-50, keep_silence=1000, seek_step=10
-            )
-            non_silent_wave = AudioSegment.silent(duration=0)
-            for non_silent_seg in non_silent_segs:
-                if len(non_silent_wave) > 6000 and len(non_silent_wave + non_silent_seg) > 15000:
-                    show_info("Audio is over 15s, clipping short. (1)")
-                    break
-                non_silent_wave += non_silent_seg
-
-            # 2. try to find short silence for clipping if 1. failed
-            if len(non_silent_wave) > 15000:
-                non_silent_segs = silence.split_on_silence(
-                    aseg, min_silence_len=100, silence_thresh=-40, keep_silence=1000, seek_step=10
-                )
-                non_silent_wave = AudioSegment.silent(duration=0)
-                for non_silent_seg in non_silent_segs:
-                    if len(non_silent_wave) > 6000 and len(non_silent_wave + non_silent_seg) > 15000:
-                        show_info("Audio is over 15s, clipping short. (2)")
-                        break
-                    non_silent_wave += non_silent_seg
-
-            aseg = non_silent_wave
-
-            # 3. if no proper silence found for clipping
-            if len(aseg) > 15000:
-                aseg = aseg[:15000]
-                show_info("Audio is over 15s, clipping short. (3)")
-
-        aseg = remove_silence_edges(aseg) + AudioSegment.silent(duration=50)
-        aseg.export(f.name, format="wav")
-        ref_audio = f.name
-
-    # Compute a hash of the reference audio file
-    with open(ref_audio, "rb") as audio_file:
-        audio_data = audio_file.read()
-        audio_hash = hashlib.md5(audio_data).hexdigest()
+    # Compute a hash of the reference audio samples
+    audio_hash = _pcm_hash(audio)
 
     if not ref_text.strip():
         global _ref_audio_cache
@@ -325,7 +380,7 @@ def preprocess_ref_audio_text(ref_audio_orig, ref_text, clip_short=True, show_in
             ref_text = _ref_audio_cache[audio_hash]
         else:
             show_info("No reference text provided, transcribing reference audio...")
-            ref_text = transcribe(ref_audio)
+            ref_text = transcribe({"raw": audio.mean(axis=0), "sampling_rate": sample_rate})
             # Cache the transcribed text (not caching custom ref_text, enabling users to do manual tweak)
             _ref_audio_cache[audio_hash] = ref_text
     else:
@@ -340,9 +395,49 @@ def preprocess_ref_audio_text(ref_audio_orig, ref_text, clip_short=True, show_in
 
     print("ref_text  ", ref_text)
 
+    _cache_put(_preprocess_cache, cache_key, (ref_audio, ref_text))
     return ref_audio, ref_text
 
 
+# load a preprocessed reference as fully prepared conditioning, kept in a per-process lru cache
+# the mel is taken with model_obj.mel_spec, so entries are tied to its extractor and the device
+
+
+def load_voice(ref_audio, ref_text, model_obj, target_rms=target_rms, device=device, indic=False):
+    audio_key = _ref_audio_key(ref_audio)
+    mel_spec = model_obj.mel_spec
+    extractor_key = (mel_spec.extractor, mel_spec.n_mel_channels, mel_spec.hop_length)
+    cache_key = (audio_key, ref_text, extractor_key, target_rms, str(device), indic) if audio_key is not None else None
+    voice = _cache_get(_voice_cache, cache_key)
+    if voice is not None:
+        return voice
+
+    audio, rms = normalize_ref_audio(decode_ref_audio(ref_audio), target_rms=target_rms, device=device)
+    voice = make_voice(audio, rms, ref_text, model_obj, indic=indic)
+    _cache_put(_voice_cache, cache_key, voice)
+    return voice
+
+
+def make_voice(audio, rms, ref_text, model_obj, indic=False, text=None):
+    """Voice dict from a normalised reference, text is the model input form of ref_text if already converted."""
+    with torch.inference_mode():
+        cond = model_obj.mel_spec(audio).permute(0, 2, 1)
+
+    if len(ref_text[-1].encode("utf-8")) == 1:
+        ref_text = ref_text + " "
+    if text is None:
+        text = convert_char_to_pinyin([ref_text])[0] if not indic else ref_text
+    return dict(
+        audio=audio,  # mono, normalised, at target_sample_rate
+        rms=rms,
+        cond=cond,  # 1 n d
+        ref_audio_len=audio.shape[-1] // hop_length,
+        ref_text=ref_text,
+        text=text,  # model input form of ref_text
+        hash=hashlib.sha256(audio.cpu().numpy().tobytes() + ref_text.encode("utf-8")).hexdigest(),
+    )
+
+
 # infer process: chunk text -> infer batches [i.e. infer_batch_process()]
 
 
@@ -363,34 +458,117 @@ def infer_process(
     speed=speed,
     fix_duration=fix_duration,
     device=device,
-    indic = False
+    indic = False,
+    cfg_interval=cfg_interval,
+    cfg_every=cfg_every,
+    feature_cache_depth=feature_cache_depth,
+    feature_cache_interval=feature_cache_interval,
+    max_batch_frames=max_batch_frames,
+    result_cache=result_cache,
+    seed=None,
+    voice=None,
+    trim_silence=False,
+    stitch=stitch,
+    vocoder_window_frames=vocoder_window_frames,
 ):
+    # voice from load_voice() or a voice profile replaces ref_audio and ref_text
+    if voice is None:
+        voice = load_voice(ref_audio, ref_text, model_obj, target_rms=target_rms, device=device, indic=indic)
+    if ref_text is None:
+        ref_text = voice["ref_text"]
+
+    # seed is only part of the result cache key, the caller seeds the generator
+    cache_key = None
+    if result_cache is not None and getattr(model_obj, "ckpt_fingerprint", None):
+        cache_key = ResultCache.key(
+            model=model_obj.ckpt_fingerprint,
+            voice=voice["hash"],
+            text=normalize_text(gen_text),
+            mel_spec_type=mel_spec_type,
+            ode_method=model_obj.odeint_kwargs.get("method"),
+            settings=[nfe_step, cfg_strength, sway_sampling_coef, cfg_interval, cfg_every],
+            feature_cache=[feature_cache_depth, feature_cache_interval],
+            target_rms=target_rms,
+            cross_fade_duration=cross_fade_duration,
+            speed=speed,
+            fix_duration=fix_duration,
+            seed=seed,
+            indic=indic,
+            trim_silence=trim_silence,
+            stitch=[stitch, vocoder_window_frames],
+        )
+
+    def generate():
+        return _infer_chunks(
+            voice,
+            ref_text,
+            gen_text,
+            model_obj,
+            vocoder,
+            mel_spec_type=mel_spec_type,
+            show_info=show_info,
+            progress=progress,
+            target_rms=target_rms,
+            cross_fade_duration=cross_fade_duration,
+            nfe_step=nfe_step,
+            cfg_strength=cfg_strength,
+            sway_sampling_coef=sway_sampling_coef,
+            speed=speed,
+            fix_duration=fix_duration,
+            device=device,
+            indic=indic,
+            cfg_interval=cfg_interval,
+            cfg_every=cfg_every,
+            feature_cache_depth=feature_cache_depth,
+            feature_cache_interval=feature_cache_interval,
+            max_batch_frames=max_batch_frames,
+            trim_silence=trim_silence,
+            stitch=stitch,
+            vocoder_window_frames=vocoder_window_frames,
+        )
+
+    if cache_key is None:
+        return generate()
+    # a cached result is returned as is, identical calls in flight meanwhile wait for this one to generate
+    return result_cache.get_or_compute(cache_key, generate)
+
+
+def _infer_chunks(voice, ref_text, gen_text, model_obj, vocoder, show_info=print, **kwargs):
     # Split the input text into batches
-    audio, sr = torchaudio.load(ref_audio)
-    max_chars = int(len(ref_text.encode("utf-8")) / (audio.shape[-1] / sr) * (25 - audio.shape[-1] / sr))
+    ref_audio_duration = voice["audio"].shape[-1] / target_sample_rate
+    max_chars = int(len(ref_text.encode("utf-8")) / ref_audio_duration * (25 - ref_audio_duration))
     gen_text_batches = chunk_text(gen_text, max_chars=max_chars)
     for i, gen_text in enumerate(gen_text_batches):
         print(f"gen_text {i}", gen_text)
 
     show_info(f"Generating audio in {len(gen_text_batches)} batches...")
-    return infer_batch_process(
-        (audio, sr),
-        ref_text,
-        gen_text_batches,
-        model_obj,
-        vocoder,
-        mel_spec_type=mel_spec_type,
-        progress=progress,
-        target_rms=target_rms,
-        cross_fade_duration=cross_fade_duration,
-        nfe_step=nfe_step,
-        cfg_strength=cfg_strength,
-        sway_sampling_coef=sway_sampling_coef,
-        speed=speed,
-        fix_duration=fix_duration,
-        device=device,
-        indic = indic
-    )
+    return infer_batch_process(None, ref_text, gen_text_batches, model_obj, vocoder, voice=voice, **kwargs)
+
+
+# mono, loudness-normalised, resampled reference, returns the original rms to restore on the output
+
+
+def normalize_ref_audio(ref_audio, target_rms=0.1, device=None):
+    audio, sr = ref_audio
+    if audio.shape[0] > 1:
+        audio = torch.mean(audio, dim=0, keepdim=True)
+
+    rms = torch.sqrt(torch.mean(torch.square(audio)))
+    if rms < target_rms:
+        audio = audio * target_rms / rms
+    audio = resample(audio, sr, target_sample_rate)
+    return audio.to(device), rms
+
+
+# total mel frames (reference + generated) for one chunk
+
+
+def estimate_duration(ref_audio_len, ref_text, gen_text, speed=1, fix_duration=None):
+    if fix_duration is not None:
+        return int(fix_duration * target_sample_rate / hop_length)
+    ref_text_len = len(ref_text.encode("utf-8"))
+    gen_text_len = len(gen_text.encode("utf-8"))
+    return ref_audio_len + int(ref_audio_len / ref_text_len * gen_text_len / speed)
 
 
 # infer batches
@@ -412,68 +590,108 @@ def infer_batch_process(
     speed=1,
     fix_duration=None,
     device=None,
-    indic = False
+    indic = False,
+    cfg_interval=None,
+    cfg_every=1,
+    feature_cache_depth=None,
+    feature_cache_interval=2,
+    max_batch_frames=8192,
+    voice=None,
+    trim_silence=False,
+    stitch="wave",
+    vocoder_window_frames=None,
 ):
-    audio, sr = ref_audio
-    if audio.shape[0] > 1:
-        audio = torch.mean(audio, dim=0, keepdim=True)
-
-    rms = torch.sqrt(torch.mean(torch.square(audio)))
-    if rms < target_rms:
-        audio = audio * target_rms / rms
-    if sr != target_sample_rate:
-        resampler = torchaudio.transforms.Resample(sr, target_sample_rate)
-        audio = resampler(audio)
-    audio = audio.to(device)
+    # voice from load_voice() replaces ref_audio and ref_text, skipping their preparation
+    # trim_silence cuts long trailing silence of each chunk from its mel, before the vocoder runs, so it changes the
+    # returned wave; its threshold is relative to the loudest frame (see mel_trailing_silence), opt-in apart from
+    # compact_silence, which remove_silence applies to the finished wave
+    # stitch "mel" joins the chunk mels and vocodes them in one pass (or in vocoder_window_frames windows),
+    # instead of one vocoder call per chunk and a cross-fade of the waves
+    assert stitch in ("wave", "mel"), f"stitch is 'wave' or 'mel', not {stitch!r}"
+    if voice is None:
+        audio, rms = normalize_ref_audio(ref_audio, target_rms=target_rms, device=device)
+        if len(ref_text[-1].encode("utf-8")) == 1:
+            ref_text = ref_text + " "
+        # the reference is shared by all chunks, so take its mel once and let every batch reuse it
+        with torch.inference_mode():
+            cond = model_obj.mel_spec(audio).permute(0, 2, 1)
+    else:
+        audio, rms, cond, ref_text = voice["audio"], voice["rms"], voice["cond"], voice["ref_text"]
+    cond_seq_len = cond.shape[1]
+    ref_audio_len = audio.shape[-1] // hop_length
 
     generated_waves = []
     spectrograms = []
-
-    if len(ref_text[-1].encode("utf-8")) == 1:
-        ref_text = ref_text + " "
-    for i, gen_text in enumerate(progress.tqdm(gen_text_batches)):
-        # Prepare the text
-        text_list = [ref_text + gen_text]
-        if not indic:
-            final_text_list = convert_char_to_pinyin(text_list)
+    generated_mels = []
+
+    # prepare text and target duration per chunk
+    final_texts, durations = [], []
+    for gen_text in gen_text_batches:
+        if voice is None:
+            text = ref_text + gen_text
+            final_texts.append(convert_char_to_pinyin([text])[0] if not indic else text)
         else:
-            final_text_list = list(text_list)
-
-        ref_audio_len = audio.shape[-1] // hop_length
-        if fix_duration is not None:
-            duration = int(fix_duration * target_sample_rate / hop_length)
+            final_texts.append(voice["text"] + (convert_char_to_pinyin([gen_text])[0] if not indic else gen_text))
+
+        duration = estimate_duration(ref_audio_len, ref_text, gen_text, speed=speed, fix_duration=fix_duration)
+        # same bounds as CFM.sample applies, so each chunk can be cut from the padded batch output
+        duration = min(max(duration, cond_seq_len + 1, len(final_texts[-1]) + 1), 4096)
+        durations.append(duration)
+
+    # group consecutive chunks so that the padded batch stays within max_batch_frames
+    batches = []
+    for i in range(len(durations)):
+        if batches and (len(batches[-1]) + 1) * max(durations[j] for j in [*batches[-1], i]) <= max_batch_frames:
+            batches[-1].append(i)
         else:
-            # Calculate duration
-            ref_text_len = len(ref_text.encode("utf-8"))
-            gen_text_len = len(gen_text.encode("utf-8"))
-            duration = ref_audio_len + int(ref_audio_len / ref_text_len * gen_text_len / speed)
+            batches.append([i])
 
+    for batch in progress.tqdm(batches):
         # inference
         with torch.inference_mode():
             generated, _ = model_obj.sample(
-                cond=audio,
-                text=final_text_list,
-                duration=duration,
+                cond=cond.expand(len(batch), -1, -1),
+                text=[final_texts[i] for i in batch],
+                duration=torch.tensor([durations[i] for i in batch], device=device, dtype=torch.long),
                 steps=nfe_step,
                 cfg_strength=cfg_strength,
                 sway_sampling_coef=sway_sampling_coef,
+                cfg_interval=cfg_interval,
+                cfg_every=cfg_every,
+                feature_cache_depth=feature_cache_depth,
+                feature_cache_interval=feature_cache_interval,
             )
 
             generated = generated.to(torch.float32)
-            generated = generated[:, ref_audio_len:, :]
-            generated_mel_spec = generated.permute(0, 2, 1)
-            if mel_spec_type == "vocos":
-                generated_wave = vocoder.decode(generated_mel_spec)
-            elif mel_spec_type == "bigvgan":
-                generated_wave = vocoder(generated_mel_spec)
-            if rms < target_rms:
-                generated_wave = generated_wave * rms / target_rms
-
-            # wav -> numpy
-            generated_wave = generated_wave.squeeze().cpu().numpy()
-
-            generated_waves.append(generated_wave)
-            spectrograms.append(generated_mel_spec[0].cpu().numpy())
+            for j, i in enumerate(batch):
+                generated_mel_spec = generated[j : j + 1, ref_audio_len : durations[i], :].permute(0, 2, 1)
+                if trim_silence:
+                    keep = mel_trailing_silence(generated_mel_spec[0].cpu().numpy(), target_sample_rate, hop_length)
+                    generated_mel_spec = generated_mel_spec[:, :, :keep]
+                if stitch == "mel":
+                    generated_mels.append(generated_mel_spec)
+                    continue
+                if mel_spec_type == "vocos":
+                    generated_wave = vocoder.decode(generated_mel_spec)
+                elif mel_spec_type == "bigvgan":
+                    generated_wave = vocoder(generated_mel_spec)
+                if rms < target_rms:
+                    generated_wave = generated_wave * rms / target_rms
+
+                # wav -> numpy
+                generated_wave = generated_wave.squeeze().cpu().numpy()
+
+                generated_waves.append(generated_wave)
+                spectrograms.append(generated_mel_spec[0].cpu().numpy())
+
+    if stitch == "mel":
+        # the same cross-fade length, in frames
+        combined_mel = cross_fade_mels(generated_mels, int(cross_fade_duration * target_sample_rate / hop_length))
+        with torch.inference_mode():
+            final_wave = vocode_mel(vocoder, combined_mel, mel_spec_type, window_frames=vocoder_window_frames)
+        if rms < target_rms:
+            final_wave = final_wave * rms / target_rms
+        return final_wave.cpu().numpy(), target_sample_rate, combined_mel[0].cpu().numpy()
 
     # Combine all generated waves with cross-fading
     if cross_fade_duration <= 0:
@@ -518,19 +736,62 @@ def infer_batch_process(
     return final_wave, target_sample_rate, combined_spectrogram
 
 
+# mel-domain stitching, the chunks of a request vocoded as one
+
+
+def cross_fade_mels(mels, cross_fade_frames):
+    """(1, n_mels, frames) log mels joined in order, each overlapping the previous by up to cross_fade_frames."""
+    combined = mels[0]
+    for mel in mels[1:]:
+        overlap = min(cross_fade_frames, combined.shape[-1], mel.shape[-1])
+        if overlap <= 0:
+            combined = torch.cat([combined, mel], dim=-1)
+            continue
+        fade_in = torch.linspace(0, 1, overlap, device=mel.device, dtype=mel.dtype)
+        cross_faded = combined[..., -overlap:] * (1 - fade_in) + mel[..., :overlap] * fade_in
+        combined = torch.cat([combined[..., :-overlap], cross_faded, mel[..., overlap:]], dim=-1)
+    return combined
+
+
+def vocode_mel(vocoder, mel, mel_spec_type="vocos", window_frames=None, overlap_frames=32, batch_frames=8192):
+    """
+    Wave (samples,) of a (1, n_mels, frames) mel, in one vocoder call. With window_frames, the mel is cut into
+    windows of that many frames overlapping by at least overlap_frames, the last one aligned to the end so all
+    have the same length, and vocoded in batches of up to batch_frames; their waves are cross-faded over the
+    overlaps. This bounds vocoder memory on long mels.
+    """
+
+    def decode(mel):
+        if mel_spec_type == "vocos":
+            return vocoder.decode(mel)
+        return vocoder(mel).squeeze(1)  # bigvgan, b 1 nw -> b nw
+
+    num_frames = mel.shape[-1]
+    if window_frames is None or num_frames <= window_frames:
+        return decode(mel)[0]
+
+    overlap_frames = min(overlap_frames, window_frames - 1)
+    starts = list(range(0, num_frames - window_frames, window_frames - overlap_frames)) + [num_frames - window_frames]
+    windows = [mel[..., start : start + window_frames] for start in starts]
+    per_call = max(1, batch_frames // window_frames)
+    waves = torch.cat([decode(torch.cat(windows[i : i + per_call])) for i in range(0, len(windows), per_call)])
+    samples_per_frame = waves.shape[-1] // window_frames
+
+    wave = waves[0]
+    for i in range(1, len(starts)):
+        overlap = (starts[i - 1] + window_frames - starts[i]) * samples_per_frame
+        fade_in = torch.linspace(0, 1, overlap, device=wave.device, dtype=wave.dtype)
+        cross_faded = wave[-overlap:] * (1 - fade_in) + waves[i, :overlap] * fade_in
+        wave = torch.cat([wave[:-overlap], cross_faded, waves[i, overlap:]])
+    return wave
+
+
 # remove silence from generated wav
 
 
 def remove_silence_for_generated_wav(filename):
-    aseg = AudioSegment.from_file(filename)
-    non_silent_segs = silence.split_on_silence(
-        aseg, min_silence_len=1000, silence_thresh=-50, keep_silence=500, seek_step=10
-    )
-    non_silent_wave = AudioSegment.silent(duration=0)
-    for non_silent_seg in non_silent_segs:
-        non_silent_wave += non_silent_seg
-    aseg = non_silent_wave
-    aseg.export(filename, format="wav")
+    wave, sample_rate = sf.read(filename, dtype="float32")
+    sf.write(filename, compact_silence(wave.T, sample_rate).T, sample_rate)
 
 
 # save spectrogram
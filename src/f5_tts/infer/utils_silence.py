@@ -0,0 +1,217 @@
+# Silence detection and trimming on sample arrays, vectorised over windows
+# Same semantics as pydub.silence (millisecond positions, window rms against a dBFS threshold, windows running
+# past the end padded with zeros), but every window energy comes from one cumulative sum of the power,
+# so there are no AudioSegment round trips and no python loop per millisecond
+# audio is (samples,) or (channels, samples), float in [-1, 1], a numpy array or a cpu tensor, cut audio is numpy
+
+import numpy as np
+
+
+def db_to_amplitude(db):
+    return 10 ** (db / 20)
+
+
+def ms_to_samples(ms, sample_rate):
+    # truncated, as AudioSegment slicing, works on arrays of positions
+    return (np.asarray(ms) * (sample_rate / 1000.0)).astype(np.int64)
+
+
+def length_ms(num_samples, sample_rate):
+    # len() of an AudioSegment
+    return round(1000 * num_samples / sample_rate)
+
+
+def slice_ms(audio, sample_rate, start_ms, end_ms):
+    # audio[start_ms:end_ms] of an AudioSegment, which pads with zeros when the rounded length runs past the end
+    audio = np.asarray(audio)
+    start, end = int(ms_to_samples(start_ms, sample_rate)), int(ms_to_samples(end_ms, sample_rate))
+    piece = audio[..., start:end]
+    missing = end - max(start, audio.shape[-1])
+    if missing > 0:
+        piece = np.concatenate([piece, np.zeros((*audio.shape[:-1], missing), dtype=audio.dtype)], axis=-1)
+    return piece
+
+
+class WindowEnergy:
+    """Cumulative power of an audio array, the rms of any batch of [start, end) millisecond windows in one go."""
+
+    def __init__(self, audio, sample_rate):
+        audio = np.asarray(audio)
+        audio = audio[None] if audio.ndim == 1 else audio
+        self.channels, self.num_samples = audio.shape
+        self.sample_rate = sample_rate
+        self.length_ms = length_ms(self.num_samples, sample_rate)
+        power = np.square(audio, dtype=np.float64).sum(axis=0)
+        self.cumsum = np.concatenate([[0.0], np.cumsum(power)])
+
+    def rms(self, start_ms, end_ms):
+        start = ms_to_samples(start_ms, self.sample_rate)
+        end = ms_to_samples(end_ms, self.sample_rate)
+        count = (end - start) * self.channels  # over all channels, samples past the end count as zeros
+        total = self.cumsum[np.minimum(end, self.num_samples)] - self.cumsum[np.minimum(start, self.num_samples)]
+        total = np.maximum(total, 0)  # rounding in the cumulative sum
+        return np.sqrt(np.divide(total, count, out=np.zeros_like(total), where=count > 0))
+
+
+def detect_silence(audio, sample_rate, min_silence_len=1000, silence_thresh=-16, seek_step=1):
+    """[start, end] millisecond ranges of silence at least min_silence_len long, as pydub.silence.detect_silence."""
+    energy = WindowEnergy(audio, sample_rate)
+    seg_len = energy.length_ms
+    if seg_len < min_silence_len:
+        return []
+
+    last_slice_start = seg_len - min_silence_len
+    starts = np.arange(0, last_slice_start + 1, seek_step)
+    if last_slice_start % seek_step:
+        starts = np.append(starts, last_slice_start)
+    silent = starts[energy.rms(starts, starts + min_silence_len) <= db_to_amplitude(silence_thresh)]
+    if len(silent) == 0:
+        return []
+
+    # a range ends where the next silent window neither follows on nor overlaps it
+    gaps = np.diff(silent)
+    breaks = np.flatnonzero((gaps != seek_step) & (gaps > min_silence_len))
+    range_starts = silent[np.concatenate([[0], breaks + 1])]
+    range_ends = silent[np.concatenate([breaks, [len(silent) - 1]])] + min_silence_len
+    return [[int(start), int(end)] for start, end in zip(range_starts, range_ends)]
+
+
+def detect_nonsilent(audio, sample_rate, min_silence_len=1000, silence_thresh=-16, seek_step=1):
+    """[start, end] millisecond ranges between the silences, as pydub.silence.detect_nonsilent."""
+    silent_ranges = detect_silence(audio, sample_rate, min_silence_len, silence_thresh, seek_step)
+    seg_len = length_ms(np.asarray(audio).shape[-1], sample_rate)
+    if not silent_ranges:
+        return [[0, seg_len]]
+    if silent_ranges[0] == [0, seg_len]:
+        return []
+
+    nonsilent_ranges = []
+    prev_end = 0
+    for start, end in silent_ranges:
+        nonsilent_ranges.append([prev_end, start])
+        prev_end = end
+    if prev_end != seg_len:
+        nonsilent_ranges.append([prev_end, seg_len])
+    if nonsilent_ranges[0] == [0, 0]:
+        nonsilent_ranges.pop(0)
+    return nonsilent_ranges
+
+
+def split_on_silence(audio, sample_rate, min_silence_len=1000, silence_thresh=-16, keep_silence=100, seek_step=1):
+    """Non-silent pieces of audio with keep_silence ms kept around each, as pydub.silence.split_on_silence."""
+    seg_len = length_ms(np.asarray(audio).shape[-1], sample_rate)
+    if isinstance(keep_silence, bool):
+        keep_silence = seg_len if keep_silence else 0
+    ranges = [
+        [start - keep_silence, end + keep_silence]
+        for start, end in detect_nonsilent(audio, sample_rate, min_silence_len, silence_thresh, seek_step)
+    ]
+    # kept silence of neighbours meets halfway instead of overlapping
+    for previous, following in zip(ranges, ranges[1:]):
+        if following[0] < previous[1]:
+            previous[1] = following[0] = (previous[1] + following[0]) // 2
+    return [slice_ms(audio, sample_rate, max(start, 0), min(end, seg_len)) for start, end in ranges]
+
+
+def detect_leading_silence(audio, sample_rate, silence_threshold=-50.0, chunk_size=10):
+    """Milliseconds of silence at the start, in steps of chunk_size, as pydub.silence.detect_leading_silence."""
+    energy = WindowEnergy(audio, sample_rate)
+    starts = np.arange(0, energy.length_ms, chunk_size)
+    ends = np.minimum(starts + chunk_size, energy.length_ms)
+    loud = np.flatnonzero(energy.rms(starts, ends) >= db_to_amplitude(silence_threshold))
+    return int(starts[loud[0]]) if len(loud) else energy.length_ms
+
+
+def remove_silence_edges(audio, sample_rate, silence_threshold=-42):
+    """Audio without leading silence (10 ms steps) and trailing silence (1 ms steps)."""
+    start_ms = detect_leading_silence(audio, sample_rate, silence_threshold)
+    audio = slice_ms(audio, sample_rate, start_ms, length_ms(audio.shape[-1], sample_rate))
+
+    energy = WindowEnergy(audio, sample_rate)
+    ms = np.arange(energy.length_ms)
+    loud = np.flatnonzero(energy.rms(ms, ms + 1) > db_to_amplitude(silence_threshold))
+    trailing_ms = energy.length_ms - 1 - loud[-1] if len(loud) else energy.length_ms
+    # the end in seconds, less 1 ms per silent one, subtracted one at a time as pydub did, so it truncates the same
+    end_seconds = energy.num_samples / sample_rate
+    for _ in range(trailing_ms):
+        end_seconds -= 0.001
+    return slice_ms(audio, sample_rate, 0, max(int(end_seconds * 1000), 0))
+
+
+def _join_within(pieces, audio, sample_rate, show_info, message):
+    # pieces in order, stopping at the first one that takes a clip already over 6s past 15s
+    joined, num_samples = [], 0
+    for piece in pieces:
+        joined_ms = length_ms(num_samples, sample_rate)
+        if joined_ms > 6000 and length_ms(num_samples + piece.shape[-1], sample_rate) > 15000:
+            show_info(message)
+            break
+        joined.append(piece)
+        num_samples += piece.shape[-1]
+    return np.concatenate(joined, axis=-1) if joined else audio[..., :0]
+
+
+def trim_reference(audio, sample_rate, clip_short=True, show_info=print):
+    """
+    Reference audio cut to at most 15s, preferably at a long silence, then at a short one, else hard;
+    with silent edges removed and 50 ms of silence appended. Returns a numpy array shaped as the input.
+    """
+    audio = np.asarray(audio)
+    if clip_short:
+        # 1. try to find long silence for clipping
+        pieces = split_on_silence(
+            audio, sample_rate, min_silence_len=1000, silence_thresh=-50, keep_silence=1000, seek_step=10
+        )
+        clipped = _join_within(pieces, audio, sample_rate, show_info, "Audio is over 15s, clipping short. (1)")
+
+        # 2. try to find short silence for clipping if 1. failed
+        if length_ms(clipped.shape[-1], sample_rate) > 15000:
+            pieces = split_on_silence(
+                audio, sample_rate, min_silence_len=100, silence_thresh=-40, keep_silence=1000, seek_step=10
+            )
+            clipped = _join_within(pieces, audio, sample_rate, show_info, "Audio is over 15s, clipping short. (2)")
+        audio = clipped
+
+        # 3. if no proper silence found for clipping
+        if length_ms(audio.shape[-1], sample_rate) > 15000:
+            audio = audio[..., : int(ms_to_samples(15000, sample_rate))]
+            show_info("Audio is over 15s, clipping short. (3)")
+
+    audio = remove_silence_edges(audio, sample_rate)
+    silence = np.zeros((*audio.shape[:-1], int(ms_to_samples(50, sample_rate))), dtype=audio.dtype)
+    return np.concatenate([audio, silence], axis=-1)
+
+
+# silence in generated speech
+
+
+def compact_silence(wave, sample_rate, min_silence_len=1000, silence_thresh=-50, keep_silence=500, seek_step=10):
+    """
+    Generated audio with every silence longer than min_silence_len shortened to keep_silence ms on each side,
+    as split_on_silence then concatenating the pieces. Returns a numpy array shaped as the input.
+    """
+    wave = np.asarray(wave)
+    pieces = split_on_silence(wave, sample_rate, min_silence_len, silence_thresh, keep_silence, seek_step)
+    if not pieces:
+        return wave[..., :0]
+    return np.concatenate(pieces, axis=-1)
+
+
+def mel_trailing_silence(mel, sample_rate, hop_length, min_silence_len=1000, silence_thresh=-50, keep_silence=500):
+    """
+    Frames of a log mel spectrogram (n_mels, frames) to keep, cutting trailing silence before it is vocoded.
+    A frame is silent below silence_thresh dB relative to the loudest one, and trailing silence is only cut when
+    it lasts min_silence_len ms, keep_silence ms of it stay. All frames are kept otherwise.
+    Unlike compact_silence, whose silence_thresh is absolute dBFS, the mel carries no calibrated level.
+    """
+    mel = np.asarray(mel, dtype=np.float64)
+    num_frames = mel.shape[-1]
+    if num_frames == 0:
+        return 0
+    level = 20 * np.log10(np.maximum(np.exp(mel).mean(axis=0), 1e-10))  # per frame, mels are log magnitudes
+    loud = np.flatnonzero(level > level.max() + silence_thresh)
+    last = loud[-1] + 1 if len(loud) else 0
+    frame_ms = 1000 * hop_length / sample_rate
+    if (num_frames - last) * frame_ms < min_silence_len:
+        return num_frames
+    return min(num_frames, last + round(keep_silence / frame_ms))
@@ -0,0 +1,170 @@
+# Framing and encoding for streaming audio over a socket
+# every frame is a fixed header (kind, payload length) followed by the payload,
+# audio payloads are sent straight from the array buffer, so nothing is expanded per sample
+
+import io
+import json
+import struct
+
+import numpy as np
+import soundfile as sf
+
+FRAME_HEADER = struct.Struct("<BI")  # kind, payload bytes
+
+FRAME_AUDIO = 0  # audio in the format of the request, float32 little-endian mono samples by default
+FRAME_END = 1  # end of one response, empty payload
+FRAME_ERROR = 2  # utf-8 message, ends the response
+FRAME_REQUEST = 3  # utf-8 json object, client to server: text and optional voice, nfe_step, speed, seed, format
+FRAME_STATS = 4  # utf-8 json object, server queue statistics, the reply to a {"stats": true} request
+FRAME_INFO = 5  # utf-8 json object, the settings a response is generated with, sent before its audio
+
+
+def send_frame(sock, kind, payload=b""):
+    payload = memoryview(payload).cast("B")
+    sock.sendall(FRAME_HEADER.pack(kind, payload.nbytes))
+    if payload.nbytes:
+        sock.sendall(payload)
+
+
+def send_audio(sock, wave):
+    send_frame(sock, FRAME_AUDIO, np.ascontiguousarray(wave, dtype="<f4"))
+
+
+def send_end(sock):
+    send_frame(sock, FRAME_END)
+
+
+def send_error(sock, message):
+    send_frame(sock, FRAME_ERROR, str(message).encode("utf-8"))
+
+
+def send_request(sock, text, **params):
+    send_frame(sock, FRAME_REQUEST, json.dumps(dict(text=text, **params)).encode("utf-8"))
+
+
+def recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("socket closed in the middle of a frame")
+        received += n
+    return buffer
+
+
+def recv_frame(sock):
+    """Returns (kind, payload bytes)."""
+    kind, size = FRAME_HEADER.unpack(recv_exactly(sock, FRAME_HEADER.size))
+    return kind, recv_exactly(sock, size) if size else bytearray()
+
+
+def recv_stream(sock, format="f32"):
+    """
+    Yields the audio of one response, stopping at its end frame.
+    Sample arrays for "f32" and "pcm16", the encoded bytes for compressed formats (concatenated they form the file).
+    """
+    while True:
+        kind, payload = recv_frame(sock)
+        if kind == FRAME_AUDIO:
+            yield np.frombuffer(payload, dtype=PCM_DTYPES[format]) if format in PCM_DTYPES else bytes(payload)
+        elif kind == FRAME_INFO:
+            continue
+        elif kind == FRAME_END:
+            return
+        elif kind == FRAME_ERROR:
+            raise RuntimeError(f"server error: {bytes(payload).decode('utf-8')}")
+        else:
+            raise ValueError(f"unknown frame kind {kind}")
+
+
+# output encodings, negotiated per request with its "format" field
+# pcm is a plain view or cast of the samples, compressed formats are encoded incrementally with libsndfile,
+# every call returns the bytes completed so far (possibly none), flush() ends the stream
+
+
+PCM_DTYPES = {"f32": "<f4", "pcm16": "<i2"}
+# no mp3: libsndfile seeks back on close to fill in the LAME header, over frames already sent,
+# and without that header decoders cannot tell the padded length
+SOUNDFILE_FORMATS = {"opus": ("OGG", "OPUS")}
+AUDIO_FORMATS = (*PCM_DTYPES, *SOUNDFILE_FORMATS)
+
+
+class PCMEncoder:
+    def __init__(self, format="f32"):
+        self.format = format
+        self.dtype = PCM_DTYPES[format]
+
+    def encode(self, wave):
+        if self.dtype == "<i2":
+            return (np.clip(wave, -1, 1) * 32767).astype(self.dtype)
+        return np.ascontiguousarray(wave, dtype=self.dtype)
+
+    def flush(self):
+        return b""
+
+
+class SoundFileEncoder:
+    def __init__(self, format="opus", sample_rate=24000):
+        self.format = format
+        container, subtype = SOUNDFILE_FORMATS[format]
+        if subtype not in sf.available_subtypes(container):
+            raise ValueError(f"{format} encoding is not supported by the installed libsndfile")
+        self.buffer = io.BytesIO()
+        self.sent = 0
+        self.file = sf.SoundFile(
+            self.buffer, mode="w", samplerate=sample_rate, channels=1, format=container, subtype=subtype
+        )
+
+    def _take(self):
+        # ogg is written front to back, so everything past what was sent is new
+        with self.buffer.getbuffer() as view:
+            data = view[self.sent :].tobytes()
+        self.sent += len(data)
+        return data
+
+    def encode(self, wave):
+        self.file.write(np.asarray(wave, dtype=np.float32))
+        return self._take()
+
+    def flush(self):
+        self.file.close()
+        return self._take()
+
+
+def get_encoder(format="f32", sample_rate=24000):
+    if format in PCM_DTYPES:
+        return PCMEncoder(format)
+    if format in SOUNDFILE_FORMATS:
+        return SoundFileEncoder(format, sample_rate=sample_rate)
+    raise ValueError(f"unknown audio format {format!r}, expected one of {', '.join(AUDIO_FORMATS)}")
+
+
+# asyncio counterparts for the server side
+
+
+def write_frame(writer, kind, payload=b""):
+    payload = memoryview(payload).cast("B")
+    writer.write(FRAME_HEADER.pack(kind, payload.nbytes))
+    if payload.nbytes:
+        writer.write(payload)
+
+
+class FrameTooLargeError(ValueError):
+    pass
+
+
+async def read_frame(reader, max_size=None):
+    """
+    Returns (kind, payload bytes), None on a clean end of the connection.
+    A payload over max_size bytes raises FrameTooLargeError with the payload left unread.
+    """
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except EOFError:
+        return None
+    kind, size = FRAME_HEADER.unpack(header)
+    if max_size is not None and size > max_size:
+        raise FrameTooLargeError(f"frame of {size} bytes, over the {max_size} byte limit")
+    return kind, await reader.readexactly(size) if size else b""
@@ -0,0 +1,172 @@
+# On-disk voice profiles: a reference prepared once and loaded by id afterwards
+# <store>/<voice_id>/wave.npy      float32 mono reference at target_sample_rate, silence trimmed, not yet normalised
+# <store>/<voice_id>/profile.json  ref_text, its model input form (pinyin), rms, indic
+# Loading a profile memory-maps the wave and skips pydub trimming, asr transcription and the pinyin conversion,
+# so a server with many voices starts without touching the original recordings
+
+import argparse
+import json
+import os
+import re
+import tempfile
+from importlib.resources import files
+
+import numpy as np
+import tomli
+import torch
+
+from f5_tts.infer.utils_infer import (
+    cache_voice,
+    cached_voice,
+    convert_char_to_pinyin,
+    device,
+    make_voice,
+    preprocess_ref_audio_text,
+    target_rms,
+    target_sample_rate,
+    voice_key,
+)
+from f5_tts.model.frontend import resample
+
+VOICE_ID = re.compile(r"^[\w.-]+$")
+
+
+def profile_dir(store_dir, voice_id):
+    if not VOICE_ID.match(voice_id) or voice_id.startswith("."):
+        raise ValueError(f"invalid voice id {voice_id!r}, use letters, digits, '_', '-' and '.'")
+    return os.path.join(store_dir, voice_id)
+
+
+def list_voice_profiles(store_dir):
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(
+        entry.name
+        for entry in os.scandir(store_dir)
+        if entry.is_dir() and os.path.isfile(os.path.join(entry.path, "profile.json"))
+    )
+
+
+def has_voice_profile(store_dir, voice_id):
+    try:
+        return os.path.isfile(os.path.join(profile_dir(store_dir, voice_id), "profile.json"))
+    except ValueError:
+        return False
+
+
+def _write_atomic(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def save_voice_profile(store_dir, voice_id, ref_audio, ref_text="", clip_short=True, indic=False, show_info=print):
+    """Trims, transcribes if ref_text is empty, and stores a reference under voice_id, replacing any previous one."""
+    path = profile_dir(store_dir, voice_id)
+    os.makedirs(path, exist_ok=True)
+
+    ref_audio, ref_text = preprocess_ref_audio_text(ref_audio, ref_text, clip_short=clip_short, show_info=show_info)
+    audio, sr = ref_audio  # trimmed, in memory
+    # same steps as normalize_ref_audio, except the gain, which depends on the target_rms at load time
+    if audio.shape[0] > 1:
+        audio = torch.mean(audio, dim=0, keepdim=True)
+    rms = torch.sqrt(torch.mean(torch.square(audio))).item()
+    if sr != target_sample_rate:
+        audio = resample(audio, sr, target_sample_rate)
+
+    text = ref_text + " " if len(ref_text[-1].encode("utf-8")) == 1 else ref_text  # as make_voice
+    profile = dict(
+        ref_text=ref_text,
+        text=convert_char_to_pinyin([text])[0] if not indic else text,
+        rms=rms,
+        indic=indic,
+        sample_rate=target_sample_rate,
+    )
+    # the wave first, so a profile.json on disk always describes a complete profile
+    _write_atomic(os.path.join(path, "wave.npy"), lambda f: np.save(f, audio[0].numpy().astype(np.float32)))
+    _write_atomic(
+        os.path.join(path, "profile.json"),
+        lambda f: f.write(json.dumps(profile, ensure_ascii=False, indent=2).encode("utf-8")),
+    )
+    show_info(f"Saved voice profile {voice_id!r} to {path}")
+    return path
+
+
+def load_voice_profile(store_dir, voice_id, model_obj, target_rms=target_rms, device=device):
+    """Voice dict of a stored profile, as load_voice returns for the original reference; cached per process."""
+    path = profile_dir(store_dir, voice_id)
+    profile_path = os.path.join(path, "profile.json")
+    file_key = voice_key(profile_path)
+    if file_key is None:
+        raise KeyError(f"no voice profile {voice_id!r} in {store_dir}")
+    mel_spec = model_obj.mel_spec
+    extractor_key = (mel_spec.extractor, mel_spec.n_mel_channels, mel_spec.hop_length)
+    cache_key = ("profile", file_key, extractor_key, target_rms, str(device))
+    voice = cached_voice(cache_key)
+    if voice is not None:
+        return voice
+
+    with open(profile_path, encoding="utf-8") as f:
+        profile = json.load(f)
+    if profile["sample_rate"] != target_sample_rate:
+        raise ValueError(f"voice profile {voice_id!r} is at {profile['sample_rate']} Hz, expected {target_sample_rate}")
+    wave = np.load(os.path.join(path, "wave.npy"), mmap_mode="r")
+    audio = torch.tensor(wave).unsqueeze(0)  # one copy straight from the page cache
+    rms = torch.tensor(profile["rms"])
+    if rms < target_rms:
+        audio = audio * target_rms / rms
+    voice = make_voice(
+        audio.to(device), rms, profile["ref_text"], model_obj, indic=profile["indic"], text=profile["text"]
+    )
+    cache_voice(cache_key, voice)
+    return voice
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="f5-tts_voice-profile",
+        description="Prepare reference voices once into a profile store, for the cli, api and socket server.",
+    )
+    parser.add_argument("--store", required=True, help="Directory of the voice profiles.")
+    parser.add_argument("--id", help="Id of the voice to add or replace.")
+    parser.add_argument("--ref_audio", help="Reference audio of the voice to add.")
+    parser.add_argument("--ref_text", default="", help="Transcript of the reference audio, transcribed if empty.")
+    parser.add_argument(
+        "--config",
+        help="Inference toml (e.g. infer/examples/multi/story.toml), adds its main voice and every [voices.<id>].",
+    )
+    parser.add_argument("--no_clip", action="store_true", help="Keep references longer than 15 s.")
+    parser.add_argument("--indic", action="store_true", help="Keep the text as is, for the Hindi checkpoint.")
+    parser.add_argument("--list", action="store_true", help="List the stored voice ids.")
+    args = parser.parse_args()
+
+    voices = {}
+    if args.config:
+        with open(args.config, "rb") as f:
+            config = tomli.load(f)
+        voices["main"] = (config["ref_audio"], config.get("ref_text", ""))
+        for voice_id, voice in config.get("voices", {}).items():
+            if "ref_audio" in voice:
+                voices[voice_id] = (voice["ref_audio"], voice.get("ref_text", ""))
+        for voice_id, (ref_audio, ref_text) in voices.items():
+            # the example configs name bundled files relative to the package
+            if ref_audio and not os.path.isfile(ref_audio):
+                voices[voice_id] = (str(files("f5_tts").joinpath(ref_audio)), ref_text)
+    if args.id or args.ref_audio:
+        if not (args.id and args.ref_audio):
+            parser.error("--id and --ref_audio go together")
+        voices[args.id] = (args.ref_audio, args.ref_text)
+
+    for voice_id, (ref_audio, ref_text) in voices.items():
+        if not ref_audio:
+            continue
+        save_voice_profile(args.store, voice_id, ref_audio, ref_text, clip_short=not args.no_clip, indic=args.indic)
+
+    if args.list or not voices:
+        for voice_id in list_voice_profiles(args.store):
+            print(voice_id)
+
+
+if __name__ == "__main__":
+    main()
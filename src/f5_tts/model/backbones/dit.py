@@ -9,6 +9,8 @@ d - dimension
 
 from __future__ import annotations
 
+from collections import OrderedDict
+
 import torch
 from torch import nn
 import torch.nn.functional as F
@@ -24,6 +26,13 @@ from f5_tts.model.modules import (
     precompute_freqs_cis,
     get_pos_embed_indices,
 )
+from f5_tts.model.utils import (
+    clear_cache_hook,
+    clear_null_embed_cache,
+    get_cached_features,
+    get_cached_null_embed,
+    parameters_version,
+)
 
 
 # Text embedding
@@ -75,6 +84,7 @@ class TextEmbedding(nn.Module):
 class InputEmbedding(nn.Module):
     def __init__(self, mel_dim, text_dim, out_dim):
         super().__init__()
+        self.mel_dim = mel_dim
         self.proj = nn.Linear(mel_dim * 2 + text_dim, out_dim)
         self.conv_pos_embed = ConvPositionEmbedding(dim=out_dim)
 
@@ -86,6 +96,20 @@ class InputEmbedding(nn.Module):
         x = self.conv_pos_embed(x) + x
         return x
 
+    def embed_cond(self, cond: float["b n d"], text_embed: float["b n d"]):  # noqa: F722
+        # step-invariant part of proj, i.e. cond & text columns with bias
+        return F.linear(torch.cat((cond, text_embed), dim=-1), self.proj.weight[:, self.mel_dim :], self.proj.bias)
+
+    def forward_cached(self, x: float["b n d"], cond_embeds: list[float["b n d"]]):  # noqa: F722
+        # x columns of proj computed once, shared by every branch in cond_embeds (packed along batch)
+        x = F.linear(x, self.proj.weight[:, : self.mel_dim])
+        if len(cond_embeds) == 1:
+            x = x + cond_embeds[0]
+        else:
+            x = torch.cat([x + cond_embed for cond_embed in cond_embeds], dim=0)
+        x = self.conv_pos_embed(x) + x
+        return x
+
 
 # Transformer backbone using DiT blocks
 
@@ -116,6 +140,10 @@ class DiT(nn.Module):
 
         self.rotary_embed = RotaryEmbedding(dim_head)
 
+        self.null_embed_cache = OrderedDict()  # (seq_len, device, dtype, version) -> null branch embedding
+        self.null_embed_cache_size = 16
+        self.register_load_state_dict_post_hook(clear_cache_hook)
+
         self.dim = dim
         self.depth = depth
 
@@ -127,6 +155,49 @@ class DiT(nn.Module):
         self.norm_out = AdaLayerNormZero_Final(dim)  # final modulation
         self.proj_out = nn.Linear(dim, mel_dim)
 
+    def get_step_cache(self, cond: float["b n d"], text: int["b nt"]):  # noqa: F722
+        # text & cond embeddings and rope are identical at every ode step, compute once per sample call
+        seq_len = cond.shape[1]
+        text_embed = self.text_embed(text, seq_len)
+        return dict(
+            cond=self.input_embed.embed_cond(cond, text_embed),
+            null=self.get_null_embed(seq_len, cond.device, cond.dtype),
+            rope=self.rotary_embed.forward_from_seq_len(seq_len),
+        )
+
+    def get_null_embed(self, seq_len, device, dtype):
+        # null branch (dropped cond & text) only depends on seq_len, shared by every request
+        # parameter versions are bumped by in-place updates (optimizer, ema, load_state_dict)
+        version = parameters_version(self.text_embed, self.input_embed.proj)
+        key = (seq_len, str(device), dtype, version)
+
+        def compute():
+            text = torch.zeros((1, seq_len), dtype=torch.long, device=device)
+            cond = torch.zeros((1, seq_len, self.input_embed.mel_dim), dtype=dtype, device=device)
+            return self.input_embed.embed_cond(cond, self.text_embed(text, seq_len, drop_text=True))
+
+        return get_cached_null_embed(self.null_embed_cache, self.null_embed_cache_size, key, compute)
+
+    def clear_cache(self):
+        clear_null_embed_cache(self.null_embed_cache)
+
+    def train(self, mode=True):
+        if mode:  # weights are about to change
+            self.clear_cache()
+        return super().train(mode)
+
+    def get_time_cache(self, time: float["s"]):  # noqa: F821
+        # time embedding and adaln modulation only depend on t, compute for the whole ode schedule at once
+        t = F.silu(self.time_embed(time)).unsqueeze(1)  # s d -> s 1 d
+        blocks = [block.attn_norm.linear(t).unbind(0) for block in self.transformer_blocks]
+        final = self.norm_out.linear(t).unbind(0)
+        return [dict(blocks=[mod[i] for mod in blocks], final=final[i]) for i in range(time.shape[0])]
+
+    def get_input_embed(self, x, cond, text, drop_audio_cond=False, drop_text=False):
+        seq_len = x.shape[1]
+        text_embed = self.text_embed(text, seq_len, drop_text=drop_text)
+        return self.input_embed(x, cond, text_embed, drop_audio_cond=drop_audio_cond)
+
     def forward(
         self,
         x: float["b n d"],  # nosied input audio  # noqa: F722
@@ -136,28 +207,65 @@ class DiT(nn.Module):
         drop_audio_cond,  # cfg for cond audio
         drop_text,  # cfg for text
         mask: bool["b n"] | None = None,  # noqa: F722
+        cfg_infer: bool = False,  # cfg inference, pack cond & null branch along batch
+        cache: dict | None = None,  # step-invariant embeddings from get_step_cache()
+        time_cache: dict | None = None,  # modulation of current step from get_time_cache()
+        feature_cache: dict | None = None,  # cross-step deep block reuse, see get_cached_features()
     ):
         batch, seq_len = x.shape[0], x.shape[1]
         if time.ndim == 0:
             time = time.repeat(batch)
 
         # t: conditioning time, c: context (text + masked cond audio), x: noised input audio
-        t = self.time_embed(time)
-        text_embed = self.text_embed(text, seq_len, drop_text=drop_text)
-        x = self.input_embed(x, cond, text_embed, drop_audio_cond=drop_audio_cond)
+        t = self.time_embed(time) if time_cache is None else None
+        if cache is not None:
+            if cfg_infer:
+                cond_embeds = [cache["cond"], cache["null"]]
+            else:
+                assert drop_audio_cond == drop_text, "cached embeddings only for full cond or full null branch"
+                cond_embeds = [cache["null"] if drop_audio_cond else cache["cond"]]
+            x = self.input_embed.forward_cached(x, cond_embeds)
+        elif cfg_infer:  # b n d -> 2b n d, output is [cond; null] along batch
+            x_cond = self.get_input_embed(x, cond, text, drop_audio_cond=False, drop_text=False)
+            x_null = self.get_input_embed(x, cond, text, drop_audio_cond=True, drop_text=True)
+            x = torch.cat((x_cond, x_null), dim=0)
+        else:
+            x = self.get_input_embed(x, cond, text, drop_audio_cond=drop_audio_cond, drop_text=drop_text)
 
-        rope = self.rotary_embed.forward_from_seq_len(seq_len)
+        if cfg_infer:
+            t = torch.cat((t, t), dim=0) if t is not None else None
+            mask = torch.cat((mask, mask), dim=0) if mask is not None else None
+
+        rope = cache["rope"] if cache is not None else self.rotary_embed.forward_from_seq_len(seq_len)
 
         if self.long_skip_connection is not None:
             residual = x
 
-        for block in self.transformer_blocks:
-            x = block(x, t, mask=mask, rope=rope)
+        modulations = time_cache["blocks"] if time_cache is not None else [None] * self.depth
+        blocks = list(zip(self.transformer_blocks, modulations))
+        if feature_cache is None:
+            for block, modulation in blocks:
+                x = block(x, t, mask=mask, rope=rope, modulation=modulation)
+        else:
+            # shallow blocks always run, residual added by the deep ones is reused from the last full step
+            shallow_depth = feature_cache["depth"]
+            assert 0 < shallow_depth < self.depth, f"feature cache depth should be in [1, {self.depth - 1}]"
+            for block, modulation in blocks[:shallow_depth]:
+                x = block(x, t, mask=mask, rope=rope, modulation=modulation)
+
+            deep_residual = get_cached_features(feature_cache, x.shape[0])
+            if deep_residual is not None:
+                x = x + deep_residual
+            else:
+                shallow_x = x
+                for block, modulation in blocks[shallow_depth:]:
+                    x = block(x, t, mask=mask, rope=rope, modulation=modulation)
+                feature_cache["features"] = x - shallow_x
 
         if self.long_skip_connection is not None:
             x = self.long_skip_connection(torch.cat((x, residual), dim=-1))
 
-        x = self.norm_out(x, t)
+        x = self.norm_out(x, t, modulation=time_cache["final"] if time_cache is not None else None)
         output = self.proj_out(x)
 
         return output
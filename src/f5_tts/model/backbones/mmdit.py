@@ -9,7 +9,10 @@ d - dimension
 
 from __future__ import annotations
 
+from collections import OrderedDict
+
 import torch
+import torch.nn.functional as F
 from torch import nn
 
 from x_transformers.x_transformers import RotaryEmbedding
@@ -22,6 +25,13 @@ from f5_tts.model.modules import (
     precompute_freqs_cis,
     get_pos_embed_indices,
 )
+from f5_tts.model.utils import (
+    clear_cache_hook,
+    clear_null_embed_cache,
+    get_cached_features,
+    get_cached_null_embed,
+    parameters_version,
+)
 
 
 # text embedding
@@ -58,6 +68,7 @@ class TextEmbedding(nn.Module):
 class AudioEmbedding(nn.Module):
     def __init__(self, in_dim, out_dim):
         super().__init__()
+        self.in_dim = in_dim
         self.linear = nn.Linear(2 * in_dim, out_dim)
         self.conv_pos_embed = ConvPositionEmbedding(out_dim)
 
@@ -69,6 +80,20 @@ class AudioEmbedding(nn.Module):
         x = self.conv_pos_embed(x) + x
         return x
 
+    def embed_cond(self, cond: float["b n d"]):  # noqa: F722
+        # step-invariant part of linear, i.e. cond columns with bias
+        return F.linear(cond, self.linear.weight[:, self.in_dim :], self.linear.bias)
+
+    def forward_cached(self, x: float["b n d"], cond_embeds: list[float["b n d"]]):  # noqa: F722
+        # x columns of linear computed once, shared by every branch in cond_embeds (packed along batch)
+        x = F.linear(x, self.linear.weight[:, : self.in_dim])
+        if len(cond_embeds) == 1:
+            x = x + cond_embeds[0]
+        else:
+            x = torch.cat([x + cond_embed for cond_embed in cond_embeds], dim=0)
+        x = self.conv_pos_embed(x) + x
+        return x
+
 
 # Transformer backbone using MM-DiT blocks
 
@@ -94,6 +119,10 @@ class MMDiT(nn.Module):
 
         self.rotary_embed = RotaryEmbedding(dim_head)
 
+        self.null_embed_cache = OrderedDict()  # (text_len, device, dtype, version) -> null branch embeddings
+        self.null_embed_cache_size = 16
+        self.register_load_state_dict_post_hook(clear_cache_hook)
+
         self.dim = dim
         self.depth = depth
 
@@ -113,6 +142,52 @@ class MMDiT(nn.Module):
         self.norm_out = AdaLayerNormZero_Final(dim)  # final modulation
         self.proj_out = nn.Linear(dim, mel_dim)
 
+    def get_step_cache(self, cond: float["b n d"], text: int["b nt"]):  # noqa: F722
+        # text & cond embeddings and rope are identical at every ode step, compute once per sample call
+        seq_len, text_len = cond.shape[1], text.shape[1]
+        c_null, x_null = self.get_null_embed(text_len, cond.device, cond.dtype)
+        return dict(
+            c=self.text_embed(text),
+            c_null=c_null,
+            cond=self.audio_embed.embed_cond(cond),
+            null=x_null,
+            rope=self.rotary_embed.forward_from_seq_len(seq_len),
+            c_rope=self.rotary_embed.forward_from_seq_len(text_len),
+        )
+
+    def get_null_embed(self, text_len, device, dtype):
+        # null branch (dropped cond & text) only depends on text_len, shared by every request
+        # parameter versions are bumped by in-place updates (optimizer, ema, load_state_dict)
+        version = parameters_version(self.text_embed, self.audio_embed.linear)
+        key = (text_len, str(device), dtype, version)
+
+        def compute():
+            text = torch.zeros((1, text_len), dtype=torch.long, device=device)
+            cond = torch.zeros((1, 1, self.audio_embed.in_dim), dtype=dtype, device=device)
+            return self.text_embed(text, drop_text=True), self.audio_embed.embed_cond(cond)
+
+        return get_cached_null_embed(self.null_embed_cache, self.null_embed_cache_size, key, compute)
+
+    def clear_cache(self):
+        clear_null_embed_cache(self.null_embed_cache)
+
+    def train(self, mode=True):
+        if mode:  # weights are about to change
+            self.clear_cache()
+        return super().train(mode)
+
+    def get_time_cache(self, time: float["s"]):  # noqa: F821
+        # time embedding and adaln modulation only depend on t, compute for the whole ode schedule at once
+        t = F.silu(self.time_embed(time)).unsqueeze(1)  # s d -> s 1 d
+        blocks = [
+            (block.attn_norm_c.linear(t).unbind(0), block.attn_norm_x.linear(t).unbind(0))
+            for block in self.transformer_blocks
+        ]
+        final = self.norm_out.linear(t).unbind(0)
+        return [
+            dict(blocks=[(mod_c[i], mod_x[i]) for mod_c, mod_x in blocks], final=final[i]) for i in range(time.shape[0])
+        ]
+
     def forward(
         self,
         x: float["b n d"],  # nosied input audio  # noqa: F722
@@ -122,25 +197,74 @@ class MMDiT(nn.Module):
         drop_audio_cond,  # cfg for cond audio
         drop_text,  # cfg for text
         mask: bool["b n"] | None = None,  # noqa: F722
+        cfg_infer: bool = False,  # cfg inference, pack cond & null branch along batch
+        cache: dict | None = None,  # step-invariant embeddings from get_step_cache()
+        time_cache: dict | None = None,  # modulation of current step from get_time_cache()
+        feature_cache: dict | None = None,  # cross-step deep block reuse, see get_cached_features()
     ):
         batch = x.shape[0]
         if time.ndim == 0:
             time = time.repeat(batch)
 
         # t: conditioning (time), c: context (text + masked cond audio), x: noised input audio
-        t = self.time_embed(time)
-        c = self.text_embed(text, drop_text=drop_text)
-        x = self.audio_embed(x, cond, drop_audio_cond=drop_audio_cond)
-
-        seq_len = x.shape[1]
-        text_len = text.shape[1]
-        rope_audio = self.rotary_embed.forward_from_seq_len(seq_len)
-        rope_text = self.rotary_embed.forward_from_seq_len(text_len)
-
-        for block in self.transformer_blocks:
-            c, x = block(x, c, t, mask=mask, rope=rope_audio, c_rope=rope_text)
-
-        x = self.norm_out(x, t)
+        t = self.time_embed(time) if time_cache is None else None
+        if cache is not None:
+            c_null = cache["c_null"].expand(batch, -1, -1)
+            if cfg_infer:
+                c = torch.cat((cache["c"], c_null), dim=0)
+                x = self.audio_embed.forward_cached(x, [cache["cond"], cache["null"]])
+            else:
+                assert drop_audio_cond == drop_text, "cached embeddings only for full cond or full null branch"
+                c = c_null if drop_text else cache["c"]
+                x = self.audio_embed.forward_cached(x, [cache["null"] if drop_audio_cond else cache["cond"]])
+        elif cfg_infer:  # b n d -> 2b n d, output is [cond; null] along batch
+            c = torch.cat((self.text_embed(text, drop_text=False), self.text_embed(text, drop_text=True)), dim=0)
+            x = torch.cat(
+                (
+                    self.audio_embed(x, cond, drop_audio_cond=False),
+                    self.audio_embed(x, cond, drop_audio_cond=True),
+                ),
+                dim=0,
+            )
+        else:
+            c = self.text_embed(text, drop_text=drop_text)
+            x = self.audio_embed(x, cond, drop_audio_cond=drop_audio_cond)
+
+        if cfg_infer:
+            t = torch.cat((t, t), dim=0) if t is not None else None
+            mask = torch.cat((mask, mask), dim=0) if mask is not None else None
+
+        if cache is not None:
+            rope_audio, rope_text = cache["rope"], cache["c_rope"]
+        else:
+            seq_len = x.shape[1]
+            text_len = text.shape[1]
+            rope_audio = self.rotary_embed.forward_from_seq_len(seq_len)
+            rope_text = self.rotary_embed.forward_from_seq_len(text_len)
+
+        modulations = time_cache["blocks"] if time_cache is not None else [None] * self.depth
+        blocks = list(zip(self.transformer_blocks, modulations))
+        if feature_cache is None:
+            for block, modulation in blocks:
+                c, x = block(x, c, t, mask=mask, rope=rope_audio, c_rope=rope_text, modulation=modulation)
+        else:
+            # shallow blocks always run, residual added to x by the deep ones is reused from the last full step
+            # (the context stream past the shallow blocks only feeds the deep ones, so it needs no cache)
+            shallow_depth = feature_cache["depth"]
+            assert 0 < shallow_depth < self.depth, f"feature cache depth should be in [1, {self.depth - 1}]"
+            for block, modulation in blocks[:shallow_depth]:
+                c, x = block(x, c, t, mask=mask, rope=rope_audio, c_rope=rope_text, modulation=modulation)
+
+            deep_residual = get_cached_features(feature_cache, x.shape[0])
+            if deep_residual is not None:
+                x = x + deep_residual
+            else:
+                shallow_x = x
+                for block, modulation in blocks[shallow_depth:]:
+                    c, x = block(x, c, t, mask=mask, rope=rope_audio, c_rope=rope_text, modulation=modulation)
+                feature_cache["features"] = x - shallow_x
+
+        x = self.norm_out(x, t, modulation=time_cache["final"] if time_cache is not None else None)
         output = self.proj_out(x)
 
         return output
@@ -8,6 +8,7 @@ d - dimension
 """
 
 from __future__ import annotations
+from collections import OrderedDict
 from typing import Literal
 
 import torch
@@ -27,6 +28,13 @@ from f5_tts.model.modules import (
     precompute_freqs_cis,
     get_pos_embed_indices,
 )
+from f5_tts.model.utils import (
+    clear_cache_hook,
+    clear_null_embed_cache,
+    get_cached_features,
+    get_cached_null_embed,
+    parameters_version,
+)
 
 
 # Text embedding
@@ -78,6 +86,7 @@ class TextEmbedding(nn.Module):
 class InputEmbedding(nn.Module):
     def __init__(self, mel_dim, text_dim, out_dim):
         super().__init__()
+        self.mel_dim = mel_dim
         self.proj = nn.Linear(mel_dim * 2 + text_dim, out_dim)
         self.conv_pos_embed = ConvPositionEmbedding(dim=out_dim)
 
@@ -89,6 +98,20 @@ class InputEmbedding(nn.Module):
         x = self.conv_pos_embed(x) + x
         return x
 
+    def embed_cond(self, cond: float["b n d"], text_embed: float["b n d"]):  # noqa: F722
+        # step-invariant part of proj, i.e. cond & text columns with bias
+        return F.linear(torch.cat((cond, text_embed), dim=-1), self.proj.weight[:, self.mel_dim :], self.proj.bias)
+
+    def forward_cached(self, x: float["b n d"], cond_embeds: list[float["b n d"]]):  # noqa: F722
+        # x columns of proj computed once, shared by every branch in cond_embeds (packed along batch)
+        x = F.linear(x, self.proj.weight[:, : self.mel_dim])
+        if len(cond_embeds) == 1:
+            x = x + cond_embeds[0]
+        else:
+            x = torch.cat([x + cond_embed for cond_embed in cond_embeds], dim=0)
+        x = self.conv_pos_embed(x) + x
+        return x
+
 
 # Flat UNet Transformer backbone
 
@@ -120,6 +143,10 @@ class UNetT(nn.Module):
 
         self.rotary_embed = RotaryEmbedding(dim_head)
 
+        self.null_embed_cache = OrderedDict()  # (seq_len, device, dtype, version) -> null branch embedding
+        self.null_embed_cache_size = 16
+        self.register_load_state_dict_post_hook(clear_cache_hook)
+
         # transformer layers & skip connections
 
         self.dim = dim
@@ -161,6 +188,46 @@ class UNetT(nn.Module):
         self.norm_out = RMSNorm(dim)
         self.proj_out = nn.Linear(dim, mel_dim)
 
+    def get_step_cache(self, cond: float["b n d"], text: int["b nt"]):  # noqa: F722
+        # text & cond embeddings and rope are identical at every ode step, compute once per sample call
+        seq_len = cond.shape[1]
+        text_embed = self.text_embed(text, seq_len)
+        return dict(
+            cond=self.input_embed.embed_cond(cond, text_embed),
+            null=self.get_null_embed(seq_len, cond.device, cond.dtype),
+            rope=self.rotary_embed.forward_from_seq_len(seq_len + 1),
+        )
+
+    def get_null_embed(self, seq_len, device, dtype):
+        # null branch (dropped cond & text) only depends on seq_len, shared by every request
+        # parameter versions are bumped by in-place updates (optimizer, ema, load_state_dict)
+        version = parameters_version(self.text_embed, self.input_embed.proj)
+        key = (seq_len, str(device), dtype, version)
+
+        def compute():
+            text = torch.zeros((1, seq_len), dtype=torch.long, device=device)
+            cond = torch.zeros((1, seq_len, self.input_embed.mel_dim), dtype=dtype, device=device)
+            return self.input_embed.embed_cond(cond, self.text_embed(text, seq_len, drop_text=True))
+
+        return get_cached_null_embed(self.null_embed_cache, self.null_embed_cache_size, key, compute)
+
+    def clear_cache(self):
+        clear_null_embed_cache(self.null_embed_cache)
+
+    def train(self, mode=True):
+        if mode:  # weights are about to change
+            self.clear_cache()
+        return super().train(mode)
+
+    def get_time_cache(self, time: float["s"]):  # noqa: F821
+        # time embedding only depends on t, compute for the whole ode schedule at once
+        return list(self.time_embed(time).unsqueeze(1).unbind(0))  # s d -> s x [1 d]
+
+    def get_input_embed(self, x, cond, text, drop_audio_cond=False, drop_text=False):
+        seq_len = x.shape[1]
+        text_embed = self.text_embed(text, seq_len, drop_text=drop_text)
+        return self.input_embed(x, cond, text_embed, drop_audio_cond=drop_audio_cond)
+
     def forward(
         self,
         x: float["b n d"],  # nosied input audio  # noqa: F722
@@ -170,27 +237,63 @@ class UNetT(nn.Module):
         drop_audio_cond,  # cfg for cond audio
         drop_text,  # cfg for text
         mask: bool["b n"] | None = None,  # noqa: F722
+        cfg_infer: bool = False,  # cfg inference, pack cond & null branch along batch
+        cache: dict | None = None,  # step-invariant embeddings from get_step_cache()
+        time_cache: float["1 d"] | None = None,  # time embedding of current step from get_time_cache()  # noqa: F722
+        feature_cache: dict | None = None,  # cross-step deep layer reuse, see get_cached_features()
     ):
         batch, seq_len = x.shape[0], x.shape[1]
         if time.ndim == 0:
             time = time.repeat(batch)
 
         # t: conditioning time, c: context (text + masked cond audio), x: noised input audio
-        t = self.time_embed(time)
-        text_embed = self.text_embed(text, seq_len, drop_text=drop_text)
-        x = self.input_embed(x, cond, text_embed, drop_audio_cond=drop_audio_cond)
+        t = self.time_embed(time) if time_cache is None else time_cache.expand(batch, -1)
+        if cache is not None:
+            if cfg_infer:
+                cond_embeds = [cache["cond"], cache["null"]]
+            else:
+                assert drop_audio_cond == drop_text, "cached embeddings only for full cond or full null branch"
+                cond_embeds = [cache["null"] if drop_audio_cond else cache["cond"]]
+            x = self.input_embed.forward_cached(x, cond_embeds)
+        elif cfg_infer:  # b n d -> 2b n d, output is [cond; null] along batch
+            x_cond = self.get_input_embed(x, cond, text, drop_audio_cond=False, drop_text=False)
+            x_null = self.get_input_embed(x, cond, text, drop_audio_cond=True, drop_text=True)
+            x = torch.cat((x_cond, x_null), dim=0)
+        else:
+            x = self.get_input_embed(x, cond, text, drop_audio_cond=drop_audio_cond, drop_text=drop_text)
+
+        if cfg_infer:
+            t = torch.cat((t, t), dim=0)
+            mask = torch.cat((mask, mask), dim=0) if mask is not None else None
 
         # postfix time t to input x, [b n d] -> [b n+1 d]
         x = torch.cat([t.unsqueeze(1), x], dim=1)  # pack t to x
         if mask is not None:
             mask = F.pad(mask, (1, 0), value=1)
 
-        rope = self.rotary_embed.forward_from_seq_len(seq_len + 1)
+        rope = cache["rope"] if cache is not None else self.rotary_embed.forward_from_seq_len(seq_len + 1)
 
         # flat unet transformer
         skip_connect_type = self.skip_connect_type
         skips = []
+
+        # shallow layers at both ends always run, output of the deep middle part is reused from the last full step
+        if feature_cache is not None:
+            shallow_depth = feature_cache["depth"]
+            # at depth // 2 no layer would be skipped, yet the middle features would still be swapped for stale ones
+            assert 0 < shallow_depth < self.depth // 2, f"feature cache depth should be in [1, {self.depth // 2 - 1}]"
+            deep_features = get_cached_features(feature_cache, x.shape[0])
+
         for idx, (maybe_skip_proj, attn_norm, attn, ff_norm, ff) in enumerate(self.layers):
+            if feature_cache is not None:
+                if deep_features is not None and shallow_depth <= idx < self.depth - shallow_depth:
+                    continue  # skips of deep layers are neither pushed nor popped
+                if idx == self.depth - shallow_depth:
+                    if deep_features is not None:
+                        x = deep_features
+                    else:
+                        feature_cache["features"] = x
+
             layer = idx + 1
 
             # skip connection logic
@@ -9,6 +9,7 @@ d - dimension
 
 from __future__ import annotations
 
+import inspect
 from random import random
 from typing import Callable
 
@@ -19,7 +20,9 @@ from torch.nn.utils.rnn import pad_sequence
 from torchdiffeq import odeint
 
 from f5_tts.model.modules import MelSpec
+from f5_tts.model.solvers import get_solver
 from f5_tts.model.utils import (
+    check_cfg_interval,
     default,
     exists,
     lens_to_mask,
@@ -89,15 +92,23 @@ class CFM(nn.Module):
         steps=32,
         cfg_strength=1.0,
         sway_sampling_coef=None,
-        seed: int | None = None,
+        seed: int | list[int | None] | None = None,
         max_duration=4096,
         vocoder: Callable[[float["b d n"]], float["b nw"]] | None = None,  # noqa: F722
         no_ref_audio=False,
         duplicate_test=False,
         t_inter=0.1,
         edit_mask=None,
+        batch_cfg=True,
+        cfg_interval: tuple[float, float] | None = None,
+        cfg_every=1,
+        feature_cache_depth: int | None = None,
+        feature_cache_interval=2,
+        callback: Callable[[int, float[""], float["b n d"]], None] | None = None,  # noqa: F722
+        return_trajectory=False,
     ):
         self.eval()
+        check_cfg_interval(cfg_interval)
         # raw wave
 
         if cond.ndim == 2:
@@ -159,30 +170,82 @@ class CFM(nn.Module):
 
         # neural ode
 
-        def fn(t, x):
-            # at each step, conditioning is fixed
-            # step_cond = torch.where(cond_mask, cond, torch.zeros_like(cond))
+        # at each step, conditioning is fixed, thus text & cond embeddings are precomputed once
+        step_cache = self.transformer.get_step_cache(step_cond, text)
+
+        # cross-step feature reuse: deep blocks run every feature_cache_interval-th evaluation, one cache per branch
+        feature_caches = None
+        if feature_cache_depth is not None:
+            if "feature_cache" not in inspect.signature(self.transformer.forward).parameters:
+                raise ValueError(f"feature_cache_depth is not supported by {type(self.transformer).__name__}")
+            feature_caches = {drop: dict(depth=feature_cache_depth, reuse=False) for drop in (False, True)}
+        feature_cache_state = dict(evals=0)
+
+        def predict(t, x, drop=False, cfg_infer=False, time_cache=None):
+            kwargs = dict(feature_cache=feature_caches[drop]) if feature_caches is not None else dict()
+            return self.transformer(
+                x=x,
+                cond=step_cond,
+                text=text,
+                time=t,
+                mask=mask,
+                drop_audio_cond=drop,
+                drop_text=drop,
+                cfg_infer=cfg_infer,
+                cache=step_cache,
+                time_cache=time_cache,
+                **kwargs,
+            )
+
+        cfg_state = dict(evals=0, guidance=None)
+
+        def fn(t, x, time_cache=None, t_value=None):
+            if feature_caches is not None:
+                reuse = feature_cache_state["evals"] % feature_cache_interval != 0
+                feature_cache_state["evals"] += 1
+                for feature_cache in feature_caches.values():
+                    feature_cache["reuse"] = reuse
 
             # predict flow
-            pred = self.transformer(
-                x=x, cond=step_cond, text=text, time=t, mask=mask, drop_audio_cond=False, drop_text=False
-            )
             if cfg_strength < 1e-5:
-                return pred
-
-            null_pred = self.transformer(
-                x=x, cond=step_cond, text=text, time=t, mask=mask, drop_audio_cond=True, drop_text=True
-            )
-            return pred + (pred - null_pred) * cfg_strength
+                return predict(t, x, time_cache=time_cache)
+
+            # guidance interval, outside of [t_lo, t_hi] only the cond branch is evaluated
+            if cfg_interval is not None:
+                t_value = float(t) if t_value is None else t_value
+                if not cfg_interval[0] <= t_value <= cfg_interval[1]:
+                    return predict(t, x, time_cache=time_cache)
+
+            # inside, null branch every cfg_every-th evaluation, with its guidance reused in between
+            reuse = cfg_state["guidance"] is not None and cfg_state["evals"] % cfg_every != 0
+            cfg_state["evals"] += 1
+            if reuse:
+                return predict(t, x, time_cache=time_cache) + cfg_state["guidance"] * cfg_strength
+
+            if batch_cfg:  # single forward with cond & null branch stacked along batch
+                pred, null_pred = torch.chunk(predict(t, x, cfg_infer=True, time_cache=time_cache), 2, dim=0)
+            else:
+                pred = predict(t, x, time_cache=time_cache)
+                null_pred = predict(t, x, drop=True, time_cache=time_cache)
+            guidance = pred - null_pred
+            if cfg_every > 1:
+                cfg_state["guidance"] = guidance
+            return pred + guidance * cfg_strength
 
         # noise input
         # to make sure batch inference result is same with different batch size, and for sure single inference
         # still some difference maybe due to convolutional layers
+        # a list gives every sample its own seed, e.g. when unrelated requests share a batch
+        # seeded samples draw from their own generator, unseeded ones from the global one, left untouched by seeds
+        seeds = seed if isinstance(seed, (list, tuple)) else [seed] * batch
+        if len(seeds) != batch:
+            raise ValueError(f"seed list has {len(seeds)} seeds for a batch of {batch}")
         y0 = []
-        for dur in duration:
-            if exists(seed):
-                torch.manual_seed(seed)
-            y0.append(torch.randn(dur, self.num_channels, device=self.device, dtype=step_cond.dtype))
+        for dur, sample_seed in zip(duration, seeds):
+            generator = torch.Generator(self.device).manual_seed(sample_seed) if exists(sample_seed) else None
+            y0.append(
+                torch.randn(dur, self.num_channels, device=self.device, dtype=step_cond.dtype, generator=generator)
+            )
         y0 = pad_sequence(y0, padding_value=0, batch_first=True)
 
         t_start = 0
@@ -197,9 +260,33 @@ class CFM(nn.Module):
         if sway_sampling_coef is not None:
             t = t + sway_sampling_coef * (torch.cos(torch.pi / 2 * t) - 1 + t)
 
-        trajectory = odeint(fn, y0, t, **self.odeint_kwargs)
+        # fixed-step solvers run in-house, only the current state is kept unless the trajectory is asked for
+        # other methods, or none, go to torchdiffeq with odeint_kwargs as they are
+        solver = get_solver(self.odeint_kwargs.get("method"))
+        if solver is not None and self.odeint_kwargs.keys() != {"method"}:
+            options = ", ".join(sorted(self.odeint_kwargs.keys() - {"method"}))
+            raise ValueError(
+                f"odeint_kwargs {options} only apply to torchdiffeq methods, not {self.odeint_kwargs['method']!r}"
+            )
+        if solver is not None:
+            # time embedding & adaln modulation of every evaluation in the schedule, precomputed in one pass
+            eval_times = solver.eval_times(t)
+            eval_t_values = eval_times.tolist()
+            time_caches = self.transformer.get_time_cache(eval_times)
+            sampled, trajectory = solver.integrate(
+                lambda k, x: fn(eval_times[k], x, time_cache=time_caches[k], t_value=eval_t_values[k]),
+                y0,
+                t,
+                callback=callback,
+                return_trajectory=return_trajectory,
+            )
+        else:
+            assert callback is None, "step callback only supported by fixed-step solvers, see f5_tts.model.solvers"
+            trajectory = odeint(fn, y0, t, **self.odeint_kwargs)
+            sampled = trajectory[-1]
+            if not return_trajectory:
+                trajectory = None
 
-        sampled = trajectory[-1]
         out = sampled
         out = torch.where(cond_mask, cond, out)
 
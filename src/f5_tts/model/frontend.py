@@ -0,0 +1,87 @@
+# Audio frontend shared by inference, training and evaluation, with its constant tensors built once per process
+# Mel filterbanks, stft windows and resampling kernels depend only on their parameters, the device and the dtype,
+# so each is made on first use under that key and reused, instead of constructing torchaudio transforms per call
+# Results match torchaudio.transforms.MelSpectrogram / Resample built fresh, up to float rounding in the mel product
+
+import torch
+import torchaudio
+from librosa.filters import mel as librosa_mel_fn
+
+_filterbanks = {}
+_windows = {}
+_resamplers = {}
+
+
+def _get(cache, key, build):
+    value = cache.get(key)
+    if value is None:
+        value = cache.setdefault(key, build())  # a racing thread's build is dropped, both are the same
+    return value
+
+
+def get_window(win_length, device="cpu", dtype=torch.float32):
+    """Periodic hann window, as torch.hann_window."""
+    key = (win_length, str(device), dtype)
+    return _get(_windows, key, lambda: torch.hann_window(win_length, dtype=dtype, device=device))
+
+
+def get_mel_filterbank(
+    sample_rate, n_fft, n_mels, fmin=0.0, fmax=None, mel_scale="htk", device="cpu", dtype=torch.float32
+):
+    """
+    (n_mels, n_fft // 2 + 1) filterbank. mel_scale "htk" is torchaudio's MelSpectrogram default (vocos),
+    "slaney" librosa's slaney-normalised one (bigvgan).
+    """
+    key = (sample_rate, n_fft, n_mels, fmin, fmax, mel_scale, str(device), dtype)
+
+    def build():
+        if mel_scale == "slaney":
+            mel = torch.from_numpy(librosa_mel_fn(sr=sample_rate, n_fft=n_fft, n_mels=n_mels, fmin=fmin, fmax=fmax))
+        else:
+            mel = torchaudio.functional.melscale_fbanks(
+                n_fft // 2 + 1,
+                f_min=fmin,
+                f_max=fmax if fmax is not None else float(sample_rate // 2),
+                n_mels=n_mels,
+                sample_rate=sample_rate,
+                norm=None,
+                mel_scale=mel_scale,
+            ).T
+        return mel.to(device=device, dtype=dtype).contiguous()
+
+    return _get(_filterbanks, key, build)
+
+
+def get_resampler(orig_freq, new_freq, device="cpu", dtype=torch.float32):
+    """torchaudio Resample transform holding its sinc kernel on device, in dtype."""
+    key = (orig_freq, new_freq, str(device), dtype)
+    return _get(_resamplers, key, lambda: torchaudio.transforms.Resample(orig_freq, new_freq, dtype=dtype).to(device))
+
+
+def resample(waveform, orig_freq, new_freq):
+    """waveform (..., time) from orig_freq to new_freq, returned as is when they are equal."""
+    if orig_freq == new_freq:
+        return waveform
+    if not waveform.is_floating_point():
+        waveform = waveform.float()
+    return get_resampler(orig_freq, new_freq, waveform.device, waveform.dtype)(waveform)
+
+
+def vocos_mel_spectrogram(waveform, n_fft=1024, n_mels=100, sample_rate=24000, hop_length=256, win_length=1024):
+    """Magnitude mel spectrogram of torchaudio's MelSpectrogram(power=1, center=True, norm=None), not yet logged."""
+    window = get_window(win_length, waveform.device, waveform.dtype)
+    filterbank = get_mel_filterbank(sample_rate, n_fft, n_mels, device=waveform.device, dtype=waveform.dtype)
+    spec = torchaudio.functional.spectrogram(
+        waveform,
+        pad=0,
+        window=window,
+        n_fft=n_fft,
+        hop_length=hop_length,
+        win_length=win_length,
+        power=1,
+        normalized=False,
+        center=True,
+        pad_mode="reflect",
+        onesided=True,
+    )
+    return torch.matmul(filterbank, spec)
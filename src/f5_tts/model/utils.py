@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import os
 import random
-from collections import defaultdict
+import threading
+from collections import OrderedDict, defaultdict
 from importlib.resources import files
 
 import torch
@@ -36,6 +37,12 @@ def default(v, d):
     return v if exists(v) else d
 
 
+def check_cfg_interval(cfg_interval):
+    # flow times [start, end] with guidance, an inverted interval would silently turn it off at every step
+    if cfg_interval is not None and not 0 <= cfg_interval[0] <= cfg_interval[1] <= 1:
+        raise ValueError(f"cfg_interval should be (start, end) with 0 <= start <= end <= 1, got {tuple(cfg_interval)}")
+
+
 # tensor helpers
 
 
@@ -77,6 +84,55 @@ def maybe_masked_mean(t: float["b n d"], mask: bool["b n"] = None) -> float["b d
     return num / den.clamp(min=1.0)
 
 
+# cross-step feature cache (DeepCache style) for sampling
+# feature_cache: dict(depth=<num of shallow blocks always recomputed>, reuse=<bool, cheap step>, features=<cached>)
+
+
+def get_cached_features(feature_cache: dict, batch: int):
+    if not feature_cache.get("reuse") or feature_cache.get("features") is None:
+        return None
+    features = feature_cache["features"]
+    if features.shape[0] == batch:
+        return features
+    if features.shape[0] == 2 * batch:  # cached with packed cfg, cond branch is the first half
+        return features[:batch]
+    return None
+
+
+# null branch embedding lru cache of the backbones, shared by threads sampling concurrently (gradio, servers)
+# keys hold the sum of the embedding parameters' _version: private, but it is the counter autograd checks in-place
+# changes against, bumped by optimizer steps, ema updates and load_state_dict's copy_. a reassigned .data is not
+# seen that way, so the cache is also cleared on train() and after load_state_dict
+
+_null_embed_lock = threading.Lock()
+
+
+def parameters_version(*modules):
+    return sum(p._version for module in modules for p in module.parameters())
+
+
+def get_cached_null_embed(cache: OrderedDict, max_size: int, key, compute):
+    with _null_embed_lock:  # membership check, move_to_end and insert as one
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        null_embed = compute()
+        cache[key] = null_embed
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+        return null_embed
+
+
+def clear_null_embed_cache(cache: OrderedDict):
+    with _null_embed_lock:
+        cache.clear()
+
+
+def clear_cache_hook(module, incompatible_keys):
+    # load_state_dict post hook, a plain function so the module still pickles
+    module.clear_cache()
+
+
 # simple utf-8 tokenizer, since paper went character based
 def list_str_to_tensor(text: list[str], padding_value=-1) -> int["b nt"]:  # noqa: F722
     list_tensors = [torch.tensor([*bytes(t, "UTF-8")]) for t in text]  # ByT5 style
@@ -0,0 +1,63 @@
+"""
+Bytes per second and encode cpu cost of the socket server output formats, no model needed.
+Encodes a bundled reference clip, looped to --seconds, in pieces of --play_steps_in_s as the server does.
+
+python src/f5_tts/scripts/bench_audio_encodings.py --seconds 120
+"""
+
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+import argparse
+import time
+from importlib.resources import files
+
+import numpy as np
+import soundfile as sf
+
+from f5_tts.infer.utils_stream import AUDIO_FORMATS, get_encoder
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--audio",
+        default=str(files("f5_tts").joinpath("infer/examples/basic/basic_ref_en.wav")),
+        help="speech to encode, mono 24 kHz is used as is",
+    )
+    parser.add_argument("--seconds", type=float, default=120, help="seconds of audio to encode")
+    parser.add_argument("--play_steps_in_s", type=float, default=0.5, help="audio per frame, as generate_stream")
+    args = parser.parse_args()
+
+    wave, sample_rate = sf.read(args.audio, dtype="float32", always_2d=True)
+    wave = wave.mean(axis=1)
+    wave = np.tile(wave, int(np.ceil(args.seconds * sample_rate / len(wave))))[: int(args.seconds * sample_rate)]
+    chunk_size = int(sample_rate * args.play_steps_in_s)
+    chunks = [wave[i : i + chunk_size] for i in range(0, len(wave), chunk_size)]
+    duration = len(wave) / sample_rate
+    print(f"{duration:.0f} s of audio at {sample_rate} Hz, {len(chunks)} chunks")
+
+    for format in AUDIO_FORMATS:
+        try:
+            encoder = get_encoder(format, sample_rate=sample_rate)
+        except ValueError as e:
+            print(f"{format:>6}: skipped, {e}")
+            continue
+
+        total_bytes = 0
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        for chunk in chunks:
+            total_bytes += memoryview(encoder.encode(chunk)).nbytes
+        total_bytes += memoryview(encoder.flush()).nbytes
+        wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+        print(
+            f"{format:>6}: {total_bytes / duration / 1024:8.1f} KiB/s of audio, "
+            f"{cpu / duration * 1000:7.2f} ms cpu per audio second, {wall:6.3f} s wall"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Audio frontend: torchaudio transforms built per call, as the extractors and resampling call sites used to,
+against the cached filterbanks, windows and kernels of f5_tts.model.frontend, no model needed.
+Checks that both give the same output and reports the time per call.
+
+python src/f5_tts/scripts/bench_audio_frontend.py --device cpu --seconds 1 5 15
+"""
+
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+import argparse
+import time
+
+import torch
+import torchaudio
+
+from f5_tts.model.frontend import resample
+from f5_tts.model.modules import get_bigvgan_mel_spectrogram, get_vocos_mel_spectrogram
+
+
+def fresh_vocos_mel(waveform):
+    # get_vocos_mel_spectrogram as it was, with its default parameters
+    mel_stft = torchaudio.transforms.MelSpectrogram(
+        sample_rate=24000,
+        n_fft=1024,
+        win_length=1024,
+        hop_length=256,
+        n_mels=100,
+        power=1,
+        center=True,
+        normalized=False,
+        norm=None,
+    ).to(waveform.device)
+    return mel_stft(waveform).clamp(min=1e-5).log()
+
+
+def fresh_resample(waveform, orig_freq, new_freq):
+    return torchaudio.transforms.Resample(orig_freq, new_freq).to(waveform.device)(waveform)
+
+
+def timed(fn, *args, repeat=20):
+    fn(*args)  # first call fills the caches, and warms up the device
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        if result.is_cuda:
+            torch.cuda.synchronize()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def report(name, seconds, fresh, cached):
+    (expected, fresh_seconds), (result, cached_seconds) = fresh, cached
+    max_error = (result - expected).abs().max().item()
+    print(
+        f"{name:>22} {seconds:5.1f} s: max error {max_error:.1e} | fresh {fresh_seconds * 1000:7.2f} ms, "
+        f"cached {cached_seconds * 1000:7.2f} ms, saves {(fresh_seconds - cached_seconds) * 1000:7.2f} ms per call"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[1, 5, 15], help="audio lengths to time")
+    parser.add_argument("--sample_rates", type=int, nargs="+", default=[16000, 44100], help="to resample from")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per measurement, the best is reported")
+    args = parser.parse_args()
+
+    for seconds in args.seconds:
+        wave = torch.rand(1, int(seconds * 24000), device=args.device) * 2 - 1
+        report(
+            "vocos mel",
+            seconds,
+            timed(fresh_vocos_mel, wave, repeat=args.repeat),
+            timed(get_vocos_mel_spectrogram, wave, repeat=args.repeat),
+        )
+        # the bigvgan extractor already cached its basis, timed for reference
+        mel, bigvgan_seconds = timed(get_bigvgan_mel_spectrogram, wave, repeat=args.repeat)
+        print(f"{'bigvgan mel':>22} {seconds:5.1f} s: cached {bigvgan_seconds * 1000:7.2f} ms")
+
+        for sample_rate in args.sample_rates:
+            wave = torch.rand(1, int(seconds * sample_rate), device=args.device) * 2 - 1
+            report(
+                f"resample {sample_rate} Hz",
+                seconds,
+                timed(fresh_resample, wave, sample_rate, 24000, repeat=args.repeat),
+                timed(resample, wave, sample_rate, 24000, repeat=args.repeat),
+            )
+
+
+if __name__ == "__main__":
+    main()
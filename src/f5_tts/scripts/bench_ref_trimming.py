@@ -0,0 +1,104 @@
+"""
+Reference audio trimming: the former pydub pipeline against f5_tts.infer.utils_silence, no model needed.
+For each clip, checks that both keep the same audio and reports the time each takes. --loops repeats a clip
+so the 15 s clipping stages are exercised as well.
+
+python src/f5_tts/scripts/bench_ref_trimming.py --loops 1 3
+"""
+
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+import argparse
+import glob
+import time
+from importlib.resources import files
+
+import numpy as np
+import soundfile as sf
+from pydub import AudioSegment, silence
+
+from f5_tts.infer.utils_silence import trim_reference
+
+
+def pydub_remove_silence_edges(audio, silence_threshold=-42):
+    # remove_silence_edges as it was in utils_infer
+    non_silent_start_idx = silence.detect_leading_silence(audio, silence_threshold=silence_threshold)
+    audio = audio[non_silent_start_idx:]
+    non_silent_end_duration = audio.duration_seconds
+    for ms in reversed(audio):
+        if ms.dBFS > silence_threshold:
+            break
+        non_silent_end_duration -= 0.001
+    return audio[: int(non_silent_end_duration * 1000)]
+
+
+def pydub_trim_reference(aseg):
+    # the clipping of preprocess_ref_audio_text as it was, messages left out
+    for min_silence_len, silence_thresh in ((1000, -50), (100, -40)):
+        non_silent_segs = silence.split_on_silence(
+            aseg, min_silence_len=min_silence_len, silence_thresh=silence_thresh, keep_silence=1000, seek_step=10
+        )
+        non_silent_wave = AudioSegment.silent(duration=0)
+        for non_silent_seg in non_silent_segs:
+            if len(non_silent_wave) > 6000 and len(non_silent_wave + non_silent_seg) > 15000:
+                break
+            non_silent_wave += non_silent_seg
+        if len(non_silent_wave) <= 15000:
+            break
+    aseg = non_silent_wave
+    if len(aseg) > 15000:
+        aseg = aseg[:15000]
+    return pydub_remove_silence_edges(aseg) + AudioSegment.silent(duration=50)
+
+
+def quiet(message):
+    pass
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--audio", nargs="*", help="clips to trim, the bundled examples by default")
+    parser.add_argument("--loops", type=int, nargs="+", default=[1, 3], help="times each clip is repeated")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best is reported")
+    args = parser.parse_args()
+
+    examples = str(files("f5_tts").joinpath("infer/examples"))
+    clips = args.audio or sorted(glob.glob(f"{examples}/*/*.wav") + glob.glob(f"{examples}/*/*.flac"))
+
+    for path in clips:
+        wave, sample_rate = sf.read(path, dtype="int16", always_2d=True)
+        for loops in args.loops:
+            looped = np.tile(wave, (loops, 1))
+            aseg = AudioSegment(looped.tobytes(), frame_rate=sample_rate, sample_width=2, channels=looped.shape[1])
+            expected, pydub_seconds = timed(pydub_trim_reference, aseg, repeat=args.repeat)
+            expected = np.array(expected.get_array_of_samples()).reshape(-1, expected.channels).T / 32768
+
+            audio = looped.T.astype(np.float32) / 32768
+            trimmed, numpy_seconds = timed(trim_reference, audio, sample_rate, True, quiet, repeat=args.repeat)
+
+            # pydub's 50 ms of silence is resampled from 11025 Hz, so it may be a few samples off
+            difference = trimmed.shape[-1] - expected.shape[-1]
+            n = min(trimmed.shape[-1], expected.shape[-1])
+            max_error = np.abs(trimmed[:, :n] - expected[:, :n]).max() if n else 0.0
+            print(
+                f"{os.path.basename(path):>20} x{loops}: {len(looped) / sample_rate:6.2f} s -> "
+                f"{trimmed.shape[-1] / sample_rate:6.2f} s, {difference:+6d} samples vs pydub, "
+                f"max error {max_error:.1e} | pydub {pydub_seconds * 1000:8.1f} ms, "
+                f"numpy {numpy_seconds * 1000:7.1f} ms, {pydub_seconds / numpy_seconds:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Loopback throughput of the socket server audio framing, no model needed.
+Compares the old per-sample struct.pack stream with the length-prefixed frames of f5_tts.infer.utils_stream.
+
+python src/f5_tts/scripts/bench_socket_framing.py --seconds 600
+"""
+
+import os
+import sys
+
+sys.path.append(os.getcwd())
+
+import argparse
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from f5_tts.infer.utils_stream import recv_stream, send_audio, send_end
+
+
+def serve_once(server, send):
+    conn, _ = server.accept()
+    with conn:
+        send(conn)
+
+
+def run(name, send, receive, total_bytes):
+    server = socket.create_server(("127.0.0.1", 0))
+    thread = threading.Thread(target=serve_once, args=(server, send))
+    thread.start()
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    with socket.create_connection(server.getsockname()) as client:
+        received = receive(client)
+    thread.join()
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    server.close()
+
+    assert received == total_bytes, f"{name}: received {received} of {total_bytes} bytes"
+    print(f"{name:>8}: {wall:7.3f} s wall, {cpu:7.3f} s cpu (server + client), {total_bytes / wall / 2**20:8.1f} MiB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=600, help="seconds of audio to stream")
+    parser.add_argument("--sample_rate", type=int, default=24000)
+    parser.add_argument("--play_steps_in_s", type=float, default=0.5, help="audio per frame, as generate_stream")
+    args = parser.parse_args()
+
+    wave = np.random.default_rng(0).uniform(-1, 1, int(args.seconds * args.sample_rate)).astype(np.float32)
+    chunk_size = int(args.sample_rate * args.play_steps_in_s)
+    chunks = [wave[i : i + chunk_size] for i in range(0, len(wave), chunk_size)]
+    total_bytes = wave.nbytes
+    print(f"{args.seconds:.0f} s of audio, {len(chunks)} chunks, {total_bytes / 2**20:.1f} MiB")
+
+    def send_struct(conn):
+        for chunk in chunks:
+            conn.sendall(struct.pack(f"{len(chunk)}f", *chunk))
+        conn.sendall(b"END_OF_AUDIO")
+
+    def receive_struct(client):
+        buffer = bytearray()
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            buffer += data
+        return len(buffer) - len(b"END_OF_AUDIO")  # the sentinel may also occur inside the samples
+
+    def send_framed(conn):
+        for chunk in chunks:
+            send_audio(conn, chunk)
+        send_end(conn)
+
+    def receive_framed(client):
+        return sum(chunk.nbytes for chunk in recv_stream(client))
+
+    run("struct", send_struct, receive_struct, total_bytes)
+    run("framed", send_framed, receive_framed, total_bytes)
+
+
+if __name__ == "__main__":
+    main()
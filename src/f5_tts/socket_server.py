@@ -1,159 +1,506 @@
-import socket
-import struct
+import argparse
+import asyncio
+import json
+import threading
+import time
+import numpy as np
 import torch
-import torchaudio
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 
 
 import gc
 import traceback
 
 
-from infer.utils_infer import infer_batch_process, preprocess_ref_audio_text, load_vocoder, load_model
-from model.backbones.dit import DiT
+from f5_tts.infer.replicas import ReplicaPool, parse_devices
+from f5_tts.infer.result_cache import ResultCache
+from f5_tts.infer.scheduler import (
+    NFE_HIGH_WAIT,
+    NFE_LEVELS,
+    NFE_LOW_WAIT,
+    AdmissionError,
+    BatchScheduler,
+    NFEController,
+    parse_nfe_levels,
+)
+from f5_tts.infer.utils_stream import (
+    FRAME_AUDIO,
+    FRAME_END,
+    FRAME_ERROR,
+    FRAME_INFO,
+    FRAME_REQUEST,
+    FRAME_STATS,
+    FrameTooLargeError,
+    get_encoder,
+    read_frame,
+    write_frame,
+)
+from f5_tts.infer.utils_infer import (
+    chunk_text,
+    cross_fade_duration,
+    cfg_strength,
+    nfe_step as default_nfe_step,
+    preprocess_ref_audio_text,
+    load_vocoder,
+    load_model,
+    load_voice,
+    sway_sampling_coef,
+    target_sample_rate,
+)
+from f5_tts.infer.voice_profiles import has_voice_profile, load_voice_profile
+from f5_tts.model.backbones.dit import DiT
+
+REQUEST_PARAMS = ("voice", "nfe_step", "speed", "seed")  # optional per-request fields besides text and format
+MAX_NFE_STEP = 64  # per-request nfe_step at most, every step of a request holds the batch worker shared by all
+MAX_REQUEST_BYTES = 1 << 20  # request frame payload at most, larger ones are refused before they are buffered
+
+
+def parse_request_params(request, max_nfe_step=MAX_NFE_STEP):
+    """
+    The optional fields of a client request, checked before anything is queued, ValueError on bad values.
+    Those not given are left out, request_settings() fills them in.
+    """
+    params = {key: request[key] for key in REQUEST_PARAMS if request.get(key) is not None}
+    if not isinstance(params.get("voice", ""), str):
+        raise ValueError("voice must be a string")
+    nfe_step = params.get("nfe_step", 1)
+    if isinstance(nfe_step, bool) or not isinstance(nfe_step, int) or not 1 <= nfe_step <= max_nfe_step:
+        raise ValueError(f"nfe_step must be an integer in [1, {max_nfe_step}]")
+    if "speed" in params:
+        speed = params["speed"]
+        if isinstance(speed, bool) or not isinstance(speed, (int, float)) or not 0 < speed < float("inf"):
+            raise ValueError("speed must be a number greater than 0")
+        params["speed"] = float(speed)
+    seed = params.get("seed", 0)
+    if isinstance(seed, bool) or not isinstance(seed, int) or not 0 <= seed < 2**63:
+        raise ValueError("seed must be a non-negative integer below 2**63")
+    return params
 
 
 class TTSStreamingProcessor:
-    def __init__(self, ckpt_file, vocab_file, ref_audio, ref_text, device=None, dtype=torch.float32):
+    def __init__(
+        self,
+        ckpt_file,
+        vocab_file,
+        ref_audio,
+        ref_text,
+        device=None,
+        dtype=torch.float32,
+        max_batch_frames=8192,
+        voices=None,
+        policy="fifo",
+        max_pending=None,
+        adaptive_nfe=False,
+        nfe_levels=None,
+        nfe_high_wait=NFE_HIGH_WAIT,
+        nfe_low_wait=NFE_LOW_WAIT,
+        nfe_high_depth=None,
+        result_cache=None,
+        voice_store=None,
+        model=None,
+        vocoder=None,
+        mel_spec_type="vocos",
+        devices=None,
+        load_replica=None,
+        max_nfe_step=MAX_NFE_STEP,
+    ):
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
 
-        # Load the model using the provided checkpoint and vocab files
-        self.model = load_model(
-            model_cls=DiT,
-            model_cfg=dict(dim=1024, depth=22, heads=16, ff_mult=2, text_dim=512, conv_layers=4),
-            ckpt_path=ckpt_file,
-            mel_spec_type="vocos",  # or "bigvgan" depending on vocoder
-            vocab_file=vocab_file,
-            ode_method="euler",
-            use_ema=True,
-            device=self.device,
-        ).to(self.device, dtype=dtype)
-
-        # Load the vocoder
-        self.vocoder = load_vocoder(is_local=False)
+        def load(device):
+            return load_model(
+                model_cls=DiT,
+                model_cfg=dict(dim=1024, depth=22, heads=16, ff_mult=2, text_dim=512, conv_layers=4),
+                ckpt_path=ckpt_file,
+                mel_spec_type=mel_spec_type,
+                vocab_file=vocab_file,
+                ode_method="euler",
+                use_ema=True,
+                device=device,
+            ).to(device, dtype=dtype)
+
+        scheduler_kwargs = dict(
+            mel_spec_type=mel_spec_type,
+            max_batch_frames=max_batch_frames,
+            policy=policy,
+            max_pending=max_pending,
+            result_cache=result_cache,
+        )
+        if devices:
+            # One model and vocoder per device, chunks routed to the replica with the fewest outstanding frames
+            if load_replica is None:
+
+                def load_replica(device):
+                    return load(device), load_vocoder(mel_spec_type, is_local=False, device=device)
+
+            self.scheduler = ReplicaPool(load_replica, devices, **scheduler_kwargs).start()
+            self.model = self.scheduler.model_obj
+            self.vocoder = self.scheduler.replicas[0].vocoder
+            self.device = self.scheduler.replicas[0].device
+        else:
+            # Load the model using the provided checkpoint and vocab files, unless an already loaded one is shared
+            # (e.g. F5TTS.ema_model for the http server)
+            self.model = model if model is not None else load(self.device)
+
+            # Load the vocoder
+            self.vocoder = vocoder if vocoder is not None else load_vocoder(mel_spec_type, is_local=False)
+
+            # All client threads submit to one scheduler, which batches their requests on the model
+            self.scheduler = BatchScheduler(self.model, self.vocoder, device=self.device, **scheduler_kwargs).start()
+
+        # Requests asking for more steps are refused
+        self.max_nfe_step = max_nfe_step
+
+        # Under load, requests that do not ask for an nfe_step get cheaper settings
+        # nfe_levels as NFEController takes them, from best quality down to the floor, NFE_LEVELS if None
+        # nfe_high_depth is a queue depth (chunks) above which a level cheaper is used too, None to go by the wait alone
+        self.nfe_controller = None
+        if adaptive_nfe:
+            self.nfe_controller = NFEController(
+                self.scheduler,
+                levels=nfe_levels,
+                high_wait=nfe_high_wait,
+                low_wait=nfe_low_wait,
+                high_depth=nfe_high_depth,
+            )
 
         # Set sampling rate for streaming
         self.sampling_rate = 24000  # Consistency with client
 
-        # Set reference audio and text
+        # Set reference audio and text, voice id -> (ref_audio, ref_text), the one given directly is the default
+        # ids not listed here are looked up in the voice profile store, "main" too when no ref_audio is given
         self.ref_audio = ref_audio
         self.ref_text = ref_text
+        self.voices = {"main": (ref_audio, ref_text)} if ref_audio else {}
+        self.voices.update(voices or {})
+        self.voice_store = voice_store
 
         # Warm up the model
         self._warm_up()
 
     def _warm_up(self):
         """Warm up the model with a dummy input to ensure it's ready for real-time processing."""
+        if not self.has_voice("main"):
+            print("No main voice, skipping warm-up.")
+            return
         print("Warming up the model...")
-        ref_audio, ref_text = preprocess_ref_audio_text(self.ref_audio, self.ref_text)
-        audio, sr = torchaudio.load(ref_audio)
         gen_text = "Warm-up text for the model."
 
-        # Pass the vocoder as an argument here
-        infer_batch_process((audio, sr), ref_text, [gen_text], self.model, self.vocoder, device=self.device)
+        # One chunk per replica, routing spreads them while the first ones are still outstanding
+        replicas = len(getattr(self.scheduler, "replicas", [self.scheduler]))
+        futures = [self.scheduler.submit(self.get_voice(), gen_text) for _ in range(replicas)]
+        for future in futures:
+            future.result()
         print("Warm-up completed.")
 
-    def generate_stream(self, text, play_steps_in_s=0.5):
-        """Generate audio in chunks and yield them in real-time."""
-        # Preprocess the reference audio and text
-        ref_audio, ref_text = preprocess_ref_audio_text(self.ref_audio, self.ref_text)
-
-        # Load reference audio
-        audio, sr = torchaudio.load(ref_audio)
-
-        # Run inference for the input text
-        audio_chunk, final_sample_rate, _ = infer_batch_process(
-            (audio, sr),
-            ref_text,
-            [text],
-            self.model,
-            self.vocoder,
-            device=self.device,  # Pass vocoder here
+    def has_voice(self, voice):
+        return voice in self.voices or (self.voice_store is not None and has_voice_profile(self.voice_store, voice))
+
+    def get_voice(self, voice="main"):
+        """Prepared conditioning for a voice id, served from the per-process voice cache after the first call."""
+        if voice not in self.voices:
+            if not self.has_voice(voice):
+                raise KeyError(f"unknown voice {voice!r}")
+            return load_voice_profile(self.voice_store, voice, self.model, device=self.device)
+        ref_audio, ref_text = preprocess_ref_audio_text(*self.voices[voice])
+        return load_voice(ref_audio, ref_text, self.model, device=self.device)
+
+    def request_settings(self, voice="main", nfe_step=None, speed=1, seed=None):
+        """Sampling settings for a request, the ones not given come from the nfe controller or the defaults."""
+        settings = dict(nfe_step=default_nfe_step, cfg_every=1)
+        if self.nfe_controller is not None:
+            settings.update(self.nfe_controller.settings())
+        if nfe_step is not None:
+            settings.update(nfe_step=nfe_step, cfg_every=1)
+        return dict(
+            voice=voice,
+            cfg_strength=cfg_strength,
+            sway_sampling_coef=sway_sampling_coef,
+            speed=speed,
+            seed=seed,
+            **settings,
         )
 
-        # Break the generated audio into chunks and send them
-        chunk_size = int(final_sample_rate * play_steps_in_s)
-
-        if len(audio_chunk) < chunk_size:
-            packed_audio = struct.pack(f"{len(audio_chunk)}f", *audio_chunk)
-            yield packed_audio
+    def generate_stream(
+        self,
+        text,
+        play_steps_in_s=0.5,
+        cross_fade_duration=cross_fade_duration,
+        voice="main",
+        nfe_step=default_nfe_step,
+        cfg_strength=cfg_strength,
+        sway_sampling_coef=sway_sampling_coef,
+        cfg_every=1,
+        speed=1,
+        seed=None,
+        cancelled=None,
+        deadline=None,
+    ):
+        """
+        Generate audio chunk by chunk and yield each piece (float32 array) as soon as it is vocoded.
+        Setting the cancelled event (threading.Event) ends the stream, chunks not yet sampled are dropped.
+        With a deadline (time.monotonic()) the request is refused up front if the queue cannot finish it in time,
+        AdmissionError is raised then, or later if its remaining chunks get shed.
+        """
+        voice = self.get_voice(voice)
+
+        # Split the text as infer_process does, so every chunk fits the model's 25s window with the reference
+        ref_audio_duration = voice["audio"].shape[-1] / target_sample_rate
+        max_chars = int(len(voice["ref_text"].encode("utf-8")) / ref_audio_duration * (25 - ref_audio_duration))
+        gen_text_batches = chunk_text(text, max_chars=max_chars)
+        if not gen_text_batches:
             return
-
-        for i in range(0, len(audio_chunk), chunk_size):
-            chunk = audio_chunk[i : i + chunk_size]
-
-            # Check if it's the final chunk
-            if i + chunk_size >= len(audio_chunk):
-                chunk = audio_chunk[i:]
-
-            # Send the chunk if it is not empty
-            if len(chunk) > 0:
-                packed_audio = struct.pack(f"{len(chunk)}f", *chunk)
-                yield packed_audio
-
-
-def handle_client(client_socket, processor):
-    try:
-        while True:
-            # Receive data from the client
-            data = client_socket.recv(1024).decode("utf-8")
-            if not data:
-                break
-
+        cost = self.scheduler.estimate_cost(voice, gen_text_batches, nfe_step=nfe_step, speed=speed)
+        self.scheduler.admit(cost, deadline=deadline)
+
+        # The first chunk goes alone for the earliest first audio, the rest is queued (and batched) once it is
+        # back, generating while the first chunk is sent
+        def submit(gen_text):
+            return self.scheduler.submit(
+                voice,
+                gen_text,
+                nfe_step=nfe_step,
+                cfg_strength=cfg_strength,
+                sway_sampling_coef=sway_sampling_coef,
+                cfg_every=cfg_every,
+                speed=speed,
+                seed=seed,
+                deadline=deadline,
+            )
+
+        futures = [submit(gen_text_batches[0])]
+
+        cross_fade_samples = int(cross_fade_duration * target_sample_rate)
+        chunk_size = int(target_sample_rate * play_steps_in_s)
+        tail = None  # end of the previous chunk, held back to cross-fade with the next one
+        try:
+            for i in range(len(gen_text_batches)):
+                while cancelled is not None and not futures[i].done():
+                    if cancelled.is_set():
+                        return
+                    wait([futures[i]], timeout=0.1)
+                wave, _, _ = futures[i].result()
+                if i == 0:
+                    futures += [submit(gen_text) for gen_text in gen_text_batches[1:]]
+
+                if tail is not None:
+                    overlap = min(len(tail), len(wave))
+                    fade_out = np.linspace(1, 0, overlap)
+                    fade_in = np.linspace(0, 1, overlap)
+                    cross_faded_overlap = tail[len(tail) - overlap :] * fade_out + wave[:overlap] * fade_in
+                    wave = np.concatenate([tail[: len(tail) - overlap], cross_faded_overlap, wave[overlap:]])
+
+                hold = min(cross_fade_samples, len(wave)) if i < len(gen_text_batches) - 1 else 0
+                wave, tail = wave[: len(wave) - hold], wave[len(wave) - hold :]
+
+                # Send the ready part in pieces of play_steps_in_s, as float32 arrays (views, no copy)
+                wave = wave.astype(np.float32, copy=False)
+                for j in range(0, len(wave), chunk_size):
+                    yield wave[j : j + chunk_size]
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def next_encoded(stream, encoder):
+    # next piece of a generate_stream in the requested encoding, and whether the stream has ended
+    audio_chunk = next(stream, None)
+    if audio_chunk is None:
+        return encoder.flush(), True
+    return encoder.encode(audio_chunk), False
+
+
+async def handle_client(reader, writer, processor, executor, limit, max_request_bytes=MAX_REQUEST_BYTES):
+    peer = writer.get_extra_info("peername")
+    if limit.locked():
+        write_frame(writer, FRAME_ERROR, b"server busy, too many connections")
+        writer.close()
+        return
+    async with limit:
+        print(f"Accepted connection from {peer}")
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    frame = await read_frame(reader, max_size=max_request_bytes)
+                except FrameTooLargeError as e:
+                    # The payload is left unread, so the connection cannot carry another request
+                    write_frame(writer, FRAME_ERROR, f"bad request: {e}".encode("utf-8"))
+                    await writer.drain()
+                    break
+                if frame is None:
+                    break
+                kind, payload = frame
+                try:
+                    if kind != FRAME_REQUEST:
+                        raise ValueError(f"expected a request frame, got kind {kind}")
+                    request = json.loads(payload.decode("utf-8"))
+                    if request.get("stats"):
+                        # Queue depth, wait times and admission counts instead of audio
+                        write_frame(writer, FRAME_STATS, json.dumps(processor.scheduler.stats()).encode("utf-8"))
+                        await writer.drain()
+                        continue
+                    params = parse_request_params(request, processor.max_nfe_step)
+                    text = request["text"].strip()
+                    if not processor.has_voice(params.get("voice", "main")):
+                        raise KeyError(f"unknown voice {params.get('voice', 'main')!r}")
+                    deadline = None
+                    if request.get("deadline") is not None:
+                        # Seconds from now for the whole response
+                        deadline = time.monotonic() + float(request["deadline"])
+                    encoder = get_encoder(request.get("format") or "f32", sample_rate=processor.sampling_rate)
+                except (ValueError, KeyError, AttributeError, TypeError) as e:
+                    write_frame(writer, FRAME_ERROR, f"bad request: {e}".encode("utf-8"))
+                    await writer.drain()
+                    continue
+
+                # The blocking generator runs on the bounded executor, one piece at a time, so a slow client
+                # (drain waits on its socket) stops it pulling further pieces; encoding happens there as well,
+                # off both the event loop and the scheduler's model thread
+                # Tag the response with the settings it is generated with, ahead of the audio
+                settings = processor.request_settings(**params)
+                write_frame(writer, FRAME_INFO, json.dumps(dict(settings, format=encoder.format)).encode("utf-8"))
+
+                cancelled = threading.Event()
+                stream = processor.generate_stream(text, cancelled=cancelled, deadline=deadline, **settings)
+                # Clients wait for the end frame before the next request, so reading here only ever sees EOF
+                disconnected = asyncio.ensure_future(reader.read())
+                piece = None
+                try:
+                    while True:
+                        piece = asyncio.ensure_future(loop.run_in_executor(executor, next_encoded, stream, encoder))
+                        await asyncio.wait({piece, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                        if disconnected.done():
+                            raise ConnectionResetError("client disconnected")
+                        audio_chunk, end = piece.result()
+                        if memoryview(audio_chunk).nbytes:
+                            write_frame(writer, FRAME_AUDIO, audio_chunk)
+                            await writer.drain()
+                        if end:
+                            break
+                    write_frame(writer, FRAME_END)
+                    await writer.drain()
+                except AdmissionError as e:
+                    write_frame(writer, FRAME_ERROR, f"rejected: {e}".encode("utf-8"))
+                    await writer.drain()
+                except Exception:
+                    # Stop generating for this request, the scheduler drops its chunks that have not started
+                    cancelled.set()
+                    raise
+                finally:
+                    if not disconnected.done():
+                        disconnected.cancel()
+                    if piece is not None:
+                        await asyncio.wait({piece})  # the generator returns within its polling interval
+                    await loop.run_in_executor(executor, stream.close)
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            print(f"Connection from {peer} closed")
+        except Exception as e:
+            print(f"Error handling client: {e}")
+            traceback.print_exc()  # Print the full traceback to diagnose the issue
             try:
-                # The client sends the text input
-                text = data.strip()
-
-                # Generate and stream audio chunks
-                for audio_chunk in processor.generate_stream(text):
-                    client_socket.sendall(audio_chunk)
-
-                # Send end-of-audio signal
-                client_socket.sendall(b"END_OF_AUDIO")
-
-            except Exception as inner_e:
-                print(f"Error during processing: {inner_e}")
-                traceback.print_exc()  # Print the full traceback to diagnose the issue
-                break
-
-    except Exception as e:
-        print(f"Error handling client: {e}")
-        traceback.print_exc()
-    finally:
-        client_socket.close()
-
-
-def start_server(host, port, processor):
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind((host, port))
-    server.listen(5)
+                write_frame(writer, FRAME_ERROR, str(e).encode("utf-8"))
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, processor, max_connections=64, max_workers=8, max_request_bytes=MAX_REQUEST_BYTES):
+    # max_workers bounds the requests waiting on the model at once, max_connections the clients held open
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    limit = asyncio.Semaphore(max_connections)
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_client(reader, writer, processor, executor, limit, max_request_bytes),
+        host,
+        port,
+    )
     print(f"Server listening on {host}:{port}")
-
-    while True:
-        client_socket, addr = server.accept()
-        print(f"Accepted connection from {addr}")
-        client_handler = Thread(target=handle_client, args=(client_socket, processor))
-        client_handler.start()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def start_server(host, port, processor, max_connections=64, max_workers=8, max_request_bytes=MAX_REQUEST_BYTES):
+    asyncio.run(
+        serve(
+            host,
+            port,
+            processor,
+            max_connections=max_connections,
+            max_workers=max_workers,
+            max_request_bytes=max_request_bytes,
+        )
+    )
 
 
 if __name__ == "__main__":
-    try:
-        # Load the model and vocoder using the provided files
-        ckpt_file = ""  # pointing your checkpoint "ckpts/model/model_1096.pt"
-        vocab_file = ""  # Add vocab file path if needed
-        ref_audio = ""  # add ref audio"./tests/ref_audio/reference.wav"
-        ref_text = ""
+    parser = argparse.ArgumentParser(description="Streaming TTS socket server")
+    parser.add_argument("--ckpt_file", default="", help="checkpoint, e.g. ckpts/model/model_1096.pt")
+    parser.add_argument("--vocab_file", default="", help="vocab file, if needed")
+    parser.add_argument("--ref_audio", default="", help="reference audio, e.g. ./tests/ref_audio/reference.wav")
+    parser.add_argument("--ref_text", default="", help="reference text, transcribed if empty")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9998)
+    parser.add_argument("--device", default=None, help="e.g. cpu, cuda")
+    parser.add_argument("--max_connections", type=int, default=64)
+    parser.add_argument("--max_workers", type=int, default=8, help="requests generated concurrently")
+    parser.add_argument("--policy", default="fifo", choices=["fifo", "edf", "sjf"], help="queue order")
+    parser.add_argument("--max_pending", type=int, default=None, help="queued chunks at most, refuse beyond")
+    parser.add_argument("--adaptive_nfe", action="store_true", help="lower nfe_step (then cfg) under load")
+    parser.add_argument(
+        "--nfe_levels", type=parse_nfe_levels, default=NFE_LEVELS, help="adaptive nfe_step[/cfg_every] levels"
+    )
+    parser.add_argument("--nfe_high_depth", type=int, default=None, help="queued chunks to step down, off if unset")
+    parser.add_argument("--nfe_high_wait", type=float, default=NFE_HIGH_WAIT, help="queue wait (s) to step down")
+    parser.add_argument("--nfe_low_wait", type=float, default=NFE_LOW_WAIT, help="queue wait (s) to step back up")
+    parser.add_argument("--max_nfe_step", type=int, default=MAX_NFE_STEP, help="refuse requests asking for more")
+    parser.add_argument("--max_request_bytes", type=int, default=MAX_REQUEST_BYTES, help="refuse larger request frames")
+    parser.add_argument("--result_cache_dir", default=None, help="cache generated chunks on disk, off if unset")
+    parser.add_argument("--result_cache_size", type=float, default=2, help="result cache bound in GB")
+    parser.add_argument("--voice_store", default=None, help="voice profiles served by id, see f5-tts_voice-profile")
+    parser.add_argument("--devices", default=None, help="one replica per device, 'auto' or e.g. cuda:0,cuda:1")
+    parser.add_argument("--cpu_workers", type=int, default=1, help="cpu replicas for --devices auto without gpus")
+    args = parser.parse_args()
 
+    try:
         # Initialize the processor with the model and vocoder
         processor = TTSStreamingProcessor(
-            ckpt_file=ckpt_file,
-            vocab_file=vocab_file,
-            ref_audio=ref_audio,
-            ref_text=ref_text,
+            ckpt_file=args.ckpt_file,
+            vocab_file=args.vocab_file,
+            ref_audio=args.ref_audio,
+            ref_text=args.ref_text,
+            device=args.device,
             dtype=torch.float32,
+            policy=args.policy,
+            max_pending=args.max_pending,
+            adaptive_nfe=args.adaptive_nfe,
+            nfe_levels=args.nfe_levels,
+            nfe_high_wait=args.nfe_high_wait,
+            nfe_low_wait=args.nfe_low_wait,
+            nfe_high_depth=args.nfe_high_depth,
+            max_nfe_step=args.max_nfe_step,
+            result_cache=(
+                ResultCache(args.result_cache_dir, int(args.result_cache_size * 2**30))
+                if args.result_cache_dir
+                else None
+            ),
+            voice_store=args.voice_store,
+            devices=parse_devices(args.devices, args.cpu_workers),
         )
 
         # Start the server
-        start_server("0.0.0.0", 9998, processor)
+        start_server(
+            args.host,
+            args.port,
+            processor,
+            max_connections=args.max_connections,
+            max_workers=args.max_workers,
+            max_request_bytes=args.max_request_bytes,
+        )
     except KeyboardInterrupt:
         gc.collect()
@@ -0,0 +1,62 @@
+# stand-ins for the model, vocoder and a prepared voice, so serving code runs on the cpu without checkpoints
+# the stub model samples silence of the requested durations, the stub vocoder makes hop_length zeros per frame
+
+import threading
+import time
+
+import pytest
+import torch
+
+from f5_tts.infer.utils_infer import hop_length
+from f5_tts.infer.utils_infer import n_mel_channels
+
+
+class StubModel:
+    def __init__(self, fail=False, delay=0.0, ckpt_fingerprint=None):
+        self.fail = fail  # raise from every sample call
+        self.delay = delay  # seconds per sample call, to keep jobs outstanding
+        self.ckpt_fingerprint = ckpt_fingerprint  # set to enable a result cache
+        self.odeint_kwargs = dict(method="euler")
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def sample(self, cond, text, duration, lens=None, steps=32, seed=None, **kwargs):
+        with self.lock:
+            self.calls.append(dict(text=["".join(t) for t in text], duration=duration.tolist(), steps=steps))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("stub model failure")
+        return torch.zeros(len(text), int(duration.max()), n_mel_channels), None
+
+
+class StubVocoder:
+    def decode(self, mel):
+        return torch.zeros(mel.shape[0], mel.shape[-1] * hop_length)
+
+
+@pytest.fixture
+def stub_voice():
+    ref_text = "Some reference text. "
+    ref_frames = 50
+    return dict(
+        audio=torch.zeros(1, ref_frames * hop_length),
+        rms=torch.tensor(0.1),
+        cond=torch.zeros(1, ref_frames, n_mel_channels),
+        ref_audio_len=ref_frames,
+        ref_text=ref_text,
+        text=list(ref_text),
+        hash="stub",
+    )
+
+
+@pytest.fixture
+def processor(stub_voice):
+    from f5_tts.socket_server import TTSStreamingProcessor
+
+    processor = TTSStreamingProcessor(None, None, "", "", device="cpu", model=StubModel(), vocoder=StubVocoder())
+    processor.scheduler.max_wait = 0
+    # "main" served from the stub voice instead of a reference recording
+    processor.voices = {"main": None}
+    processor.get_voice = lambda voice="main": stub_voice
+    yield processor
+    processor.scheduler.stop()
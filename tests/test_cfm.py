@@ -0,0 +1,188 @@
+# CFM.sample on a tiny randomly initialised backbone, cpu only
+
+import pytest
+import torch
+
+from f5_tts.model import CFM
+from f5_tts.model import DiT
+from f5_tts.model import MMDiT
+from f5_tts.model import UNetT
+from f5_tts.model.modules import Attention
+
+
+VOCAB = {c: i for i, c in enumerate(" abcdefghijklmnopqrstuvwxyz.,")}
+TEXTS = ["hello there.", "general kenobi."]
+
+
+def tiny_cfm(backbone=DiT, depth=2, odeint_kwargs=None, **kwargs):
+    torch.manual_seed(0)
+    if backbone is not MMDiT:
+        kwargs = dict(text_dim=16, conv_layers=1, **kwargs)
+    transformer = backbone(
+        dim=32, depth=depth, heads=2, dim_head=16, ff_mult=2, text_num_embeds=len(VOCAB), mel_dim=100, **kwargs
+    )
+    cfm_kwargs = dict(odeint_kwargs=odeint_kwargs) if odeint_kwargs is not None else {}
+    return CFM(transformer, mel_spec_kwargs=dict(n_mel_channels=100), vocab_char_map=VOCAB, **cfm_kwargs).eval()
+
+
+@pytest.fixture(scope="module")
+def cfm():
+    return tiny_cfm()
+
+
+def sample(cfm, seed, texts=TEXTS, **kwargs):
+    cond = torch.zeros(len(texts), 20, 100)
+    duration = torch.full((len(texts),), 40)
+    out, _ = cfm.sample(cond=cond, text=texts, duration=duration, steps=4, seed=seed, **kwargs)
+    return out
+
+
+@pytest.mark.parametrize("cfg_interval", [(0.8, 0.2), (-0.1, 0.5), (0.5, 1.5)])
+def test_invalid_cfg_interval(cfm, cfg_interval):
+    # an inverted interval used to turn guidance off at every step without a word
+    with pytest.raises(ValueError, match="cfg_interval should be"):
+        sample(cfm, [7, 8], cfg_interval=cfg_interval)
+
+
+def test_seeded_sample_independent_of_batch(cfm):
+    alone = sample(cfm, [7], texts=TEXTS[:1])
+    assert torch.allclose(sample(cfm, [7, 3])[0], alone, atol=1e-5)
+    assert torch.allclose(sample(cfm, [7, None])[0], alone, atol=1e-5)
+
+
+@pytest.mark.parametrize("seed", [[7], [7, 8, 9]])
+def test_seed_list_length_must_match_batch(cfm, seed):
+    with pytest.raises(ValueError, match="seed list has"):
+        sample(cfm, seed)
+
+
+def test_seeds_leave_global_random_state_alone(cfm):
+    torch.manual_seed(123)
+    state = torch.get_rng_state()
+    sample(cfm, [7, 8])
+    assert torch.equal(torch.get_rng_state(), state)
+
+
+def test_unseeded_sample_not_tied_to_seeded_neighbour(cfm):
+    # an unseeded sample after a seeded one used to continue from the state that seed left behind
+    torch.manual_seed(1)
+    first = sample(cfm, [7, None])[1]
+    torch.manual_seed(2)
+    second = sample(cfm, [7, None])[1]
+    assert not torch.allclose(first, second)
+    # and it follows the global generator, as an unseeded sample alone does
+    torch.manual_seed(1)
+    assert torch.allclose(sample(cfm, [None], texts=TEXTS[1:])[0], first, atol=1e-5)
+
+
+@pytest.mark.parametrize("backbone", [DiT, UNetT, MMDiT])
+def test_batch_cfg_matches_separate_branches(backbone):
+    # cond & null branch packed in one forward give the guidance of two forwards
+    cfm = tiny_cfm(backbone)
+    separate = sample(cfm, [7, 8], cfg_strength=2.0, batch_cfg=False)
+    assert torch.allclose(sample(cfm, [7, 8], cfg_strength=2.0, batch_cfg=True), separate, atol=1e-5)
+
+
+def without_step_cache(monkeypatch, cfm):
+    # embeddings recomputed by the plain forward at every evaluation
+    monkeypatch.setattr(cfm.transformer, "get_step_cache", lambda cond, text: None)
+
+
+def without_time_cache(monkeypatch, cfm):
+    # time embedding & modulation recomputed by the plain forward at every evaluation
+    monkeypatch.setattr(cfm.transformer, "get_time_cache", lambda time: [None] * time.shape[0])
+
+
+@pytest.mark.parametrize("backbone", [DiT, UNetT, MMDiT])
+@pytest.mark.parametrize("batch_cfg", [True, False])
+def test_step_cache_matches_plain_forward(monkeypatch, backbone, batch_cfg):
+    cfm = tiny_cfm(backbone)
+    cached = [sample(cfm, [7, 8], cfg_strength=2.0, batch_cfg=batch_cfg) for _ in range(2)]  # 2nd reuses null embed
+    assert len(cfm.transformer.null_embed_cache) == 1
+    without_step_cache(monkeypatch, cfm)
+    plain = sample(cfm, [7, 8], cfg_strength=2.0, batch_cfg=batch_cfg)
+    for out in cached:
+        assert torch.allclose(out, plain, atol=1e-5)
+
+
+@pytest.mark.parametrize("backbone", [DiT, UNetT, MMDiT])
+def test_null_embed_cache_cleared_when_weights_may_change(backbone):
+    cfm = tiny_cfm(backbone)
+    sample(cfm, [7, 8])
+    assert len(cfm.transformer.null_embed_cache) == 1
+    cfm.load_state_dict(cfm.state_dict())
+    assert len(cfm.transformer.null_embed_cache) == 0
+    sample(cfm, [7, 8])
+    cfm.train()
+    assert len(cfm.transformer.null_embed_cache) == 0
+
+
+@pytest.mark.parametrize("backbone", [DiT, UNetT, MMDiT])
+@pytest.mark.parametrize("method", ["euler", "midpoint"])
+def test_time_cache_matches_plain_forward(monkeypatch, backbone, method):
+    cfm = tiny_cfm(backbone, odeint_kwargs=dict(method=method))
+    cached = sample(cfm, [7, 8], cfg_strength=2.0)
+    without_time_cache(monkeypatch, cfm)
+    assert torch.allclose(cached, sample(cfm, [7, 8], cfg_strength=2.0), atol=1e-5)
+    # and with neither cache, the forward as it was before both
+    without_step_cache(monkeypatch, cfm)
+    assert torch.allclose(cached, sample(cfm, [7, 8], cfg_strength=2.0, batch_cfg=False), atol=1e-5)
+
+
+@pytest.mark.parametrize("backbone", [DiT, UNetT, MMDiT])
+def test_feature_cache(backbone):
+    cfm = tiny_cfm(backbone, depth=4)
+    reference = sample(cfm, [7, 8])
+    # a full forward at every evaluation reuses nothing
+    assert torch.allclose(sample(cfm, [7, 8], feature_cache_depth=1, feature_cache_interval=1), reference, atol=1e-5)
+    reused = sample(cfm, [7, 8], feature_cache_depth=1, feature_cache_interval=2)
+    assert reused.shape == reference.shape and torch.isfinite(reused).all()
+    assert not torch.allclose(reused, reference)
+
+
+@pytest.mark.parametrize("backbone", [DiT, UNetT, MMDiT])
+def test_feature_cache_runs_fewer_layers(backbone):
+    cfm = tiny_cfm(backbone, depth=4)
+    calls = []
+    for module in cfm.transformer.modules():
+        if isinstance(module, Attention):
+            module.register_forward_hook(lambda *args: calls.append(1))
+
+    def attention_calls(**kwargs):
+        calls.clear()
+        sample(cfm, [7, 8], **kwargs)
+        return len(calls)
+
+    full = attention_calls()
+    assert attention_calls(feature_cache_depth=1, feature_cache_interval=1) == full
+    assert attention_calls(feature_cache_depth=1, feature_cache_interval=2) < full
+
+
+def test_unett_feature_cache_depth_leaves_deep_layers():
+    # half the depth would skip no layer at all, only swap in stale features
+    with pytest.raises(AssertionError, match=r"should be in \[1, 1\]"):
+        sample(tiny_cfm(UNetT, depth=4), [7, 8], feature_cache_depth=2, feature_cache_interval=2)
+
+
+class NoFeatureCacheDiT(DiT):
+    def forward(self, x, cond, text, time, drop_audio_cond, drop_text, mask=None, cfg_infer=False, **kwargs):
+        return super().forward(x, cond, text, time, drop_audio_cond, drop_text, mask=mask, cfg_infer=cfg_infer)
+
+
+def test_feature_cache_unsupported_backbone():
+    with pytest.raises(ValueError, match="not supported by NoFeatureCacheDiT"):
+        sample(tiny_cfm(NoFeatureCacheDiT), [7, 8], feature_cache_depth=1)
+
+
+@pytest.mark.parametrize("odeint_kwargs", [{}, dict(method="rk4", options=dict(step_size=0.25))])
+def test_odeint_kwargs_left_to_torchdiffeq(odeint_kwargs):
+    # no method is torchdiffeq's default, options are only understood by it
+    out = sample(tiny_cfm(odeint_kwargs=odeint_kwargs), [7, 8])
+    assert out.shape == (2, 40, 100) and torch.isfinite(out).all()
+
+
+@pytest.mark.parametrize("method", ["euler", "heun", "dpm_solver_2m"])
+def test_in_house_solver_refuses_torchdiffeq_options(method):
+    # these used to fall through to torchdiffeq, which has no heun, or quietly swap in its own euler
+    with pytest.raises(ValueError, match=f"atol, rtol only apply to torchdiffeq methods, not '{method}'"):
+        sample(tiny_cfm(odeint_kwargs=dict(method=method, rtol=1e-5, atol=1e-5)), [7, 8])
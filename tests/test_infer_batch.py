@@ -0,0 +1,80 @@
+# infer_batch_process with the stub model: chunks sampled together in frame-budgeted batches give the audio of
+# sampling them one at a time, in text order, however their lengths differ
+
+import numpy as np
+import pytest
+import torch
+from conftest import StubModel
+from conftest import StubVocoder
+
+from f5_tts.infer.utils_infer import hop_length
+from f5_tts.infer.utils_infer import infer_batch_process
+
+
+GEN_TEXTS = [
+    "Short.",
+    "A considerably longer chunk of text, so its duration differs from the others.",
+    "Middling length here.",
+    "Tiny.",
+    "Another long one, long enough to change how the chunks group into batches.",
+]
+
+
+class TextModel(StubModel):
+    # every sample a function of its own text and frame index only, frames past its duration are garbage
+    def sample(self, cond, text, duration, lens=None, steps=32, seed=None, **kwargs):
+        super().sample(cond, text, duration, lens=lens, steps=steps, seed=seed, **kwargs)
+        out = torch.full((len(text), int(duration.max()), cond.shape[-1]), 100.0)
+        for j, (chars, dur) in enumerate(zip(text, duration.tolist())):
+            level = sum(map(ord, "".join(chars))) % 97 / 97
+            out[j, :dur] = level + torch.arange(dur)[:, None] / 10000
+        return out, None
+
+
+class MeanVocoder(StubVocoder):
+    def decode(self, mel):
+        return mel.mean(dim=1).repeat_interleave(hop_length, dim=-1)
+
+
+def generate(voice, max_batch_frames, cross_fade_duration=0.0):
+    model = TextModel()
+    wave, _, spectrogram = infer_batch_process(
+        None,
+        None,
+        GEN_TEXTS,
+        model,
+        MeanVocoder(),
+        cross_fade_duration=cross_fade_duration,
+        nfe_step=4,
+        max_batch_frames=max_batch_frames,
+        voice=voice,
+    )
+    return model, wave, spectrogram
+
+
+@pytest.mark.parametrize("cross_fade_duration", [0.0, 0.15])
+def test_batched_chunks_match_one_at_a_time(stub_voice, cross_fade_duration):
+    alone_model, alone_wave, alone_spectrogram = generate(stub_voice, 1, cross_fade_duration)
+    batched_model, batched_wave, batched_spectrogram = generate(stub_voice, 8192, cross_fade_duration)
+
+    assert len(alone_model.calls) == len(GEN_TEXTS)
+    assert len(batched_model.calls) < len(GEN_TEXTS)
+    assert any(len(set(call["duration"])) > 1 for call in batched_model.calls)  # a batch mixes lengths
+    np.testing.assert_array_equal(batched_spectrogram, alone_spectrogram)
+    np.testing.assert_array_equal(batched_wave, alone_wave)
+
+
+def test_chunks_in_text_order(stub_voice):
+    model, _, spectrogram = generate(stub_voice, 8192)
+    # the model saw every chunk once, in order, and the spectrogram is their generated parts one after another
+    texts = [text[len(stub_voice["text"]) :] for call in model.calls for text in call["text"]]
+    assert texts == GEN_TEXTS
+    assert np.all(spectrogram < 100)  # padding of shorter chunks cut off
+    durations = [duration - stub_voice["ref_audio_len"] for call in model.calls for duration in call["duration"]]
+    assert spectrogram.shape[1] == sum(durations)
+    starts = np.cumsum([0, *durations[:-1]])
+    for gen_text, start, duration in zip(GEN_TEXTS, starts, durations):
+        # each part starts at the level of its own text, past the reference frames, and climbs by 1e-4 per frame
+        level = sum(map(ord, stub_voice["ref_text"] + gen_text)) % 97 / 97
+        assert spectrogram[0, start] == pytest.approx(level + stub_voice["ref_audio_len"] / 10000, abs=1e-6)
+        np.testing.assert_allclose(np.diff(spectrogram[0, start : start + duration]), 1e-4, atol=1e-6)
@@ -0,0 +1,63 @@
+import pytest
+from conftest import StubModel
+from conftest import StubVocoder
+
+from f5_tts.infer.replicas import ReplicaPool
+
+
+def make_pool(models, **kwargs):
+    models = iter(models)
+    return ReplicaPool(lambda device: (next(models), StubVocoder()), ["cpu"] * 3, max_wait=0, **kwargs)
+
+
+def test_routes_to_least_loaded():
+    pool = make_pool([StubModel(), StubModel(), StubModel()])
+    for replica, frames in zip(pool.replicas, (500, 100, 300)):
+        replica.outstanding_frames = frames
+    assert all(pool.route() is pool.replicas[1] for _ in range(6))
+    assert pool.route(exclude=[pool.replicas[1]]) is pool.replicas[2]
+    assert pool.route(exclude=pool.replicas) is None
+
+
+def test_idle_pool_spreads_work():
+    pool = make_pool([StubModel(), StubModel(), StubModel()])
+    assert {id(pool.route()) for _ in range(3)} == {id(replica) for replica in pool.replicas}
+
+
+def test_submissions_follow_outstanding_frames(stub_voice):
+    models = [StubModel(delay=0.2), StubModel(delay=0.2), StubModel(delay=0.2)]
+    pool = make_pool(models).start()
+    try:
+        futures = [pool.submit(stub_voice, "One short sentence.", nfe_step=4) for _ in range(3)]
+        # each replica took one chunk while the others were busy
+        assert sum(replica.outstanding_frames > 0 for replica in pool.replicas) == 3
+        for future in futures:
+            wave, sample_rate, _ = future.result(timeout=10)
+            assert sample_rate == 24000 and wave.size > 0
+        assert [len(model.calls) for model in models] == [1, 1, 1]
+        assert all(replica.outstanding_frames == 0 for replica in pool.replicas)
+    finally:
+        pool.stop()
+
+
+def test_failed_chunk_retried_on_another_replica(stub_voice):
+    models = [StubModel(fail=True), StubModel(), StubModel()]
+    pool = make_pool(models).start()
+    try:
+        for _ in range(6):
+            wave, _, _ = pool.submit(stub_voice, "One short sentence.", nfe_step=4).result(timeout=10)
+            assert wave.size > 0
+        assert sum(len(model.calls) for model in models[1:]) == 6
+    finally:
+        pool.stop()
+
+
+def test_chunk_fails_once_every_replica_did(stub_voice):
+    models = [StubModel(fail=True), StubModel(fail=True), StubModel(fail=True)]
+    pool = make_pool(models).start()
+    try:
+        with pytest.raises(RuntimeError, match="stub model failure"):
+            pool.submit(stub_voice, "One short sentence.", nfe_step=4).result(timeout=10)
+        assert [len(model.calls) for model in models] == [1, 1, 1]
+    finally:
+        pool.stop()
@@ -0,0 +1,129 @@
+# ResultCache on a temporary directory, and the keys BatchScheduler makes with it, with the stub model
+
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from conftest import StubModel
+from conftest import StubVocoder
+
+from f5_tts.infer.result_cache import ResultCache
+from f5_tts.infer.scheduler import BatchScheduler
+
+
+def result(value, samples=1000):
+    return np.full(samples, value, dtype=np.float32), 24000, np.zeros((100, 4), dtype=np.float32)
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = ResultCache.key(text="hello", settings=[32, 2.0])
+    assert cache.get(key) is None
+    cache.put(key, result(0.5))
+    wave, sample_rate, _ = cache.get(key)
+    assert sample_rate == 24000 and np.all(wave == 0.5)
+    # any field that changes is another entry
+    assert cache.get(ResultCache.key(text="hello", settings=[16, 2.0])) is None
+    # and a new instance on the same directory, e.g. another process, finds it
+    assert ResultCache(str(tmp_path)).get(key) is not None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    entry_bytes = os.path.getsize(_written(ResultCache(str(tmp_path / "probe")), "probe"))
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=int(2.5 * entry_bytes))
+    keys = [ResultCache.key(text=str(i)) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, result(i))
+        os.utime(cache._path(key), (i, i))  # last use, without waiting for the clock
+    cache.get(keys[0])  # used again, so the second one is the oldest
+    cache.put(keys[2], result(2))
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.total_bytes <= cache.max_bytes
+
+
+def test_replaced_entry_counted_once(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = ResultCache.key(text="hello")
+    cache.put(key, result(0.5))
+    cache.put(key, result(0.5, samples=2000))  # as a second process or a coalescing fallback would
+    assert cache.total_bytes == os.path.getsize(cache._path(key))
+
+
+def _written(cache, text):
+    key = ResultCache.key(text=text)
+    cache.put(key, result(0))
+    return cache._path(key)
+
+
+def test_in_flight_calls_coalesced(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = ResultCache.key(text="hello")
+    computing, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        computing.set()
+        release.wait(5)
+        return result(1)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(key, compute))) for _ in range(4)]
+    threads[0].start()
+    computing.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1 and len(results) == 4
+    assert all(np.all(wave == 1) for wave, _, _ in results)
+    assert not cache.inflight
+
+
+@pytest.fixture
+def cached_scheduler(tmp_path):
+    model = StubModel(ckpt_fingerprint="stub")
+    cache = ResultCache(str(tmp_path))
+    scheduler = BatchScheduler(model, StubVocoder(), max_wait=0, result_cache=cache).start()
+    yield model, scheduler
+    scheduler.stop()
+
+
+def test_scheduler_key_covers_solver_and_indic(cached_scheduler, stub_voice):
+    model, scheduler = cached_scheduler
+    text = "Cached sentence."
+    scheduler.submit(stub_voice, text, nfe_step=4).result(5)
+    scheduler.submit(stub_voice, text, nfe_step=4).result(5)
+    assert len(model.calls) == 1  # served from the cache
+
+    for changed in (dict(nfe_step=8), dict(nfe_step=4, seed=1)):
+        scheduler.submit(stub_voice, text, **changed).result(5)
+    # the same voice prepared for indic text keeps its characters, the hash is the same
+    indic_voice = dict(stub_voice, text=stub_voice["ref_text"])
+    scheduler.submit(indic_voice, text, nfe_step=4, indic=True).result(5)
+    assert len(model.calls) == 4
+
+    model.odeint_kwargs = dict(method="midpoint")  # a server started with another --ode_method
+    scheduler.submit(stub_voice, text, nfe_step=4).result(5)
+    assert len(model.calls) == 5
+
+
+def test_scheduler_coalesces_queued_duplicates(tmp_path, stub_voice):
+    model = StubModel(delay=0.2, ckpt_fingerprint="stub")
+    scheduler = BatchScheduler(
+        model, StubVocoder(), max_wait=0, max_batch_frames=1, result_cache=ResultCache(str(tmp_path))
+    ).start()
+    try:
+        first = scheduler.submit(stub_voice, "Blocking the worker.", nfe_step=4)
+        duplicates = [scheduler.submit(stub_voice, "Said twice.", nfe_step=4) for _ in range(3)]
+        first.result(5)
+        for future in duplicates:
+            future.result(5)
+    finally:
+        scheduler.stop()
+    assert len(model.calls) == 2
@@ -0,0 +1,207 @@
+# BatchScheduler queue policies and admission, with the stub model; max_batch_frames=1 samples one job per batch,
+# so the order of the model calls is the order the policy took the queue in
+
+import time
+
+import pytest
+import torch
+from conftest import StubModel
+from conftest import StubVocoder
+
+from f5_tts.infer.scheduler import NFE_LEVELS
+from f5_tts.infer.scheduler import AdmissionError
+from f5_tts.infer.scheduler import BatchScheduler
+from f5_tts.infer.scheduler import NFEController
+from f5_tts.infer.scheduler import parse_nfe_levels
+from f5_tts.infer.utils_infer import hop_length
+
+
+TEXTS = ["Short one.", "A somewhat longer sentence than that.", "Middling length text."]
+
+
+def start_blocked(policy="fifo", delay=0.2, **kwargs):
+    # a scheduler whose worker is busy on a first job, so the next submissions queue up behind it
+    model = StubModel(delay=delay)
+    scheduler = BatchScheduler(model, StubVocoder(), max_batch_frames=1, max_wait=0, policy=policy, **kwargs).start()
+    return model, scheduler
+
+
+def wait_running(scheduler, model, calls=1):
+    for _ in range(500):
+        if len(model.calls) >= calls and scheduler.stats()["queue_depth"] == 0:
+            return
+        time.sleep(0.01)
+    raise TimeoutError("the worker did not pick up the job")
+
+
+def sampled_texts(model, voice):
+    return [call["text"][0][len(voice["text"]) :] for call in model.calls[1:]]
+
+
+@pytest.mark.parametrize(
+    "policy, deadlines, expected",
+    [
+        ("fifo", [None, None, None], TEXTS),
+        ("edf", [300, 100, 200], [TEXTS[1], TEXTS[2], TEXTS[0]]),
+        ("edf", [None, 100, None], [TEXTS[1], TEXTS[0], TEXTS[2]]),  # no deadline goes last, in order
+        ("sjf", [None, None, None], [TEXTS[0], TEXTS[2], TEXTS[1]]),
+    ],
+)
+def test_policy_order(stub_voice, policy, deadlines, expected):
+    model, scheduler = start_blocked(policy)
+    try:
+        scheduler.submit(stub_voice, "Blocking the worker.", nfe_step=4)
+        wait_running(scheduler, model)
+        now = time.monotonic()
+        futures = [
+            scheduler.submit(stub_voice, text, nfe_step=4, deadline=now + d if d is not None else None)
+            for text, d in zip(TEXTS, deadlines)
+        ]
+        for future in futures:
+            future.result(timeout=10)
+        assert sampled_texts(model, stub_voice) == expected
+        assert scheduler.stats()["served"] == 4
+    finally:
+        scheduler.stop()
+
+
+class TaggingModel(StubModel):
+    # every sample's mel is its own duration, so a result taken from another job's row shows
+    def sample(self, cond, text, duration, **kwargs):
+        mel, _ = super().sample(cond, text, duration, **kwargs)
+        return mel + duration.to(mel.dtype)[:, None, None], None
+
+
+class MeanVocoder:
+    def decode(self, mel):
+        return mel.mean(dim=1).repeat_interleave(hop_length, dim=-1)
+
+
+def test_requests_packed_into_one_batch(stub_voice):
+    # two voices with different reference lengths, their chunks sampled together
+    other_voice = dict(stub_voice, cond=torch.zeros(1, 80, stub_voice["cond"].shape[-1]), ref_audio_len=80)
+    jobs = [(stub_voice, TEXTS[0]), (other_voice, TEXTS[1]), (stub_voice, TEXTS[2]), (other_voice, TEXTS[0])]
+
+    alone = []
+    for voice, text in jobs:
+        scheduler = BatchScheduler(TaggingModel(), MeanVocoder(), max_batch_frames=1, max_wait=0).start()
+        try:
+            alone.append(scheduler.submit(voice, text, nfe_step=4).result(timeout=10))
+        finally:
+            scheduler.stop()
+
+    model = TaggingModel()
+    scheduler = BatchScheduler(model, MeanVocoder(), max_batch_frames=1 << 16, max_wait=0.2).start()
+    try:
+        futures = [scheduler.submit(voice, text, nfe_step=4) for voice, text in jobs]
+        results = [future.result(timeout=10) for future in futures]
+    finally:
+        scheduler.stop()
+
+    assert [len(call["text"]) for call in model.calls] == [len(jobs)]
+    for (wave, sample_rate, spectrogram), (expected, _, expected_spectrogram) in zip(results, alone):
+        assert wave.shape == expected.shape and spectrogram.shape == expected_spectrogram.shape
+        assert (wave == expected).all()  # its own row, not a neighbour's
+    assert len({wave.shape for wave, _, _ in results}) > 1
+
+
+def test_queue_bound_rejects(stub_voice):
+    model, scheduler = start_blocked(max_pending=1)
+    try:
+        scheduler.submit(stub_voice, "Blocking the worker.", nfe_step=4)
+        wait_running(scheduler, model)
+        queued = scheduler.submit(stub_voice, TEXTS[0], nfe_step=4)
+        with pytest.raises(AdmissionError):
+            scheduler.submit(stub_voice, TEXTS[1], nfe_step=4)
+        with pytest.raises(AdmissionError):
+            scheduler.admit(1)
+        assert queued.result(timeout=10)[1] == 24000
+        assert scheduler.stats()["rejected"] == 2
+    finally:
+        scheduler.stop()
+
+
+def test_deadlines_refused_and_shed(stub_voice):
+    model, scheduler = start_blocked(delay=0.1)
+    try:
+        # a first batch measures the seconds per unit of cost
+        scheduler.submit(stub_voice, TEXTS[0], nfe_step=4).result(timeout=10)
+        cost = scheduler.estimate_cost(stub_voice, [TEXTS[0]], nfe_step=4)
+        assert scheduler.estimate_wait(cost) > 0
+        with pytest.raises(AdmissionError, match="past the deadline"):
+            scheduler.admit(cost, deadline=time.monotonic() + 0.01)
+        scheduler.admit(cost, deadline=time.monotonic() + 60)
+
+        # queued behind a job running longer than its deadline, it is shed instead of sampled late
+        scheduler.submit(stub_voice, "Blocking the worker.", nfe_step=4)
+        wait_running(scheduler, model, calls=2)
+        late = scheduler.submit(stub_voice, TEXTS[1], nfe_step=4, deadline=time.monotonic() + 0.05)
+        with pytest.raises(AdmissionError, match="shed"):
+            late.result(timeout=10)
+        assert scheduler.stats()["shed"] == 1
+        assert len(model.calls) == 2
+    finally:
+        scheduler.stop()
+
+
+def test_cancelled_job_not_sampled(stub_voice):
+    model, scheduler = start_blocked()
+    try:
+        scheduler.submit(stub_voice, "Blocking the worker.", nfe_step=4)
+        wait_running(scheduler, model)
+        cancelled = scheduler.submit(stub_voice, TEXTS[0], nfe_step=4)
+        kept = scheduler.submit(stub_voice, TEXTS[1], nfe_step=4)
+        assert cancelled.cancel()
+        kept.result(timeout=10)
+        assert sampled_texts(model, stub_voice) == [TEXTS[1]]
+        assert scheduler.stats()["outstanding_frames"] == 0
+    finally:
+        scheduler.stop()
+
+
+def test_parse_nfe_levels():
+    assert parse_nfe_levels(NFE_LEVELS) == [
+        dict(nfe_step=32, cfg_every=1),
+        dict(nfe_step=24, cfg_every=1),
+        dict(nfe_step=16, cfg_every=1),
+        dict(nfe_step=16, cfg_every=2),
+    ]
+    assert parse_nfe_levels(" 48, 32/2 ") == [dict(nfe_step=48, cfg_every=1), dict(nfe_step=32, cfg_every=2)]
+    for bad in ("32,fast", "32/0", "0", ""):
+        with pytest.raises(ValueError, match="nfe level"):
+            parse_nfe_levels(bad)
+
+
+class LoadStub:
+    # the estimated queue wait and queue depth the controller reads, set by the test
+    def __init__(self):
+        self.wait = 0.0
+        self.depth = 0
+
+    def estimate_wait(self):
+        return self.wait
+
+    def stats(self):
+        return dict(queue_depth=self.depth)
+
+
+def test_nfe_controller_steps_through_configured_levels():
+    load = LoadStub()
+    controller = NFEController(load, levels=parse_nfe_levels("24,12/2"), high_wait=1.0, low_wait=0.2, interval=0)
+    assert controller.settings() == dict(nfe_step=24, cfg_every=1)
+    load.wait = 1.5
+    assert controller.settings() == dict(nfe_step=12, cfg_every=2)
+    assert controller.settings() == dict(nfe_step=12, cfg_every=2)  # the floor holds however high the load
+    load.wait = 0.5  # between the thresholds, stays
+    assert controller.settings() == dict(nfe_step=12, cfg_every=2)
+    load.wait = 0.1
+    assert controller.settings() == dict(nfe_step=24, cfg_every=1)
+
+
+def test_nfe_controller_steps_down_on_queue_depth():
+    load = LoadStub()
+    controller = NFEController(load, levels=parse_nfe_levels("24,12"), high_depth=3, interval=0)
+    load.depth = 3
+    assert controller.settings() == dict(nfe_step=24, cfg_every=1)
+    load.depth = 4  # deeper than high_depth, however short the estimated wait
+    assert controller.settings() == dict(nfe_step=12, cfg_every=1)
@@ -0,0 +1,265 @@
+# the socket and http servers end to end on loopback, with the stub model behind the scheduler
+
+import asyncio
+import http.client
+import json
+import socket
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import torch
+from conftest import StubModel
+
+from f5_tts.http_server import SpeechServer
+from f5_tts.infer.utils_infer import chunk_text
+from f5_tts.infer.utils_infer import hop_length
+from f5_tts.infer.utils_infer import infer_batch_process
+from f5_tts.infer.utils_infer import target_sample_rate
+from f5_tts.infer.utils_stream import FRAME_AUDIO
+from f5_tts.infer.utils_stream import FRAME_END
+from f5_tts.infer.utils_stream import FRAME_ERROR
+from f5_tts.infer.utils_stream import FRAME_HEADER
+from f5_tts.infer.utils_stream import FRAME_INFO
+from f5_tts.infer.utils_stream import FRAME_REQUEST
+from f5_tts.infer.utils_stream import FRAME_STATS
+from f5_tts.infer.utils_stream import recv_frame
+from f5_tts.infer.utils_stream import send_frame
+from f5_tts.infer.utils_stream import send_request
+from f5_tts.socket_server import TTSStreamingProcessor
+from f5_tts.socket_server import handle_client
+
+
+TEXT = "A first sentence to speak. And a second one, for good measure."
+
+
+@pytest.fixture
+def socket_address(processor):
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=2)
+    started = threading.Event()
+    address, stop = [], []
+
+    async def serve():
+        limit = asyncio.Semaphore(4)
+        server = await asyncio.start_server(
+            lambda reader, writer: handle_client(reader, writer, processor, executor, limit), "127.0.0.1", 0
+        )
+        address.append(server.sockets[0].getsockname())
+        stop.append(asyncio.Event())
+        started.set()
+        async with server:
+            await stop[0].wait()
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    started.wait(5)
+    yield address[0]
+    loop.call_soon_threadsafe(stop[0].set)
+    thread.join(5)
+    loop.close()
+    executor.shutdown(wait=False)
+
+
+def read_response(sock):
+    # frames of one response, up to and including its end or error frame
+    frames = []
+    while True:
+        kind, payload = recv_frame(sock)
+        frames.append((kind, bytes(payload)))
+        if kind in (FRAME_END, FRAME_ERROR, FRAME_STATS):
+            return frames
+
+
+def test_socket_round_trip(socket_address):
+    with socket.create_connection(socket_address, timeout=10) as sock:
+        send_request(sock, TEXT, nfe_step=4, format="f32")
+        frames = read_response(sock)
+        assert frames[0][0] == FRAME_INFO
+        info = json.loads(frames[0][1])
+        assert info["nfe_step"] == 4 and info["format"] == "f32"
+        assert frames[-1] == (FRAME_END, b"")
+        audio = b"".join(payload for kind, payload in frames if kind == FRAME_AUDIO)
+        assert len(audio) > 0 and len(audio) % 4 == 0
+        assert not np.frombuffer(audio, dtype="<f4").any()  # the stub vocoder makes silence
+
+        # the connection serves further requests, errors included
+        send_request(sock, TEXT, voice="nobody")
+        kind, payload = read_response(sock)[-1]
+        assert kind == FRAME_ERROR and b"unknown voice" in payload
+
+        send_frame(sock, FRAME_REQUEST, json.dumps({"stats": True}).encode("utf-8"))
+        kind, payload = read_response(sock)[-1]
+        assert kind == FRAME_STATS and json.loads(payload)["served"] >= 1
+
+
+def test_socket_rejects_non_request_frames(socket_address):
+    with socket.create_connection(socket_address, timeout=10) as sock:
+        send_frame(sock, FRAME_AUDIO, b"\0\0\0\0")
+        kind, payload = read_response(sock)[-1]
+        assert kind == FRAME_ERROR and b"bad request" in payload
+
+
+def test_socket_refuses_oversized_frame(socket_address):
+    # only the header is sent: the server answers from it, without waiting for a gigabyte of payload
+    with socket.create_connection(socket_address, timeout=10) as sock:
+        sock.sendall(FRAME_HEADER.pack(FRAME_REQUEST, 1 << 30))
+        kind, payload = recv_frame(sock)
+        assert kind == FRAME_ERROR and b"byte limit" in bytes(payload)
+        assert sock.recv(1) == b""  # and closes the connection
+
+
+BAD_PARAMS = [
+    (dict(speed=0), "speed must be"),
+    (dict(speed="fast"), "speed must be"),
+    (dict(nfe_step="32"), "nfe_step must be"),
+    (dict(nfe_step=0), "nfe_step must be"),
+    (dict(nfe_step=10**6), "nfe_step must be"),
+    (dict(nfe_step=8.5), "nfe_step must be"),
+    (dict(seed="7"), "seed must be"),
+    (dict(seed=-1), "seed must be"),
+    (dict(voice=["main"]), "voice must be"),
+]
+
+
+@pytest.mark.parametrize("params, message", BAD_PARAMS)
+def test_socket_rejects_bad_params(socket_address, processor, params, message):
+    with socket.create_connection(socket_address, timeout=10) as sock:
+        send_request(sock, TEXT, **params)
+        frames = read_response(sock)
+        assert len(frames) == 1 and frames[0][0] == FRAME_ERROR
+        assert message.encode("utf-8") in frames[0][1]
+    assert processor.model.calls == []  # refused before anything was queued
+
+
+class PositionModel(StubModel):
+    # mel frames that differ along the sequence, the same wherever a chunk lands in a batch
+    def sample(self, cond, text, duration, **kwargs):
+        mel, _ = super().sample(cond, text, duration, **kwargs)
+        return mel + torch.sin(0.05 * torch.arange(mel.shape[1]))[None, :, None], None
+
+
+class RampVocoder:
+    # no two neighbouring samples alike, so a shifted, dropped or repeated overlap shows
+    def decode(self, mel):
+        ramp = torch.linspace(0.5, 1, hop_length).repeat(mel.shape[-1])
+        return mel.mean(dim=1).repeat_interleave(hop_length, dim=-1) * ramp
+
+
+@pytest.mark.parametrize("cross_fade_duration", [0.15, 0])
+def test_stream_cross_fades_as_infer_batch_process(stub_voice, cross_fade_duration):
+    processor = TTSStreamingProcessor(None, None, "", "", device="cpu", model=PositionModel(), vocoder=RampVocoder())
+    processor.scheduler.max_wait = 0
+    processor.voices = {"main": None}
+    processor.get_voice = lambda voice="main": stub_voice
+    text = " ".join([TEXT] * 40)
+    try:
+        streamed = np.concatenate(list(processor.generate_stream(text, cross_fade_duration=cross_fade_duration)))
+    finally:
+        processor.scheduler.stop()
+
+    # the chunks generate_stream makes
+    ref_seconds = stub_voice["audio"].shape[-1] / target_sample_rate
+    max_chars = int(len(stub_voice["ref_text"].encode("utf-8")) / ref_seconds * (25 - ref_seconds))
+    gen_text_batches = chunk_text(text, max_chars=max_chars)
+    assert len(gen_text_batches) > 2
+    expected, _, _ = infer_batch_process(
+        None,
+        None,
+        gen_text_batches,
+        PositionModel(),
+        RampVocoder(),
+        cross_fade_duration=cross_fade_duration,
+        device="cpu",
+        voice=stub_voice,
+    )
+    assert streamed.shape == expected.shape
+    np.testing.assert_allclose(streamed, expected, atol=1e-6)
+
+
+@pytest.fixture
+def http_server(processor):
+    server = SpeechServer(("127.0.0.1", 0), processor, max_connections=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.request(method, path, body=json.dumps(body) if body is not None else None)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response, data
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_http_speech(http_server, stream):
+    body = dict(input=TEXT, response_format="wav", nfe_step=4, stream=stream)
+    response, data = request(http_server, "POST", "/v1/audio/speech", body)
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "audio/wav"
+    assert json.loads(response.getheader("X-TTS-Settings"))["nfe_step"] == 4
+    if stream:
+        assert response.getheader("Transfer-Encoding") == "chunked"
+    else:
+        assert int(response.getheader("Content-Length")) == len(data)
+        assert struct.unpack_from("<I", data, 4)[0] == len(data) - 8
+        assert struct.unpack_from("<I", data, 40)[0] == len(data) - 44
+    assert data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+    assert len(data) > 44 and (len(data) - 44) % 2 == 0
+
+
+def test_http_pcm(http_server):
+    response, data = request(http_server, "POST", "/v1/audio/speech", dict(input=TEXT, response_format="pcm"))
+    assert response.status == 200 and len(data) > 0 and len(data) % 2 == 0
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        (dict(input=TEXT, voice="nobody"), "unknown voice"),
+        (dict(input="   "), "empty input"),
+        (dict(input=TEXT, response_format="flac"), "unknown response_format"),
+        (dict(text=TEXT), "bad request"),
+    ]
+    + [(dict(input=TEXT, **params), message) for params, message in BAD_PARAMS if "voice" not in params],
+)
+@pytest.mark.parametrize("stream", [True, False])
+def test_http_bad_requests(http_server, body, message, stream):
+    response, data = request(http_server, "POST", "/v1/audio/speech", dict(body, stream=stream))
+    assert response.status == 400
+    assert message in json.loads(data)["error"]["message"]
+    assert http_server.processor.model.calls == []
+
+
+@pytest.mark.parametrize("length, status", [("2048", 413), ("-1", 400), ("many", 400)])
+def test_http_unread_body_closes_connection(http_server, length, status):
+    # the body is not read, so the server answers and closes instead of parsing it as the next request
+    http_server.max_body_bytes = 1024
+    with socket.create_connection(http_server.server_address, timeout=10) as sock:
+        sock.sendall(
+            b"POST /v1/audio/speech HTTP/1.1\r\nHost: localhost\r\n"
+            + f"Content-Length: {length}\r\n\r\n".encode("ascii")
+            + b"GET /v1/stats HTTP/1.1\r\nHost: localhost\r\n\r\n"
+        )
+        data = b""
+        while chunk := sock.recv(65536):
+            data += chunk
+    assert data.startswith(f"HTTP/1.1 {status} ".encode("ascii"))
+    assert data.count(b"HTTP/1.1") == 1
+    assert http_server.processor.model.calls == []
+
+
+def test_http_voices_stats_and_routes(http_server):
+    response, data = request(http_server, "GET", "/v1/audio/voices")
+    assert response.status == 200 and json.loads(data) == {"voices": ["main"]}
+    response, data = request(http_server, "GET", "/v1/stats")
+    assert response.status == 200 and json.loads(data)["policy"] == "fifo"
+    response, _ = request(http_server, "GET", "/v1/nothing")
+    assert response.status == 404
@@ -0,0 +1,101 @@
+# utils_silence against the pydub pipelines it replaces, on the bundled example references
+# tolerance: the same samples, exactly; only pydub's 50 ms of appended silence differs, by a few samples,
+# as pydub makes it at 11025 Hz and resamples it
+
+import glob
+import warnings
+from importlib.resources import files
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from f5_tts.infer.utils_silence import compact_silence
+from f5_tts.infer.utils_silence import ms_to_samples
+from f5_tts.infer.utils_silence import trim_reference
+
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")  # no ffmpeg needed, audio is built from arrays
+    pydub = pytest.importorskip("pydub")
+    from pydub import AudioSegment
+    from pydub import silence
+
+EXAMPLES = str(files("f5_tts").joinpath("infer/examples"))
+CLIPS = sorted(glob.glob(f"{EXAMPLES}/*/*.wav") + glob.glob(f"{EXAMPLES}/*/*.flac"))
+SILENCE_TOLERANCE = 4  # samples of pydub's resampled 50 ms
+
+
+def to_segment(wave, sample_rate):
+    return AudioSegment(wave.tobytes(), frame_rate=sample_rate, sample_width=2, channels=wave.shape[1])
+
+
+def to_array(aseg):
+    return np.array(aseg.get_array_of_samples()).reshape(-1, aseg.channels).T / 32768
+
+
+def pydub_trim_reference(aseg):
+    # the clipping and edge removal of preprocess_ref_audio_text before utils_silence
+    for min_silence_len, silence_thresh in ((1000, -50), (100, -40)):
+        non_silent_segs = silence.split_on_silence(
+            aseg, min_silence_len=min_silence_len, silence_thresh=silence_thresh, keep_silence=1000, seek_step=10
+        )
+        non_silent_wave = AudioSegment.silent(duration=0)
+        for non_silent_seg in non_silent_segs:
+            if len(non_silent_wave) > 6000 and len(non_silent_wave + non_silent_seg) > 15000:
+                break
+            non_silent_wave += non_silent_seg
+        if len(non_silent_wave) <= 15000:
+            break
+    aseg = non_silent_wave
+    if len(aseg) > 15000:
+        aseg = aseg[:15000]
+
+    non_silent_start_idx = silence.detect_leading_silence(aseg, silence_threshold=-42)
+    aseg = aseg[non_silent_start_idx:]
+    non_silent_end_duration = aseg.duration_seconds
+    for ms in reversed(aseg):
+        if ms.dBFS > -42:
+            break
+        non_silent_end_duration -= 0.001
+    return aseg[: int(non_silent_end_duration * 1000)] + AudioSegment.silent(duration=50)
+
+
+def pydub_compact_silence(aseg):
+    # remove_silence_for_generated_wav before utils_silence
+    non_silent_wave = AudioSegment.silent(duration=0)
+    for non_silent_seg in silence.split_on_silence(
+        aseg, min_silence_len=1000, silence_thresh=-50, keep_silence=500, seek_step=10
+    ):
+        non_silent_wave += non_silent_seg
+    return non_silent_wave
+
+
+@pytest.mark.parametrize("loops", [1, 3])
+@pytest.mark.parametrize("path", CLIPS, ids=lambda path: path.rsplit("/", 1)[-1])
+def test_trim_reference_matches_pydub(path, loops):
+    wave, sample_rate = sf.read(path, dtype="int16", always_2d=True)
+    wave = np.tile(wave, (loops, 1))
+    expected = to_array(pydub_trim_reference(to_segment(wave, sample_rate)))
+    trimmed = trim_reference(wave.T.astype(np.float32) / 32768, sample_rate, show_info=lambda message: None)
+
+    appended = int(ms_to_samples(50, sample_rate))
+    assert not trimmed[:, -appended:].any()
+    kept = trimmed[:, :-appended]
+    assert abs(expected.shape[-1] - trimmed.shape[-1]) <= SILENCE_TOLERANCE
+    assert not expected[:, kept.shape[-1] :].any()
+    np.testing.assert_array_equal(kept, expected[:, : kept.shape[-1]])
+
+
+def test_compact_silence_matches_pydub():
+    # speech with long silences between, and a quiet stretch that stays
+    pieces, sample_rate = [], None
+    for path, pause in zip(CLIPS[:3], (2.5, 1.7, 0.4)):
+        wave, sample_rate = sf.read(path, dtype="int16", always_2d=True)
+        pieces += [wave, np.zeros((int(pause * sample_rate), 1), dtype=np.int16)]
+    wave = np.concatenate(pieces)
+
+    expected = to_array(pydub_compact_silence(to_segment(wave, sample_rate)))
+    compacted = compact_silence(wave.T.astype(np.float32) / 32768, sample_rate)
+    assert compacted.shape[-1] < wave.shape[0]
+    np.testing.assert_array_equal(compacted, expected)
@@ -0,0 +1,62 @@
+# fixed-step solvers on a flow with a closed form: Gaussian noise to Gaussian data along the linear path
+# y_t = (1 - t) * y_0 + t * y_1 with y_0 ~ N(0, 1), y_1 ~ N(mu, sd^2); every y_0 flows to mu + sd * y_0
+
+import math
+
+import pytest
+import torch
+
+from f5_tts.model.solvers import SOLVERS
+from f5_tts.model.solvers import get_solver
+
+
+MU, SD = 1.0, 0.5
+
+
+def velocity(y, t):
+    std = math.sqrt((1 - t) ** 2 + (t * SD) ** 2)
+    dstd = (t * SD**2 - (1 - t)) / std
+    return MU + dstd / std * (y - t * MU)
+
+
+def time_grid(steps, sway_sampling_coef=None, dtype=torch.float64):
+    # as CFM.sample
+    t = torch.linspace(0, 1, steps + 1, dtype=dtype)
+    if sway_sampling_coef is not None:
+        t = t + sway_sampling_coef * (torch.cos(torch.pi / 2 * t) - 1 + t)
+    return t
+
+
+def endpoint_error(method, steps, sway_sampling_coef=None, dtype=torch.float64):
+    t = time_grid(steps, sway_sampling_coef, dtype)
+    solver = get_solver(method)
+    eval_times = solver.eval_times(t).tolist()
+    y0 = torch.linspace(-2, 2, 101, dtype=dtype)
+    y, _ = solver.integrate(lambda k, y: velocity(y, eval_times[k]), y0, t)
+    return (y - (MU + SD * y0)).abs().max().item()
+
+
+def test_sway_grid_ends_short_of_one():
+    # the case the solvers must not rely on t[-1] == 1 for
+    t = time_grid(8, -1.0)
+    assert t[-1].item() != 1 and abs(t[-1].item() - 1) < 1e-12
+
+
+@pytest.mark.parametrize("dtype", [torch.float64, torch.float32])
+@pytest.mark.parametrize("sway_sampling_coef", [None, -1.0])
+@pytest.mark.parametrize("method", sorted(set(SOLVERS) - {"euler"}))
+def test_better_than_euler(method, sway_sampling_coef, dtype):
+    for steps in (8, 16, 32):
+        error = endpoint_error(method, steps, sway_sampling_coef, dtype)
+        assert error < endpoint_error("euler", steps, sway_sampling_coef, dtype), steps
+
+
+@pytest.mark.parametrize("sway_sampling_coef", [None, -1.0])
+@pytest.mark.parametrize(
+    "method, order", [("euler", 1), ("midpoint", 2), ("heun", 2), ("ab2", 2), ("dpm_solver_2m", 2)]
+)
+def test_convergence_order(method, order, sway_sampling_coef):
+    errors = [endpoint_error(method, steps, sway_sampling_coef) for steps in (128, 256, 512)]
+    observed = [math.log2(coarse / fine) for coarse, fine in zip(errors, errors[1:])]
+    # dpm_solver_2m takes O(1) steps in log-snr next to both ends of the path, it nears its order slowest
+    assert min(observed) > order - 0.3, observed
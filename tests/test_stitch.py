@@ -0,0 +1,68 @@
+# mel-domain chunk stitching: cross_fade_mels and windowed vocoding with vocode_mel
+
+import pytest
+import torch
+
+from f5_tts.infer.utils_infer import cross_fade_mels
+from f5_tts.infer.utils_infer import hop_length
+from f5_tts.infer.utils_infer import vocode_mel
+
+
+def mel(frames, value, n_mels=4):
+    return torch.full((1, n_mels, frames), float(value))
+
+
+def test_cross_fade_overlap_length():
+    combined = cross_fade_mels([mel(10, 0), mel(8, 1)], 4)
+    assert combined.shape == (1, 4, 10 + 8 - 4)
+    assert torch.all(combined[..., :6] == 0) and torch.all(combined[..., 10:] == 1)
+    # linear in the overlap, from the end of the first to the start of the second
+    torch.testing.assert_close(combined[0, 0, 6:10], torch.linspace(0, 1, 4))
+
+
+def test_cross_fade_limited_by_shorter_chunk():
+    combined = cross_fade_mels([mel(10, 0), mel(3, 1), mel(5, 2)], 4)
+    # the second overlaps all its 3 frames, the third the 4 asked for
+    assert combined.shape[-1] == 10 + (3 - 3) + (5 - 4)
+
+
+def test_cross_fade_single_chunk_and_no_overlap():
+    single = mel(7, 3)
+    assert cross_fade_mels([single], 4) is single
+    combined = cross_fade_mels([mel(5, 0), mel(6, 1)], 0)
+    assert combined.shape[-1] == 11
+    assert torch.equal(combined, torch.cat([mel(5, 0), mel(6, 1)], dim=-1))
+
+
+class FrameVocoder:
+    # every frame becomes hop_length samples of its mean, so windows vocode exactly as the whole mel does
+    def __init__(self):
+        self.batches = []
+
+    def decode(self, mel):
+        self.batches.append(mel.shape[0])
+        return mel.mean(dim=1).repeat_interleave(hop_length, dim=-1)
+
+    def __call__(self, mel):  # bigvgan's b 1 nw
+        return self.decode(mel)[:, None]
+
+
+@pytest.mark.parametrize("mel_spec_type", ["vocos", "bigvgan"])
+@pytest.mark.parametrize("num_frames", [100, 257, 1000])
+def test_windowed_vocoding_matches_whole(mel_spec_type, num_frames):
+    torch.manual_seed(0)
+    mel = torch.randn(1, 4, num_frames)
+    whole = vocode_mel(FrameVocoder(), mel, mel_spec_type)
+    vocoder = FrameVocoder()
+    windowed = vocode_mel(vocoder, mel, mel_spec_type, window_frames=64, overlap_frames=16, batch_frames=256)
+    assert whole.shape == windowed.shape == (num_frames * hop_length,)
+    torch.testing.assert_close(windowed, whole)
+    # windows of 64 frames starting every 48, the last aligned to the end, 4 per vocoder call
+    num_windows = len(range(0, num_frames - 64, 48)) + 1
+    assert sum(vocoder.batches) == num_windows and max(vocoder.batches) == min(num_windows, 4)
+
+
+def test_short_mel_vocoded_whole():
+    vocoder = FrameVocoder()
+    wave = vocode_mel(vocoder, torch.randn(1, 4, 50), window_frames=64)
+    assert wave.shape == (50 * hop_length,) and vocoder.batches == [1]
@@ -0,0 +1,46 @@
+# output encodings: the pieces of a stream, concatenated, decode to the audio that was encoded
+
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from f5_tts.infer.utils_stream import AUDIO_FORMATS
+from f5_tts.infer.utils_stream import PCM_DTYPES
+from f5_tts.infer.utils_stream import get_encoder
+
+
+SAMPLE_RATE = 24000
+
+
+def encode_stream(format, wave, piece=12000):
+    encoder = get_encoder(format, sample_rate=SAMPLE_RATE)
+    pieces = [encoder.encode(wave[i : i + piece]) for i in range(0, len(wave), piece)]
+    pieces.append(encoder.flush())
+    return b"".join(bytes(memoryview(p).cast("B")) for p in pieces)
+
+
+@pytest.mark.parametrize("format", AUDIO_FORMATS)
+def test_concatenated_stream_decodes_to_input_length(format):
+    wave = (0.3 * np.sin(np.arange(240000) * 2 * np.pi * 220 / SAMPLE_RATE)).astype(np.float32)
+    try:
+        data = encode_stream(format, wave)
+    except ValueError as e:
+        pytest.skip(str(e))
+
+    if format in PCM_DTYPES:
+        decoded = np.frombuffer(data, dtype=PCM_DTYPES[format])
+        assert len(decoded) == len(wave)
+        scale = 32767 if format == "pcm16" else 1
+        np.testing.assert_allclose(decoded / scale, wave, atol=1 / 32767)
+    else:
+        decoded, sample_rate = sf.read(io.BytesIO(data), dtype="float32")
+        assert sample_rate == SAMPLE_RATE
+        assert len(decoded) == len(wave)
+
+
+def test_mp3_is_not_offered():
+    assert "mp3" not in AUDIO_FORMATS
+    with pytest.raises(ValueError, match="unknown audio format"):
+        get_encoder("mp3")
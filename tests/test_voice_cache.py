@@ -0,0 +1,69 @@
+# the per-process voice cache of utils_infer, through load_voice and cache_voice, also from concurrent threads
+
+import threading
+import types
+
+import numpy as np
+import pytest
+
+from f5_tts.infer import utils_infer
+from f5_tts.infer.utils_infer import cache_voice
+from f5_tts.infer.utils_infer import cached_voice
+from f5_tts.infer.utils_infer import load_voice
+from f5_tts.model.modules import MelSpec
+
+
+REF_TEXT = "Some words of the reference."
+
+
+@pytest.fixture(scope="module")
+def model_obj():
+    return types.SimpleNamespace(mel_spec=MelSpec())
+
+
+def reference(frequency):
+    # a tenth of a second of a tone, a distinct cache key per frequency
+    t = np.arange(2400) / 24000
+    return (0.05 * np.sin(2 * np.pi * frequency * t)).astype(np.float32), 24000
+
+
+def test_load_voice_cached(model_obj):
+    voice = load_voice(reference(220), REF_TEXT, model_obj, device="cpu")
+    assert load_voice(reference(220), REF_TEXT, model_obj, device="cpu") is voice
+    assert load_voice(reference(220), "Other words.", model_obj, device="cpu") is not voice
+    assert load_voice(reference(330), REF_TEXT, model_obj, device="cpu") is not voice
+
+
+def test_lru_order_and_bound():
+    keys = [("test_lru_order_and_bound", i) for i in range(utils_infer.voice_cache_size)]
+    for key in keys:
+        cache_voice(key, key)
+    assert cached_voice(keys[0]) == keys[0]  # now the most recent
+    cache_voice(("test_lru_order_and_bound", "new"), "new")
+    assert cached_voice(keys[1]) is None  # the least recent went
+    assert cached_voice(keys[0]) == keys[0]
+    cache_voice(None, "nothing")
+    assert cached_voice(None) is None and cached_voice(("test_lru_order_and_bound", "missing")) is None
+
+
+def test_concurrent_load_voice(model_obj):
+    # more references than the cache holds, so threads evict each other's entries while reading them
+    references = [reference(110 * (i + 1)) for i in range(utils_infer.voice_cache_size + 4)]
+    hashes = [load_voice(ref, REF_TEXT, model_obj, device="cpu")["hash"] for ref in references]
+    errors = []
+
+    def load(seed):
+        rng = np.random.default_rng(seed)
+        try:
+            for _ in range(50):
+                i = int(rng.integers(len(references)))
+                assert load_voice(references[i], REF_TEXT, model_obj, device="cpu")["hash"] == hashes[i]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors[:3]
@@ -0,0 +1,63 @@
+# voice profiles: a stored profile loads as the same voice load_voice prepares from the original reference
+
+import types
+
+import numpy as np
+import pytest
+import torch
+
+from f5_tts.infer.utils_infer import load_voice
+from f5_tts.infer.utils_infer import preprocess_ref_audio_text
+from f5_tts.infer.voice_profiles import has_voice_profile
+from f5_tts.infer.voice_profiles import list_voice_profiles
+from f5_tts.infer.voice_profiles import load_voice_profile
+from f5_tts.infer.voice_profiles import save_voice_profile
+from f5_tts.model.modules import MelSpec
+
+
+REF_TEXT = "Some words of the reference."
+
+
+def quiet(message):
+    pass
+
+
+@pytest.fixture(scope="module")
+def model_obj():
+    return types.SimpleNamespace(mel_spec=MelSpec())
+
+
+@pytest.fixture(scope="module")
+def reference():
+    # half a second of silence around two quiet tones, below target_rms so the gain is applied
+    rng = np.random.default_rng(0)
+    t = np.arange(24000) / 24000
+    speech = np.concatenate([0.04 * np.sin(2 * np.pi * 220 * t), 0.03 * np.sin(2 * np.pi * 330 * t)])
+    silence = np.zeros(12000)
+    wave = np.concatenate([silence, speech + 0.001 * rng.standard_normal(len(speech)), silence])
+    return wave.astype(np.float32), 24000
+
+
+def test_profile_round_trip(tmp_path, model_obj, reference):
+    store = str(tmp_path)
+    ref_audio, ref_text = preprocess_ref_audio_text(reference, REF_TEXT, show_info=quiet)
+    expected = load_voice(ref_audio, ref_text, model_obj, device="cpu")
+
+    save_voice_profile(store, "narrator", reference, REF_TEXT, show_info=quiet)
+    assert has_voice_profile(store, "narrator") and list_voice_profiles(store) == ["narrator"]
+    voice = load_voice_profile(store, "narrator", model_obj, device="cpu")
+
+    assert torch.equal(voice["audio"], expected["audio"])
+    assert voice["ref_text"] == expected["ref_text"] and voice["text"] == expected["text"]
+    assert voice["hash"] == expected["hash"]
+    torch.testing.assert_close(voice["cond"], expected["cond"])
+    # served from the voice cache until the profile changes
+    assert load_voice_profile(store, "narrator", model_obj, device="cpu") is voice
+
+
+def test_unknown_and_invalid_profiles(tmp_path, model_obj):
+    with pytest.raises(KeyError, match="no voice profile"):
+        load_voice_profile(str(tmp_path), "nobody", model_obj, device="cpu")
+    with pytest.raises(ValueError, match="invalid voice id"):
+        load_voice_profile(str(tmp_path), "../elsewhere", model_obj, device="cpu")
+    assert not has_voice_profile(str(tmp_path), "../elsewhere")